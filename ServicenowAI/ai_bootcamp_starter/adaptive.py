@@ -0,0 +1,106 @@
+import hashlib
+import numpy as np
+from results_table import CRITERIA, LENGTH_BUCKETS, LENGTH_LABELS, SCORE_VALUES, bootstrap_ci, score_bins
+
+# Samples scored before the stopping rule is first checked
+MIN_SAMPLES = 20
+
+# Records scored per round by the async engine between checks
+ROUND_SIZE = 16
+
+# Copied from experimental records into the strata when present
+STRATA_FIELDS = ("structure_type", "ambiguity_level", "noise_level")
+
+
+# ---------------- ORDER ----------------
+def stratum(record: dict) -> tuple:
+    """Length bucket of the content, plus the experimental labels if the record has them."""
+    chars = len(str(record.get("content", "")).strip())
+    bucket = LENGTH_LABELS[int(np.searchsorted(LENGTH_BUCKETS, chars, side="right")) - 1]
+    return (bucket,) + tuple(record.get(field) for field in STRATA_FIELDS if field in record)
+
+
+def _unit(seed: int, index: int) -> float:
+    digest = hashlib.blake2b(f"{seed}:{index}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") / 2 ** 64
+
+
+def stratified_order(keys: list, seed: int = 0) -> list:
+    """
+    Random order of range(len(keys)) in which every prefix holds each
+    stratum (equal keys) in close to its share of the whole: records of
+    a stratum of size n are shuffled and given slots (i + u) / n, and
+    all slots are then sorted.
+    """
+    strata = {}
+    for index, key in enumerate(keys):
+        strata.setdefault(key, []).append(index)
+
+    slots = np.empty(len(keys))
+    for members in strata.values():
+        shuffled = sorted(members, key=lambda i: _unit(seed, i))
+        n = len(shuffled)
+        for rank, index in enumerate(shuffled):
+            slots[index] = (rank + _unit(seed + 1, index)) / n
+    return [int(i) for i in np.argsort(slots, kind="stable")]
+
+
+# ---------------- STOPPING RULE ----------------
+class StoppingRule:
+    """
+    Stops an evaluation once the bootstrap CI of every criterion's mean
+    is at most `target_width` wide (after at least `min_samples`), or
+    when `max_samples` valid samples are in (0 = no budget).
+
+    The CI is re-checked as samples arrive, which makes it somewhat
+    optimistic (optional stopping); min_samples keeps the first looks
+    from stopping on a handful of lucky agreeing scores.
+    """
+
+    def __init__(self, target_width: float, min_samples: int = MIN_SAMPLES, max_samples: int = 0, seed: int = 0):
+        self.target_width = target_width
+        self.min_samples = min_samples
+        self.max_samples = max_samples
+        self.seed = seed
+        self._counts = np.zeros((len(CRITERIA), len(SCORE_VALUES)), dtype=np.int64)
+        self.widths = {}
+        self.reason = None
+
+    @property
+    def n(self) -> int:
+        return int(self._counts[0].sum())
+
+    def add(self, row: dict):
+        for i, criterion in enumerate(CRITERIA):
+            self._counts[i, int(score_bins(row[criterion]))] += 1
+
+    def done(self) -> bool:
+        over_budget = bool(self.max_samples) and self.n >= self.max_samples
+        if self.n and (over_budget or self.n >= self.min_samples):
+            low, high = bootstrap_ci(self._counts, seed=self.seed)
+            self.widths = dict(zip(CRITERIA, high - low))
+
+        if over_budget:
+            self.reason = f"budget of {self.max_samples} samples reached"
+            return True
+        if self.n < max(self.min_samples, 1):
+            return False
+        if max(self.widths.values()) <= self.target_width:
+            self.reason = f"every 95% CI is at most {self.target_width:.2f} wide"
+            return True
+        return False
+
+
+def format_savings(rule: StoppingRule, attempted: int, total: int, calls: int) -> str:
+    """How far an adaptive run got and what a full pass would have cost."""
+    widths = ", ".join(f"{c[:5]}. {w:.2f}" for c, w in rule.widths.items())
+    lines = [
+        f"Adaptive stop   : {rule.reason or 'dataset exhausted'}"
+        + (f" (CI widths {widths})" if widths else ""),
+        f"Records scored  : {attempted} of {total}"
+        + (f" ({1 - attempted / total:.0%} fewer than a full pass)" if total else ""),
+    ]
+    if attempted:
+        full = round(calls / attempted * total)
+        lines.append(f"API calls       : {calls} used, ~{full} for a full pass (~{max(full - calls, 0)} saved)")
+    return "\n".join(lines)
@@ -1,9 +1,13 @@
 import streamlit as st
-import json
 import os
 from dotenv import load_dotenv
 from generate import GenerateEmail
+from rewrite_cache import RewriteLRU
+from clients import format_connection_stats
+import tracing
+from tracing import span
 from evaluate import LLMEvaluator
+from dataset_registry import DATA_ROOT, iter_jsonl
 
 load_dotenv()
 
@@ -17,28 +21,35 @@ st.set_page_config(
 MODEL_NAME1 = os.getenv("AZURE_GPT_41_DEPLOYMENT", "gpt-4.1")
 MODEL_NAME2 = os.getenv("AZURE_GPT_4O_MINI_DEPLOYMENT", "gpt-4o-mini")
 
-generator = GenerateEmail(model=MODEL_NAME1)
-evaluator = LLMEvaluator(model=MODEL_NAME2)
+@st.cache_resource
+def get_generator(model):
+    # Built once per server process; reruns reuse its pooled connections
+    return GenerateEmail(model=model)
+
+
+@st.cache_resource
+def get_evaluator(model):
+    return LLMEvaluator(model=model)
+
+
+generator = get_generator(MODEL_NAME1)
+evaluator = get_evaluator(MODEL_NAME2)
+
+
+@st.cache_resource
+def get_rewrite_cache():
+    # One LRU per server process, shared by every session
+    return RewriteLRU()
+
+
+rewrite_cache = get_rewrite_cache()
 
 # ---------------- DATA LOADING ----------------
 @st.cache_data
 @st.cache_data
 def load_emails_from_jsonl(file_name):
-    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-    path = os.path.join(BASE_DIR, "datasets", file_name)
-
-    if not os.path.exists(path):
-        return {"emails": {}, "ids": []}
-
-    data = []
-    with open(path, "r", encoding="utf-8") as f:
-        for line in f:
-            try:
-                data.append(json.loads(line))
-            except json.JSONDecodeError:
-                continue
-
-    emails = {item["id"]: item for item in data}
+    path = os.path.join(DATA_ROOT, file_name)
+    emails = {item["id"]: item for item in iter_jsonl(path)}
     return {"emails": emails, "ids": list(emails.keys())}
 
 
@@ -75,6 +86,13 @@ with st.sidebar:
     else:
         tone_choice = None
 
+    cache_stats = rewrite_cache.stats()
+    st.caption(
+        f"Rewrite cache: {cache_stats['entries']} entries, "
+        f"{cache_stats['hit_rate']:.0%} hit rate"
+    )
+    st.caption(f"HTTP: {format_connection_stats()}")
+
 # ---------------- SESSION STATE ----------------
 email = emails[email_id]
 original_body = email.get("content", "")
@@ -101,6 +119,49 @@ with st.container(border=True):
         st.markdown("**Subject**")
         st.write(email.get("subject", "-"))
 
+stream_key = f"stream_{gen_key}"
+
+
+def rewrite_key(content):
+    return RewriteLRU.make_key(
+        action, tone_choice, content, MODEL_NAME1, generator.prompt_version
+    )
+
+
+# ---------------- STREAMING ----------------
+def stream_generation():
+    """
+    Renders the rewrite token by token, then hands the full text to
+    the Generated Email text area (which is created right after).
+    Sessions asking for the same rewrite meanwhile wait for this one
+    and get the finished text; cached rewrites are shown at once.
+    """
+    content = st.session_state[orig_key].strip()
+
+    def render():
+        if action == "tone":
+            chunks = generator.generate_stream("tone", content, tone_type=tone_choice)
+        else:
+            chunks = generator.generate_stream(action, content)
+
+        live = st.empty()
+        try:
+            with live.container():
+                return st.write_stream(chunks)
+        finally:
+            live.empty()
+
+    try:
+        generated = rewrite_cache.get_or_generate(rewrite_key(content), render)
+    except Exception as e:
+        st.error(f"Error: {str(e)}")
+        return
+    finally:
+        tracing.flush()
+
+    st.session_state[gen_key] = generated
+
+
 # ---------------- EMAIL PANELS ----------------
 st.markdown("### Email Comparison")
 
@@ -118,6 +179,8 @@ with col1:
 
 with col2:
     st.markdown("#### Generated Email")
+    if st.session_state.pop(stream_key, False):
+        stream_generation()
     st.text_area(
         label="",
         key=gen_key,
@@ -131,20 +194,8 @@ def run_ai():
     if not content:
         return
 
-    if action == "tone":
-        generated = generator.generate(
-            "tone",
-            content,
-            tone_type=tone_choice
-        )
-    else:
-        generated = generator.generate(action, content)
-
-    if generated.startswith("Error"):
-        st.error(generated)
-        return
-
-    st.session_state[gen_key] = generated
+    # Looked up (or streamed) into the Generated Email panel on this rerun
+    st.session_state[stream_key] = True
 
 def reset_generated():
     st.session_state[gen_key] = ""
@@ -186,21 +237,18 @@ if st.button("Evaluate Response"):
     if not generated_text.strip():
         st.warning("Generate an email before evaluation.")
     else:
-        with st.spinner("Evaluating with LLM-as-a-Judge..."):
-            faithfulness_report = evaluator.judge_faithfulness(
-                original_text,
-                generated_text
-            )
-
-            completeness_report = evaluator.judge_completeness(
-                original_text,
-                generated_text
-            )
-
-            robustness_report = evaluator.judge_robustness(
-                original_text,
-                generated_text
-            )
+        try:
+            with st.spinner("Evaluating with LLM-as-a-Judge..."), span("evaluate", action=action):
+                judged = evaluator.judge_all(original_text, generated_text)
+        except Exception as e:
+            st.error(f"Evaluation failed: {str(e)}")
+            st.stop()
+        finally:
+            tracing.flush()
+
+        faithfulness_report = judged.faithfulness
+        completeness_report = judged.completeness
+        robustness_report = judged.robustness
 
         st.success("Evaluation Complete")
 
@@ -0,0 +1,147 @@
+import argparse
+import itertools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from generate import GenerateEmail
+from evaluate import LLMEvaluator, CRITERIA, JUDGE_MODES
+from score_parser import extract_score
+from dataset_registry import default_registry
+from response_cache import ResponseCache
+
+# ---------------- ENV ----------------
+load_dotenv()
+
+MODEL_GEN = os.getenv("AZURE_GPT_41_DEPLOYMENT", "gpt-4.1")
+MODEL_JUDGE = os.getenv("AZURE_GPT_4O_MINI_DEPLOYMENT", "gpt-4o-mini")
+
+
+# ---------------- SAMPLE PREPARATION ----------------
+def build_samples(per_dataset, workers):
+    """
+    Generates one rewrite per record so every judge mode scores
+    exactly the same (original, generated) pairs.
+    """
+    generator = GenerateEmail(model=MODEL_GEN)
+    pending = []
+
+    registry = default_registry()
+    for name in registry.evaluation_datasets():
+        records = (r for r in registry.iter_records(name) if r.get("content", "").strip())
+
+        for rec in itertools.islice(records, per_dataset):
+            pending.append((registry.action(name), rec["content"].strip()))
+
+    def safe_generate(item):
+        try:
+            return generator.generate(item[0], item[1])
+        except Exception as e:
+            print("⚠️ Generation failed:", e)
+            return None
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        generated = list(executor.map(safe_generate, pending))
+
+    return [
+        (action, original, gen)
+        for (action, original), gen in zip(pending, generated)
+        if gen is not None
+    ]
+
+
+# ---------------- MODE RUN ----------------
+def run_mode(mode, samples, workers):
+    # Cache bypassed: cached judgments would report zero time and tokens
+    evaluator = LLMEvaluator(model=MODEL_JUDGE, mode=mode, cache=ResponseCache(enabled=False))
+
+    def safe_judge(sample):
+        try:
+            return evaluator.judge_all(sample[1], sample[2])
+        except Exception as e:
+            print(f"⚠️ {mode} judging failed:", e)
+            return None
+
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(safe_judge, samples))
+    elapsed = time.time() - start
+
+    scores = [
+        {name: extract_score(getattr(res, name)) if res else None for name in CRITERIA}
+        for res in results
+    ]
+    return {"time": elapsed, "usage": dict(evaluator.usage), "scores": scores}
+
+
+def agreement(scores_a, scores_b, name):
+    pairs = [
+        (a[name], b[name])
+        for a, b in zip(scores_a, scores_b)
+        if a[name] is not None and b[name] is not None
+    ]
+    if not pairs:
+        return None, None, 0
+
+    # Score-only scores are expected values; exact agreement is on the nearest whole score
+    exact = sum(1 for a, b in pairs if round(a) == round(b)) / len(pairs)
+    mad = sum(abs(a - b) for a, b in pairs) / len(pairs)
+    return exact, mad, len(pairs)
+
+
+# ---------------- MAIN BENCHMARK ----------------
+def benchmark(per_dataset=10, workers=5):
+    print(" Generating rewrites...")
+    samples = build_samples(per_dataset, workers)
+    print(f" {len(samples)} samples from {', '.join(default_registry().evaluation_datasets())}")
+
+    runs = {}
+    for mode in JUDGE_MODES:
+        print(f" Judging in {mode.upper()} mode...")
+        runs[mode] = run_mode(mode, samples, workers)
+
+    print("\n JUDGE MODE COMPARISON")
+    print("-" * 64)
+    print(f"{'Mode':<10}{'Calls':>8}{'Prompt tok':>12}{'Compl. tok':>12}{'Time (s)':>10}{'Parsed':>10}")
+    for mode, run in runs.items():
+        usage = run["usage"]
+        parsed = sum(1 for s in run["scores"] if None not in s.values())
+        print(
+            f"{mode:<10}{usage['calls']:>8}{usage['prompt_tokens']:>12}"
+            f"{usage['completion_tokens']:>12}{run['time']:>10.2f}{parsed:>10}"
+        )
+    if runs["score"]["usage"]["escalations"]:
+        print(f"score mode escalated {runs['score']['usage']['escalations']} criteria to the verbose judge")
+
+    sep = runs["separate"]
+    for mode, run in runs.items():
+        if mode == "separate":
+            continue
+
+        print("-" * 64)
+        print(f" {mode.upper()} vs SEPARATE")
+        if run["time"] > 0:
+            print(f"Speedup (wall-clock) : {sep['time'] / run['time']:.2f}x")
+        if run["usage"]["prompt_tokens"]:
+            print(f"Prompt token ratio   : {sep['usage']['prompt_tokens'] / run['usage']['prompt_tokens']:.2f}x")
+        if run["usage"]["completion_tokens"]:
+            print(f"Compl. token ratio   : {sep['usage']['completion_tokens'] / run['usage']['completion_tokens']:.2f}x")
+
+        print(f"\n SCORE AGREEMENT (separate vs {mode})")
+        for name in CRITERIA:
+            exact, mad, n = agreement(sep["scores"], run["scores"], name)
+            if n == 0:
+                print(f"{name.capitalize():<14}: no comparable samples")
+                continue
+            print(f"{name.capitalize():<14}: exact {exact:.0%}  mean |diff| {mad:.2f}  (n={n})")
+    print("-" * 64)
+
+
+# ---------------- ENTRY POINT ----------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the separate, combined and score-only judge modes")
+    parser.add_argument("--per-dataset", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=5)
+    args = parser.parse_args()
+
+    benchmark(args.per_dataset, args.workers)
@@ -0,0 +1,102 @@
+import argparse
+import re
+import timeit
+from evaluate import LLMEvaluator
+from score_parser import extract_score, parse_report
+
+# ---------------- CORPUS ----------------
+# (report, expected score) pairs: the formats the judges actually return,
+# plus the cases that broke the old first-digit regex.
+REPORTS = [
+    (
+        "Score: 4 / 5\nVerdict: Minor wording changes\n\nReasoning:\n"
+        "- Dates and names are preserved\n- One sentence was merged",
+        4,
+    ),
+    (
+        "Score: 3 / 5\nVerdict: Some details missing\n\nReasoning:\n"
+        "- 2 facts were removed (the deadline and the ticket number)\n\n"
+        "Missing Elements:\n- Deadline of 5 March\n- Ticket 10423",
+        3,
+    ),
+    (
+        "**Score:** 5/5\n**Verdict:** Perfectly faithful\n\n**Reasoning:**\n"
+        "1. No hallucinated facts\n2. Intent preserved",
+        5,
+    ),
+    (
+        "Reasoning first: the rewrite drops 1 of 3 action items.\n"
+        "Score: 2 / 5\nVerdict: Many details missing",
+        2,
+    ),
+    ("### Score - 0 out of 5\nVerdict: Completely unfaithful", 0),
+    ("Faithfulness score: 4\nVerdict: Mostly faithful", 4),
+    ("The rewrite deserves 4/5 overall.", 4),
+    ("Error: 429 Too Many Requests", None),
+    ("Score: 7 / 10\nVerdict: Decent", None),
+    ("Score: None / 5\nVerdict: ", None),
+    ("I cannot evaluate this text because 3 sections are empty.", None),
+    ("", None),
+]
+
+
+def _combined_reports():
+    # The "Score: X / 5" text that combined mode builds from JSON
+    raw = (
+        '{"faithfulness": {"score": 4, "verdict": "ok", "reasoning": ["2 dates kept"]},'
+        ' "completeness": {"score": 3, "verdict": "ok", "reasoning": ["a"], "missing_elements": ["b"]},'
+        ' "robustness": {"score": 5, "verdict": "ok", "reasoning": []}}'
+    )
+    result = LLMEvaluator._format_combined(raw)
+    return [(result.faithfulness, 4), (result.completeness, 3), (result.robustness, 5)]
+
+
+def legacy_extract_score(text):
+    """The first-digit regex metrics.py used before score_parser."""
+    if not text:
+        return None
+    match = re.search(r"([0-5])\s*(/5)?", text)
+    return int(match.group(1)) if match else None
+
+
+# ---------------- BENCHMARK ----------------
+def benchmark(repeat=5, number=2000):
+    corpus = REPORTS + _combined_reports()
+    parsers = {
+        "legacy regex": legacy_extract_score,
+        "extract_score": extract_score,
+        "parse_report": lambda text: parse_report(text).score,
+    }
+
+    print(f"\n SCORE PARSER BENCHMARK ({len(corpus)} reports)")
+    print("-" * 64)
+    print(f"{'Parser':<16}{'Correct':>10}{'Wrong':>8}{'µs/report':>12}")
+
+    for label, parse in parsers.items():
+        correct = sum(1 for text, expected in corpus if parse(text) == expected)
+
+        def run():
+            for text, _ in corpus:
+                parse(text)
+
+        best = min(timeit.repeat(run, repeat=repeat, number=number))
+        per_report = best / (number * len(corpus)) * 1e6
+        print(f"{label:<16}{correct:>10}{len(corpus) - correct:>8}{per_report:>12.2f}")
+
+    print("-" * 64)
+    print("\n PARSE FAILURES (parse_report)")
+    for text, _ in corpus:
+        parsed = parse_report(text)
+        if not parsed.ok:
+            preview = text.replace("\n", " ")[:40] or "<empty>"
+            print(f"{preview:<42} -> {parsed.error}")
+
+
+# ---------------- ENTRY POINT ----------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Accuracy and speed of the judge score parsers")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--number", type=int, default=2000)
+    args = parser.parse_args()
+
+    benchmark(args.repeat, args.number)
@@ -0,0 +1,160 @@
+import hashlib
+import os
+import threading
+from dotenv import load_dotenv
+import httpx
+from openai import AzureOpenAI, AsyncAzureOpenAI, DefaultHttpxClient, DefaultAsyncHttpxClient
+
+load_dotenv()
+
+try:
+    import h2  # noqa: F401  (httpx only needs it to be importable)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# ---------------- POOL SETTINGS ----------------
+POOL_MAX_CONNECTIONS = int(os.getenv("HTTP_POOL_MAX_CONNECTIONS", "100"))
+POOL_MAX_KEEPALIVE = int(os.getenv("HTTP_POOL_MAX_KEEPALIVE", "20"))
+POOL_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_POOL_KEEPALIVE_EXPIRY", "90"))
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "1") == "1" and HTTP2_AVAILABLE
+
+
+# ---------------- CONNECTION STATS ----------------
+class ConnectionStats:
+    """
+    Counts requests against new TCP connects and TLS handshakes, using
+    httpcore's "trace" request extension. Requests that opened no new
+    connection reused a pooled one.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.new_connections = 0
+        self.tls_handshakes = 0
+        self._lock = threading.Lock()
+
+    def _on_event(self, event_name: str):
+        with self._lock:
+            if event_name == "connection.connect_tcp.complete":
+                self.new_connections += 1
+            elif event_name == "connection.start_tls.complete":
+                self.tls_handshakes += 1
+
+    def trace(self, event_name: str, info: dict):
+        self._on_event(event_name)
+
+    async def atrace(self, event_name: str, info: dict):
+        self._on_event(event_name)
+
+    def on_request(self, request: httpx.Request):
+        with self._lock:
+            self.requests += 1
+        request.extensions["trace"] = self.trace
+
+    async def on_request_async(self, request: httpx.Request):
+        with self._lock:
+            self.requests += 1
+        request.extensions["trace"] = self.atrace
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            reused = max(self.requests - self.new_connections, 0)
+            return {
+                "requests": self.requests,
+                "new_connections": self.new_connections,
+                "tls_handshakes": self.tls_handshakes,
+                "reused": reused,
+                "reuse_rate": reused / self.requests if self.requests else 0.0,
+            }
+
+
+connection_stats = ConnectionStats()
+
+
+# ---------------- CLIENT FACTORY ----------------
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=POOL_MAX_CONNECTIONS,
+        max_keepalive_connections=POOL_MAX_KEEPALIVE,
+        keepalive_expiry=POOL_KEEPALIVE_EXPIRY,
+    )
+
+
+def get_client(
+    async_client: bool = False,
+    endpoint: str = None,
+    api_key: str = None,
+    api_version: str = None,
+):
+    """
+    Returns a shared (Async)AzureOpenAI client for this endpoint and API
+    version, backed by one pooled keep-alive httpx client (HTTP/2 when
+    `h2` is installed). Arguments default to the AZURE_OPENAI_* env vars.
+
+    Async clients belong to the event loop that first uses them, so use
+    them from a single asyncio.run() per process. The SDK's own retries
+    are off: rate_limit.RateLimiter does pacing and retrying.
+    """
+    endpoint = endpoint or os.getenv("AZURE_OPENAI_ENDPOINT")
+    api_key = api_key or os.getenv("AZURE_OPENAI_API_KEY")
+    api_version = api_version or os.getenv("AZURE_OPENAI_API_VERSION")
+
+    key_hash = hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+    cache_key = (async_client, endpoint, api_version, key_hash)
+
+    with _clients_lock:
+        client = _clients.get(cache_key)
+        if client is not None:
+            return client
+
+        if async_client:
+            http_client = DefaultAsyncHttpxClient(
+                http2=HTTP2_ENABLED,
+                limits=_limits(),
+                event_hooks={"request": [connection_stats.on_request_async]},
+            )
+            client = AsyncAzureOpenAI(
+                azure_endpoint=endpoint,
+                api_key=api_key,
+                api_version=api_version,
+                http_client=http_client,
+                max_retries=0,
+            )
+        else:
+            http_client = DefaultHttpxClient(
+                http2=HTTP2_ENABLED,
+                limits=_limits(),
+                event_hooks={"request": [connection_stats.on_request]},
+            )
+            client = AzureOpenAI(
+                azure_endpoint=endpoint,
+                api_key=api_key,
+                api_version=api_version,
+                http_client=http_client,
+                max_retries=0,
+            )
+
+        _clients[cache_key] = client
+        return client
+
+
+def reset_clients():
+    """
+    Drops the shared clients so the next get_client() builds new ones,
+    e.g. before a second asyncio.run() in the same process.
+    """
+    with _clients_lock:
+        _clients.clear()
+
+
+def format_connection_stats() -> str:
+    stats = connection_stats.snapshot()
+    return (
+        f"{stats['requests']} requests, {stats['new_connections']} new connections "
+        f"({stats['tls_handshakes']} TLS), reuse {stats['reuse_rate']:.0%}"
+    )
@@ -0,0 +1,348 @@
+import argparse
+import contextlib
+import itertools
+import json
+import os
+import numpy as np
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from dataset_registry import _sampled, default_registry, iter_dataset, parse_filter
+
+# Extension -> pyarrow.dataset format
+FORMATS = {
+    ".parquet": "parquet",
+    ".arrow": "ipc",
+    ".feather": "ipc",
+}
+
+# Original JSONL line number, stored so shards and samples stay identical
+LINE_COLUMN = "_line"
+
+# Schema metadata key listing columns stored as JSON text because their
+# values mix types (e.g. `content` is a string or a list of lines)
+JSON_COLUMNS_KEY = b"json_columns"
+
+ROW_GROUP_SIZE = 64_000
+BATCH_SIZE = 8_192
+
+
+def is_columnar(path: str) -> bool:
+    return os.path.splitext(path)[1].lower() in FORMATS
+
+
+def _format_of(path: str) -> str:
+    return FORMATS[os.path.splitext(path)[1].lower()]
+
+
+# ---------------- FILTERS ----------------
+def filter_expression(filters: dict, schema: pa.Schema = None):
+    """
+    {field: value or [values]} -> pyarrow expression (AND of IN tests).
+    A field missing from `schema` matches nothing, as in iter_jsonl.
+    """
+    expression = None
+    for field, values in (filters or {}).items():
+        values = list(values) if isinstance(values, (list, tuple, set)) else [values]
+        if schema is not None and field not in schema.names:
+            test = ds.scalar(None in values)
+        else:
+            test = ds.field(field).isin(values)
+        expression = test if expression is None else expression & test
+    return expression
+
+
+# ---------------- WRITING ----------------
+def _kind(value) -> str:
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, (int, float)):
+        return "number"
+    return type(value).__name__
+
+
+def records_to_table(records: list, line_numbers: list = None) -> pa.Table:
+    """
+    Arrow table from JSON-style records. Columns whose values mix types
+    are stored as JSON text and listed in the schema metadata, so they
+    read back exactly as they were written.
+    """
+    kinds = {}
+    for rec in records:
+        for field, value in rec.items():
+            if value is not None:
+                kinds.setdefault(field, set()).add(_kind(value))
+    json_columns = sorted(field for field, found in kinds.items() if len(found) > 1)
+
+    table = pa.Table.from_pylist(_encode_json(records, json_columns))
+    if line_numbers is not None:
+        table = table.append_column(LINE_COLUMN, pa.array(line_numbers, pa.int64()))
+    if json_columns:
+        table = table.replace_schema_metadata({JSON_COLUMNS_KEY: json.dumps(json_columns)})
+    return table
+
+
+def _encode_json(records: list, json_columns: list) -> list:
+    if not json_columns:
+        return records
+    return [
+        {
+            **rec,
+            **{f: json.dumps(rec[f], ensure_ascii=False) for f in json_columns if rec.get(f) is not None},
+        }
+        for rec in records
+    ]
+
+
+def infer_schema(chunks) -> pa.Schema:
+    """
+    Schema for writing records chunk by chunk (an iterable of record
+    lists): every chunk then has the same columns and types. Number
+    columns are widened as needed (int -> double); columns that mix
+    kinds, or whose types cannot be unified, are JSON text, as in
+    records_to_table.
+    """
+    order, kinds, types = {}, {}, {}
+    for chunk in chunks:
+        values = {}
+        for rec in chunk:
+            for field, value in rec.items():
+                order.setdefault(field)
+                if value is not None:
+                    values.setdefault(field, []).append(value)
+
+        for field, found in values.items():
+            seen = kinds.setdefault(field, set())
+            seen.update(_kind(v) for v in found)
+            if len(seen) == 1:
+                try:
+                    types.setdefault(field, set()).add(pa.array(found).type)
+                except (pa.ArrowInvalid, pa.ArrowTypeError):
+                    seen.add("unconvertible")
+
+    fields, json_columns = [], []
+    for field in order:
+        field_type = pa.null()
+        if len(kinds.get(field, ())) > 1:
+            field_type = None
+        elif types.get(field):
+            try:
+                field_type = pa.unify_schemas(
+                    [pa.schema([(field, t)]) for t in types[field]], promote_options="permissive"
+                ).field(field).type
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                field_type = None
+        if field_type is None:
+            json_columns.append(field)
+            field_type = pa.string()
+        fields.append(pa.field(field, field_type))
+
+    metadata = {JSON_COLUMNS_KEY: json.dumps(sorted(json_columns))} if json_columns else None
+    return pa.schema(fields, metadata=metadata)
+
+
+@contextlib.contextmanager
+def open_table_writer(path: str, schema: pa.Schema, row_group_size: int = ROW_GROUP_SIZE):
+    """Yields write(table) appending to a Parquet / Arrow IPC file, one table at a time."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if _format_of(path) == "parquet":
+        with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+            yield lambda table: writer.write_table(table, row_group_size=row_group_size)
+    else:
+        with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, schema) as writer:
+            yield lambda table: writer.write_table(table, max_chunksize=row_group_size)
+
+
+def write_table(table: pa.Table, path: str, row_group_size: int = ROW_GROUP_SIZE):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if _format_of(path) == "parquet":
+        # Row-group statistics and dictionaries are what filters push down to
+        pq.write_table(table, path, row_group_size=row_group_size, compression="zstd")
+    else:
+        with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize=row_group_size)
+
+
+def write_records(path: str, records: list):
+    """Writes records as JSONL, Parquet or Arrow IPC, picked by extension."""
+    if is_columnar(path):
+        write_table(records_to_table(records), path)
+        return
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        for rec in records:
+            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+
+
+# ---------------- READING ----------------
+def _json_columns(schema: pa.Schema) -> list:
+    raw = (schema.metadata or {}).get(JSON_COLUMNS_KEY)
+    return json.loads(raw) if raw else []
+
+
+def read_table(path: str, filters: dict = None, columns: list = None) -> pa.Table:
+    """Whole (filtered) table; only matching row groups are decoded."""
+    dataset = ds.dataset(path, format=_format_of(path))
+    return dataset.to_table(columns=columns, filter=filter_expression(filters, dataset.schema))
+
+
+def iter_columnar(
+    path: str,
+    skip: int = 0,
+    limit: int = None,
+    sample_rate: float = None,
+    seed: int = 0,
+    shard: tuple = None,
+    numbered: bool = False,
+    filters: dict = None,
+    columns: list = None,
+):
+    """
+    iter_jsonl for Parquet / Arrow IPC files, streamed batch by batch.
+
+    `filters` are pushed down to the file (row groups whose statistics
+    cannot match are skipped without decoding). Shards and samples use
+    the original JSONL line numbers when the file has them, so they
+    select the same records as the JSONL source. Null fields are left
+    out of the records, as they were absent from the JSON.
+    """
+    if not os.path.exists(path):
+        print(f"❌ File not found: {path}")
+        return
+
+    dataset = ds.dataset(path, format=_format_of(path))
+    has_lines = LINE_COLUMN in dataset.schema.names
+    decode = _json_columns(dataset.schema)
+    if columns is not None and has_lines and LINE_COLUMN not in columns:
+        columns = list(columns) + [LINE_COLUMN]
+
+    batches = dataset.to_batches(columns=columns, filter=filter_expression(filters, dataset.schema), batch_size=BATCH_SIZE)
+
+    position = 0
+    yielded = 0
+    skipped = 0
+
+    for batch in batches:
+        if has_lines:
+            lines = batch.column(LINE_COLUMN).to_numpy()
+        else:
+            lines = np.arange(position, position + batch.num_rows)
+        position += batch.num_rows
+
+        keep = np.ones(batch.num_rows, dtype=bool)
+        if shard is not None:
+            keep &= lines % shard[1] == shard[0]
+        if sample_rate is not None:
+            keep &= np.fromiter((_sampled(seed, int(i), sample_rate) for i in lines), bool, len(lines))
+        if not keep.any():
+            continue
+
+        selected = batch.filter(pa.array(keep))
+        for index, row in zip(lines[keep], selected.to_pylist()):
+            if limit is not None and yielded >= limit:
+                return
+            if skipped < skip:
+                skipped += 1
+                continue
+
+            record = {k: v for k, v in row.items() if v is not None and k != LINE_COLUMN}
+            for field in decode:
+                if field in record:
+                    record[field] = json.loads(record[field])
+
+            yielded += 1
+            yield (int(index), record) if numbered else record
+
+
+# ---------------- CONVERTER ----------------
+def _chunks(items, size: int):
+    items = iter(items)
+    while True:
+        chunk = list(itertools.islice(items, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def convert(source: str, target: str, filters: dict = None, row_group_size: int = ROW_GROUP_SIZE) -> int:
+    """
+    Converts between JSONL, Parquet and Arrow IPC; returns the rows
+    written. Records are streamed `row_group_size` at a time, so memory
+    does not grow with the file. A columnar target takes two passes over
+    the source: one for the schema, one to write.
+    """
+    def numbered():
+        return iter_dataset(source, numbered=True, filters=filters)
+
+    rows = 0
+    if not is_columnar(target):
+        os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+        with open(target, "w", encoding="utf-8") as f:
+            for _, rec in numbered():
+                f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+                rows += 1
+        return rows
+
+    schema = infer_schema([rec for _, rec in chunk] for chunk in _chunks(numbered(), row_group_size))
+    json_columns = _json_columns(schema)
+    schema = schema.append(pa.field(LINE_COLUMN, pa.int64()))
+
+    with open_table_writer(target, schema, row_group_size) as write:
+        for chunk in _chunks(numbered(), row_group_size):
+            records = _encode_json([rec for _, rec in chunk], json_columns)
+            columns = {
+                field.name: [rec.get(field.name) for rec in records] for field in schema if field.name != LINE_COLUMN
+            }
+            columns[LINE_COLUMN] = [index for index, _ in chunk]
+            write(pa.Table.from_pydict(columns, schema=schema))
+            rows += len(chunk)
+    return rows
+
+
+def _target_for(source: str, to: str, out_dir: str = None) -> str:
+    stem = os.path.splitext(os.path.basename(source))[0]
+    return os.path.join(out_dir or os.path.dirname(source), f"{stem}.{to}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Convert datasets / results between JSONL, Parquet and Arrow IPC")
+    parser.add_argument("sources", nargs="*", help="input files (.jsonl, .parquet, .arrow)")
+    parser.add_argument(
+        "--registry", action="store_true",
+        help="convert every dataset of the default registry (original and synthetic)"
+    )
+    parser.add_argument("--to", choices=("parquet", "arrow", "jsonl"), default="parquet")
+    parser.add_argument("--out-dir", default=None, help="default: next to each input")
+    parser.add_argument(
+        "--where", action="append", type=parse_filter, default=[], metavar="FIELD=V1,V2",
+        help="only keep matching records (repeatable)"
+    )
+    parser.add_argument("--row-group-size", type=int, default=ROW_GROUP_SIZE)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    filters = dict(args.where)
+    # A filtered copy next to the source would be picked up as the dataset itself
+    if filters and not args.out_dir:
+        raise SystemExit("--where writes a subset; pass --out-dir to keep it apart from the datasets")
+
+    sources = list(args.sources)
+    if args.registry:
+        registry = default_registry()
+        sources += [registry.source_path(name) for name in registry.names()]
+    if not sources:
+        raise SystemExit("Nothing to convert: pass files or --registry")
+
+    for source in sources:
+        if not os.path.exists(source):
+            print(f"❌ File not found: {source}")
+            continue
+        target = _target_for(source, args.to, args.out_dir)
+        if os.path.abspath(target) == os.path.abspath(source):
+            print(f"⚠️ Skipping {source}: already {args.to}")
+            continue
+        rows = convert(source, target, filters, args.row_group_size)
+        print(f"✓ {source} -> {target} ({rows} rows, {os.path.getsize(target) / 1024:.0f} KiB)")
@@ -0,0 +1,179 @@
+import hashlib
+import json
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Both roots can be moved with env vars (or --data-root in metrics.py)
+DATA_ROOT = os.getenv("EMAIL_DATA_ROOT", os.path.join(BASE_DIR, "datasets"))
+SYNTHETIC_ROOT = os.getenv(
+    "EMAIL_SYNTHETIC_ROOT",
+    os.path.normpath(os.path.join(BASE_DIR, "..", "synthetic_datasets")),
+)
+
+
+# Preferred order when a dataset has columnar copies (see columnar_io)
+COLUMNAR_EXTENSIONS = (".parquet", ".arrow", ".feather")
+
+
+# ---------------- STREAMING READER ----------------
+def _sampled(seed: int, index: int, rate: float) -> bool:
+    # Deterministic per-line coin flip: same seed, same sample
+    digest = hashlib.blake2b(f"{seed}:{index}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") / 2 ** 64 < rate
+
+
+def matches(record: dict, filters: dict) -> bool:
+    """True if record[field] is one of the wanted values for every filter."""
+    for field, values in (filters or {}).items():
+        values = values if isinstance(values, (list, tuple, set)) else [values]
+        if record.get(field) not in values:
+            return False
+    return True
+
+
+def parse_filter(item: str) -> tuple:
+    """"noise_level=high,medium" -> ("noise_level", ["high", "medium"])."""
+    field, sep, values = item.partition("=")
+    if not sep or not field.strip():
+        raise ValueError(f"expected FIELD=VALUE[,VALUE...], got '{item}'")
+    return field.strip(), [v.strip() for v in values.split(",")]
+
+
+def iter_jsonl(
+    path: str,
+    skip: int = 0,
+    limit: int = None,
+    sample_rate: float = None,
+    seed: int = 0,
+    shard: tuple = None,
+    numbered: bool = False,
+    filters: dict = None,
+):
+    """
+    Lazily yields records from a JSONL file in constant memory.
+
+    Lines are filtered before they are parsed: `shard=(i, n)` keeps
+    every n-th line starting at i, `sample_rate` keeps a deterministic
+    pseudo-random fraction of lines. `filters` ({field: value(s)})
+    drop parsed records that do not match. `skip` then drops the first
+    selected records and `limit` stops after that many. Bad JSON lines
+    are skipped, as before. With `numbered`, yields (line_number, record)
+    so results from different shards can be put back in file order.
+    """
+    if not os.path.exists(path):
+        print(f"❌ File not found: {path}")
+        return
+
+    yielded = 0
+    skipped = 0
+
+    with open(path, "r", encoding="utf-8") as f:
+        for index, line in enumerate(f):
+            if limit is not None and yielded >= limit:
+                return
+            if shard is not None and index % shard[1] != shard[0]:
+                continue
+            if sample_rate is not None and not _sampled(seed, index, sample_rate):
+                continue
+
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if filters and not matches(record, filters):
+                continue
+
+            if skipped < skip:
+                skipped += 1
+                continue
+
+            yielded += 1
+            yield (index, record) if numbered else record
+
+
+def iter_dataset(path: str, **options):
+    """
+    iter_jsonl, or columnar_io.iter_columnar for .parquet / .arrow
+    files (same options; filters are pushed down to the file).
+    """
+    if os.path.splitext(path)[1].lower() in COLUMNAR_EXTENSIONS:
+        # pyarrow is only imported when a columnar file is read
+        from columnar_io import iter_columnar
+        return iter_columnar(path, **options)
+    return iter_jsonl(path, **options)
+
+
+# ---------------- REGISTRY ----------------
+class DatasetRegistry:
+    """
+    Named datasets resolved against a data root (original email sets)
+    or the synthetic root (generated corpora). Nothing is read until a
+    dataset is iterated. A Parquet / Arrow copy written by columnar_io
+    next to the JSONL file is used instead of it while it is up to date.
+    """
+
+    def __init__(self, data_root: str = None, synthetic_root: str = None):
+        self.data_root = data_root or DATA_ROOT
+        self.synthetic_root = synthetic_root or SYNTHETIC_ROOT
+        self._specs = {}
+
+    def register(self, name: str, file_name: str, action: str = None, synthetic: bool = False):
+        self._specs[name] = {"file": file_name, "action": action, "synthetic": synthetic}
+
+    def names(self):
+        return list(self._specs)
+
+    def action(self, name: str):
+        return self._specs[name]["action"]
+
+    def source_path(self, name: str) -> str:
+        """The registered (JSONL) file of `name`."""
+        if name not in self._specs:
+            raise KeyError(f"Unknown dataset '{name}', expected one of {self.names()}")
+
+        spec = self._specs[name]
+        root = self.synthetic_root if spec["synthetic"] else self.data_root
+        return os.path.join(root, spec["file"])
+
+    def path(self, name: str) -> str:
+        """File to read for `name`: a fresh columnar copy if any, else the source."""
+        source = self.source_path(name)
+        stem = os.path.splitext(source)[0]
+
+        for ext in COLUMNAR_EXTENSIONS:
+            candidate = stem + ext
+            if candidate != source and os.path.exists(candidate) and (
+                not os.path.exists(source) or os.path.getmtime(candidate) >= os.path.getmtime(source)
+            ):
+                return candidate
+        return source
+
+    def iter_records(self, name: str, **options):
+        """Streams records of `name`; options as in iter_dataset."""
+        return iter_dataset(self.path(name), **options)
+
+    def evaluation_datasets(self) -> dict:
+        """{name: (path, action)} for every dataset with an action."""
+        return {
+            name: (self.path(name), spec["action"])
+            for name, spec in self._specs.items()
+            if spec["action"]
+        }
+
+
+def default_registry(data_root: str = None, synthetic_root: str = None) -> DatasetRegistry:
+    registry = DatasetRegistry(data_root, synthetic_root)
+
+    registry.register("SHORTEN", "shorten.jsonl", action="shorten")
+    registry.register("LENGTHEN", "lengthen.jsonl", action="lengthen")
+    registry.register("TONE", "tone.jsonl", action="tone")
+
+    registry.register("SYNTHETIC_SEQUENTIAL", "synthetic_sequential.jsonl", synthetic=True)
+    registry.register("SYNTHETIC_PARALLEL", "synthetic_parallel.jsonl", synthetic=True)
+    registry.register("SYNTHETIC_EXPERIMENTAL", "synthetic_experimental.jsonl", synthetic=True)
+
+    return registry
@@ -0,0 +1,289 @@
+import argparse
+import os
+import re
+import zlib
+from collections import Counter
+import numpy as np
+from dataset_registry import default_registry, iter_dataset
+
+# Jaccard similarity of word shingles above which two texts are duplicates
+DEFAULT_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.8"))
+
+NUM_PERM = 64
+SHINGLE_SIZE = 3
+
+# Texts hashed per numpy call
+BATCH_SIZE = 1024
+
+# Universal hashing (a * x + b) mod P over 32-bit shingle hashes; a < 2**31
+# keeps a * x + b inside uint64
+_PRIME = np.uint64(4294967291)
+_WORD = re.compile(r"\w+")
+
+
+# ---------------- MINHASH ----------------
+def record_text(record: dict, fields=("content",)) -> str:
+    """The text compared for `record` (list fields are joined line by line)."""
+    parts = []
+    for field in fields:
+        value = record.get(field)
+        if isinstance(value, list):
+            value = "\n".join(str(v) for v in value)
+        if value:
+            parts.append(str(value))
+    return "\n".join(parts)
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> np.ndarray:
+    """crc32 of every run of `size` words (lower-cased); one shingle for shorter texts."""
+    words = _WORD.findall(text.lower())
+    if len(words) <= size:
+        grams = [" ".join(words)] if words else []
+    else:
+        grams = (" ".join(words[i:i + size]) for i in range(len(words) - size + 1))
+    return np.fromiter((zlib.crc32(g.encode()) for g in grams), np.uint64)
+
+
+class MinHasher:
+    """MinHash signatures (NUM_PERM uint32 values) of word-shingle sets."""
+
+    def __init__(self, num_perm: int = NUM_PERM, shingle_size: int = SHINGLE_SIZE, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self._a = rng.integers(1, 2 ** 31, num_perm, dtype=np.uint64)[:, None]
+        self._b = rng.integers(0, 2 ** 32, num_perm, dtype=np.uint64)[:, None]
+
+    def signatures(self, texts: list) -> np.ndarray:
+        """(len(texts), num_perm) uint32; all shingles of a batch are hashed in one go."""
+        sets = [shingles(text, self.shingle_size) for text in texts]
+        out = np.full((len(sets), self.num_perm), np.iinfo(np.uint32).max, dtype=np.uint32)
+
+        filled = [i for i, s in enumerate(sets) if len(s)]
+        if not filled:
+            return out
+        flat = np.concatenate([sets[i] for i in filled])
+        starts = np.cumsum([0] + [len(sets[i]) for i in filled[:-1]])
+
+        hashed = (self._a * flat[None, :] + self._b) % _PRIME
+        out[filled] = np.minimum.reduceat(hashed, starts, axis=1).T
+        return out
+
+    def signature(self, text: str) -> np.ndarray:
+        return self.signatures([text])[0]
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of two signatures."""
+    return float(np.mean(a == b))
+
+
+# ---------------- LSH INDEX ----------------
+def lsh_params(threshold: float, num_perm: int) -> tuple:
+    """
+    (bands, rows) with bands * rows = num_perm whose S-curve threshold
+    (1 / bands) ** (1 / rows) is closest to `threshold`.
+    """
+    options = [(b, num_perm // b) for b in range(1, num_perm + 1) if num_perm % b == 0]
+    return min(options, key=lambda br: abs((1 / br[0]) ** (1 / br[1]) - threshold))
+
+
+class LSHIndex:
+    """
+    Banded LSH over MinHash signatures. A query looks up one bucket per
+    band and checks only the signatures found there, so its cost does
+    not grow with the number of indexed texts (unless they are all
+    near-duplicates of each other).
+    """
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, num_perm: int = NUM_PERM):
+        self.threshold = threshold
+        self.bands, self.rows = lsh_params(threshold, num_perm)
+        self._buckets = [{} for _ in range(self.bands)]
+        self._keys = []
+        self._signatures = np.empty((1024, num_perm), dtype=np.uint32)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def _band_keys(self, sig: np.ndarray):
+        for band in range(self.bands):
+            yield hash(sig[band * self.rows:(band + 1) * self.rows].tobytes())
+
+    def add(self, key, sig: np.ndarray):
+        slot = len(self._keys)
+        if slot == len(self._signatures):
+            # Amortised growth; signatures stay one contiguous array
+            self._signatures = np.resize(self._signatures, (2 * slot, self._signatures.shape[1]))
+        self._signatures[slot] = sig
+        self._keys.append(key)
+        for buckets, band_key in zip(self._buckets, self._band_keys(sig)):
+            buckets.setdefault(band_key, []).append(slot)
+
+    def query(self, sig: np.ndarray) -> list:
+        """[(key, similarity)] of indexed texts at or above the threshold, most similar first."""
+        candidates = set()
+        for buckets, band_key in zip(self._buckets, self._band_keys(sig)):
+            candidates.update(buckets.get(band_key, ()))
+        if not candidates:
+            return []
+
+        slots = np.fromiter(candidates, np.int64, len(candidates))
+        scores = (self._signatures[slots] == sig).mean(axis=1)
+        keep = scores >= self.threshold
+        order = np.argsort(-scores[keep], kind="stable")
+        return [(self._keys[s], float(v)) for s, v in zip(slots[keep][order], scores[keep][order])]
+
+
+# ---------------- DEDUPLICATION ----------------
+class Deduplicator:
+    """
+    Streaming near-duplicate filter: the first record of each cluster is
+    kept (and indexed), later records similar to it are dropped.
+    `clusters` maps each kept key to the keys of its duplicates.
+    """
+
+    def __init__(
+        self,
+        threshold: float = DEFAULT_THRESHOLD,
+        fields=("content",),
+        num_perm: int = NUM_PERM,
+        shingle_size: int = SHINGLE_SIZE,
+    ):
+        self.fields = tuple(fields)
+        self.hasher = MinHasher(num_perm, shingle_size)
+        self.index = LSHIndex(threshold, num_perm)
+        self.seen = 0
+        self.duplicates = 0
+        self.clusters = {}
+
+    def _check(self, key, sig) -> object:
+        """Key of the record `sig` duplicates, or None (then it is indexed)."""
+        self.seen += 1
+        matches = self.index.query(sig)
+        if matches:
+            representative = matches[0][0]
+            self.duplicates += 1
+            self.clusters.setdefault(representative, []).append(key)
+            return representative
+        self.index.add(key, sig)
+        return None
+
+    def filter(self, items, numbered: bool = False, batch_size: int = BATCH_SIZE):
+        """
+        Yields the records (or (position, record) pairs) that are not
+        near-duplicates of an earlier one. Records are hashed in batches
+        but yielded lazily, so a consumer that stops early reads at most
+        one batch ahead.
+        """
+        items = iter(items)
+        while True:
+            batch = [item for _, item in zip(range(batch_size), items)]
+            if not batch:
+                return
+            records = [item[1] if numbered else item for item in batch]
+            sigs = self.hasher.signatures([record_text(r, self.fields) for r in records])
+            for item, record, sig in zip(batch, records, sigs):
+                key = item[0] if numbered else record.get("id", self.seen)
+                if self._check(key, sig) is None:
+                    yield item
+            if len(batch) < batch_size:
+                return
+
+    def duplicate_positions(self, numbered_records) -> set:
+        """Positions of every near-duplicate in a (position, record) stream."""
+        kept = {position for position, _ in self.filter(numbered_records, numbered=True)}
+        return {dup for dups in self.clusters.values() for dup in dups} - kept
+
+
+def dedup_file(
+    path: str,
+    out_path: str = None,
+    threshold: float = DEFAULT_THRESHOLD,
+    fields=("content",),
+    shingle_size: int = SHINGLE_SIZE,
+) -> Deduplicator:
+    """
+    Writes the records of `path` without near-duplicates to `out_path`
+    (default: `path` itself, replaced once the copy is complete).
+    Returns the Deduplicator, for its counts and clusters.
+    """
+    from streaming_output import StreamingJsonlWriter
+
+    target = out_path or path
+    stem, ext = os.path.splitext(target)
+    tmp_path = f"{stem}.dedup{ext}" if target == path else target
+
+    dedup = Deduplicator(threshold, fields, shingle_size=shingle_size)
+    writer = StreamingJsonlWriter(tmp_path)
+    try:
+        for record in dedup.filter(iter_dataset(path)):
+            writer.write(record)
+    finally:
+        writer.close()
+
+    if tmp_path != target:
+        os.replace(tmp_path, target)
+    return dedup
+
+
+# ---------------- CLI ----------------
+def _print_clusters(name: str, dedup: Deduplicator, subjects: dict, top: int):
+    print(f"\n{name}: {dedup.seen} records, {dedup.duplicates} near-duplicates in {len(dedup.clusters)} clusters")
+    sizes = Counter({key: len(dups) + 1 for key, dups in dedup.clusters.items()})
+    for key, size in sizes.most_common(top):
+        label = subjects.get(key) or ""
+        print(f"  {size:>5} x id {key}  {label[:60]}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Find and drop near-duplicate records (MinHash + LSH)")
+    parser.add_argument("sources", nargs="*", help="input files (.jsonl, .parquet, .arrow)")
+    parser.add_argument("--registry", action="store_true", help="check every dataset of the default registry")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Jaccard similarity of duplicates")
+    parser.add_argument("--fields", nargs="+", default=["content"], help="record fields compared")
+    parser.add_argument(
+        "--shingle-size", type=int, default=SHINGLE_SIZE,
+        help="words per shingle (1 compares word sets, catching reworded templates at lower thresholds)"
+    )
+    parser.add_argument("--top", type=int, default=5, help="largest clusters shown per file")
+    parser.add_argument(
+        "--write", action="store_true",
+        help="write <stem>.dedup<ext> next to each input (--in-place replaces the input)"
+    )
+    parser.add_argument("--in-place", action="store_true")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    sources = list(args.sources)
+    if args.registry:
+        registry = default_registry()
+        sources += [registry.path(name) for name in registry.names()]
+    if not sources:
+        raise SystemExit("Nothing to check: pass files or --registry")
+
+    for source in sources:
+        if not os.path.exists(source):
+            print(f"❌ File not found: {source}")
+            continue
+
+        if args.write or args.in_place:
+            stem, ext = os.path.splitext(source)
+            target = source if args.in_place else f"{stem}.dedup{ext}"
+            dedup = dedup_file(source, target, args.threshold, args.fields, args.shingle_size)
+            print(f"✓ {source} -> {target}")
+        else:
+            dedup = Deduplicator(args.threshold, args.fields, shingle_size=args.shingle_size)
+            for _ in dedup.filter(iter_dataset(source)):
+                pass
+
+        # Subjects only for the clusters shown, so memory stays per cluster
+        shown = {key for key, _ in Counter({k: len(v) for k, v in dedup.clusters.items()}).most_common(args.top)}
+        subjects = {
+            rec.get("id"): rec.get("subject") or record_text(rec, args.fields)
+            for rec in iter_dataset(source) if rec.get("id") in shown
+        } if shown else {}
+        _print_clusters(source, dedup, subjects, args.top)
@@ -1,38 +1,290 @@
+import asyncio
+import contextlib
+import contextvars
+import json
+import math
 import os
-from openai import AzureOpenAI
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from clients import get_client
+from rate_limit import get_limiter, estimate_tokens
 from dotenv import load_dotenv
+from response_cache import ResponseCache, get_default_cache
+from usage_metrics import track_call
+from tracing import span
+from score_parser import parse_score, SCORE_ONLY_VERDICT
 
 load_dotenv()
 
+# Extra judge calls allowed when a report cannot be parsed (0 = never re-ask)
+PARSE_RETRIES = int(os.getenv("JUDGE_PARSE_RETRIES", "1"))
+
+FORMAT_REMINDER = (
+    "Your previous answer could not be parsed ({reason}). "
+    "Answer again using EXACTLY the requested format."
+)
+
+# Score-only mode: the judge answers with one digit and the score is the
+# expected value of its distribution over 0-5. A criterion whose expected
+# score is below JUDGE_ESCALATE_BELOW, or whose most likely digit has less
+# than JUDGE_ESCALATE_CONFIDENCE probability, is judged again verbosely.
+SCORE_MAX_TOKENS = 2
+SCORE_TOP_LOGPROBS = 10
+ESCALATE_BELOW = float(os.getenv("JUDGE_ESCALATE_BELOW", "3.5"))
+ESCALATE_CONFIDENCE = float(os.getenv("JUDGE_ESCALATE_CONFIDENCE", "0.6"))
+
+SCORE_ONLY_INSTRUCTION = (
+    "Reply with the {criterion} score only: a single digit from 0 to 5, "
+    "no words, no explanation."
+)
+
+
+@dataclass
+class JudgeResult:
+    """
+    Reports from the three judges for one (original, generated) pair.
+    """
+    faithfulness: str
+    completeness: str
+    robustness: str
+
+
+# Judge modes:
+#   separate - one request per criterion (three prompts, verbose reports)
+#   combined - one request scoring all criteria, JSON schema output
+#   score    - one-digit answer per criterion scored from its logprobs;
+#              verbose report only for low or uncertain scores
+JUDGE_MODES = ("separate", "combined", "score")
+
+CRITERIA = ("faithfulness", "completeness", "robustness")
+
+_CRITERION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "score": {"type": "integer", "enum": [0, 1, 2, 3, 4, 5]},
+        "verdict": {"type": "string"},
+        "reasoning": {"type": "array", "items": {"type": "string"}},
+    },
+    "required": ["score", "verdict", "reasoning"],
+    "additionalProperties": False,
+}
+
+COMBINED_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "judge_scores",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "faithfulness": _CRITERION_SCHEMA,
+                "completeness": {
+                    **_CRITERION_SCHEMA,
+                    "properties": {
+                        **_CRITERION_SCHEMA["properties"],
+                        "missing_elements": {"type": "array", "items": {"type": "string"}},
+                    },
+                    "required": _CRITERION_SCHEMA["required"] + ["missing_elements"],
+                },
+                "robustness": _CRITERION_SCHEMA,
+            },
+            "required": list(CRITERIA),
+            "additionalProperties": False,
+        },
+    },
+}
+
+
+def _as_list(value) -> list:
+    """A JSON field that should be a list of strings, tolerating a bare string or null."""
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
 class LLMEvaluator:
-    def __init__(self, model: str):
-        self.client = AzureOpenAI(
-            azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-            api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-            api_version=os.getenv("AZURE_OPENAI_API_VERSION")
-        )
-        self.model = model
+    def __init__(self, model: str, mode: str = "separate", cache: ResponseCache = None):
+        if mode not in JUDGE_MODES:
+            raise ValueError(f"Unknown judge mode '{mode}', expected one of {JUDGE_MODES}")
 
-    def _call_judge(self, system_prompt: str, user_prompt: str) -> str:
+        self.client = self._make_client()
+        self.model = model
+        self.mode = mode
+        self.cache = cache if cache is not None else get_default_cache()
+        self.limiter = get_limiter(model)
+        self.parse_retries = PARSE_RETRIES
+        self.escalate_below = ESCALATE_BELOW
+        self.escalate_confidence = ESCALATE_CONFIDENCE
+        self.usage = {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "escalations": 0}
+        self._usage_lock = threading.Lock()
+
+    @staticmethod
+    def _make_client():
+        return get_client()
+
+    def _record_usage(self, response):
+        usage = getattr(response, "usage", None)
+        with self._usage_lock:
+            self.usage["calls"] += 1
+            if usage is not None:
+                self.usage["prompt_tokens"] += usage.prompt_tokens or 0
+                self.usage["completion_tokens"] += usage.completion_tokens or 0
+
+    @staticmethod
+    def _judge_messages(system_prompt: str, user_prompt: str, retry: tuple = None) -> list:
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ]
+        if retry is not None:
+            # Different messages, so the re-ask never hits the cached bad answer
+            previous, reason = retry
+            messages += [
+                {"role": "assistant", "content": previous},
+                {"role": "user", "content": FORMAT_REMINDER.format(reason=reason)},
+            ]
+        return messages
+
+    @staticmethod
+    def _unparseable(reports: dict) -> str:
+        """Why some of {criterion: report} cannot be parsed, or "" if all can."""
+        errors = []
+        for name, report in reports.items():
+            error = parse_score(report)[1]
+            if error is not None:
+                errors.append(f"{name}: {error}")
+        return "; ".join(errors)
+
+    def _call_judge(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        response_format: dict = None,
+        judge: str = None,
+        retry: tuple = None,
+        params: dict = None,
+    ) -> str:
         """
         Sends prompts to the judge LLM.
-        Temperature = 0 ensures deterministic, strict judging.
+        Temperature = 0 ensures deterministic, strict judging,
+        which is also what makes judge responses safe to cache.
+        Calls go through the shared RateLimiter; failures are raised.
+        `retry` = (previous answer, parse error) re-asks for the format.
+        `params` are extra request fields; with logprobs the returned
+        (and cached) text is the score distribution as JSON.
         """
-        try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt},
-                ],
-                temperature=0
+        messages = self._judge_messages(system_prompt, user_prompt, retry)
+        extra = {"response_format": response_format} if response_format else {}
+        extra.update(params or {})
+
+        # Score-only calls are their own kind in the usage summary
+        kind = "score" if extra.get("logprobs") else "judge"
+        with span(kind, judge=judge, retry=retry is not None), \
+                track_call(kind, self.model, judge=judge) as call:
+            key = self.cache.make_key(self.model, messages, 0, **extra)
+            cached = self.cache.get(key)
+            if cached is not None:
+                call["cached"] = True
+                return cached
+
+            response = self.limiter.call(
+                lambda: self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=0,
+                    **extra
+                ),
+                estimate_tokens(messages),
+                call,
             )
-            return response.choices[0].message.content.strip()
-        except Exception as e:
-            return f"Error: {str(e)}"
+            call["response"] = response
+            self._record_usage(response)
+            content = self._content(response, extra)
+
+            self.cache.set(key, content)
+            return content
+
+    @staticmethod
+    def _content(response, extra: dict) -> str:
+        if extra.get("logprobs"):
+            return json.dumps(LLMEvaluator._score_distribution(response))
+        return response.choices[0].message.content.strip()
+
+    # ---------------- SCORE-ONLY ----------------
+    @staticmethod
+    def _score_distribution(response) -> list:
+        """
+        Probabilities of the digits 0-5 from the first answer token that
+        has any among its top logprobs (normalised over those digits),
+        or a one-hot of the answered digit when logprobs are missing.
+        None when the answer holds no score digit.
+        """
+        choice = response.choices[0]
+        positions = getattr(choice.logprobs, "content", None) or []
+        probs = [0.0] * 6
+        for position in positions:
+            for top in position.top_logprobs or []:
+                token = top.token.strip()
+                if len(token) == 1 and token in "012345":
+                    probs[int(token)] += math.exp(top.logprob)
+            if any(probs):
+                break
+
+        if not any(probs):
+            digits = [c for c in (choice.message.content or "") if c in "012345"]
+            if not digits:
+                return None
+            probs[int(digits[0])] = 1.0
+
+        total = sum(probs)
+        return [p / total for p in probs]
+
+    @staticmethod
+    def _score_only_prompts(prompts: tuple, judge: str) -> tuple:
+        """The criterion's prompts with the report format swapped for a one-digit answer."""
+        system_prompt, user_prompt = prompts
+        lines = user_prompt.splitlines()
+        cut = next((i for i, line in enumerate(lines) if "EXACT format" in line), len(lines))
+        user_prompt = "\n".join(lines[:cut] + ["", SCORE_ONLY_INSTRUCTION.format(criterion=judge.upper())])
+        return system_prompt, user_prompt
+
+    def _score_params(self) -> dict:
+        return {"max_tokens": SCORE_MAX_TOKENS, "logprobs": True, "top_logprobs": SCORE_TOP_LOGPROBS}
+
+    def _score_report(self, raw: str) -> str:
+        """
+        "Score: X.XX / 5" report (the expected score, unrounded) from a
+        score-only answer, or None when the verbose judge is needed (no
+        digit, low or uncertain score).
+        """
+        probs = json.loads(raw) if raw else None
+        if probs is None:
+            return None
+
+        expected = sum(score * p for score, p in enumerate(probs))
+        confidence = max(probs)
+        if expected < self.escalate_below or confidence < self.escalate_confidence:
+            with self._usage_lock:
+                self.usage["escalations"] += 1
+            return None
+
+        distribution = " ".join(f"{score}:{p:.2f}" for score, p in enumerate(probs))
+        return (
+            f"Score: {expected:.2f} / 5\n"
+            f"Verdict: {SCORE_ONLY_VERDICT} (confidence {confidence:.0%})\n\n"
+            f"Distribution:\n- {distribution}"
+        )
+
+    def _judge_score_only(self, prompts: tuple, judge: str) -> str:
+        raw = self._call_judge(
+            *self._score_only_prompts(prompts, judge), judge=judge, params=self._score_params()
+        )
+        return self._score_report(raw) or self._judge(prompts, judge)
 
     # ---------------- FAITHFULNESS ----------------
-    def judge_faithfulness(self, original: str, generated: str) -> str:
+    @staticmethod
+    def _faithfulness_prompts(original: str, generated: str) -> tuple:
         system_prompt = """
 You are an expert evaluator judging FAITHFULNESS of a rewritten text.
 
@@ -69,10 +321,11 @@ Reasoning:
 - Mention added, altered, or removed facts
 """
 
-        return self._call_judge(system_prompt, user_prompt)
+        return system_prompt, user_prompt
 
     # ---------------- COMPLETENESS ----------------
-    def judge_completeness(self, original: str, generated: str) -> str:
+    @staticmethod
+    def _completeness_prompts(original: str, generated: str) -> tuple:
         system_prompt = """
 You are an expert evaluator judging COMPLETENESS.
 
@@ -110,10 +363,11 @@ Missing Elements:
 - List missing ideas or "None"
 """
 
-        return self._call_judge(system_prompt, user_prompt)
+        return system_prompt, user_prompt
 
     # ---------------- ROBUSTNESS (NEW) ----------------
-    def judge_robustness(self, original: str, generated: str) -> str:
+    @staticmethod
+    def _robustness_prompts(original: str, generated: str) -> tuple:
         """
         Robustness evaluates:
         - Stability under ambiguity
@@ -158,9 +412,294 @@ Reasoning:
 - Mention hallucination risks
 """
 
-        return self._call_judge(system_prompt, user_prompt)
+        return system_prompt, user_prompt
 
+    # ---------------- COMBINED (SINGLE CALL) ----------------
+    @staticmethod
+    def _combined_prompts(original: str, generated: str, robustness_original: str = None) -> tuple:
+        system_prompt = """
+You are an expert evaluator judging a rewritten text on three criteria.
 
+FAITHFULNESS:
+- Meaning must be preserved.
+- No hallucinated facts.
+- No intent distortion.
+5 = Perfectly faithful, 4 = Minor wording changes, 3 = Slight meaning drift,
+2 = Important meaning changes, 1 = Major distortions, 0 = Completely unfaithful
+
+COMPLETENESS:
+- All key ideas must be retained.
+- Minor shortening allowed.
+- Missing important info lowers score.
+5 = Fully complete, 4 = One minor detail missing, 3 = Some details missing,
+2 = Many details missing, 1 = Barely complete, 0 = Almost nothing preserved
+
+ROBUSTNESS:
+- Output should remain stable and sensible.
+- Should not hallucinate under ambiguity.
+- Should avoid overconfidence or unsafe assumptions.
+5 = Very robust and reliable, 4 = Mostly robust, minor weaknesses,
+3 = Some instability or vague assumptions, 2 = Fragile response,
+1 = Very unstable or misleading, 0 = Unsafe or nonsensical
 
+Score each criterion independently and justify each score briefly.
+"""
 
+        robustness_block = ""
+        if robustness_original is not None and robustness_original != original:
+            robustness_block = f"""
+FULL SOURCE TEXT (judge ROBUSTNESS against this):
+{robustness_original}
+"""
 
+        user_prompt = f"""
+ORIGINAL TEXT:
+{original}
+{robustness_block}
+GENERATED TEXT:
+{generated}
+
+Return JSON with keys faithfulness, completeness and robustness.
+Each has: score (0-5), verdict (short label), reasoning (bullet points).
+completeness also has missing_elements (list, empty if none).
+"""
+
+        return system_prompt, user_prompt
+
+    @staticmethod
+    def _format_combined(raw: str) -> JudgeResult:
+        """
+        Turns the JSON payload into the same "Score: X / 5" text reports
+        the separate judges produce, so downstream parsing is unchanged.
+        """
+        try:
+            payload = json.loads(raw)
+        except json.JSONDecodeError:
+            payload = None
+        if not isinstance(payload, dict):
+            # Valid JSON that is not an object goes down the same re-ask path
+            error = f"Error: unparseable judge output: {raw[:200]}"
+            return JudgeResult(faithfulness=error, completeness=error, robustness=error)
+
+        reports = {}
+        for name in CRITERIA:
+            item = payload.get(name)
+            if not isinstance(item, dict):
+                reports[name] = f"Error: no {name} object in judge output: {raw[:200]}"
+                continue
+
+            lines = [
+                f"Score: {item.get('score')} / 5",
+                f"Verdict: {item.get('verdict', '')}",
+                "",
+                "Reasoning:",
+            ]
+            lines += [f"- {point}" for point in _as_list(item.get("reasoning"))]
+
+            if name == "completeness":
+                missing = _as_list(item.get("missing_elements")) or ["None"]
+                lines += ["", "Missing Elements:"]
+                lines += [f"- {point}" for point in missing]
+
+            reports[name] = "\n".join(lines)
+
+        return JudgeResult(**reports)
+
+    def judge_combined(self, original: str, generated: str, robustness_original: str = None) -> JudgeResult:
+        prompts = self._combined_prompts(original, generated, robustness_original)
+        raw = self._call_judge(*prompts, response_format=COMBINED_RESPONSE_FORMAT, judge="combined")
+        with span("parse_combined"):
+            result = self._format_combined(raw)
+
+        for _ in range(self.parse_retries):
+            reason = self._unparseable(vars(result))
+            if not reason:
+                break
+            print(f"⚠️ Unparseable combined report ({reason}); asking again")
+            raw = self._call_judge(
+                *prompts, response_format=COMBINED_RESPONSE_FORMAT, judge="combined", retry=(raw, reason)
+            )
+            with span("parse_combined"):
+                result = self._format_combined(raw)
+        return result
+
+    # ---------------- JUDGES ----------------
+    def _judge(self, prompts: tuple, judge: str) -> str:
+        """One judge call, re-asked up to parse_retries times while unparseable."""
+        report = self._call_judge(*prompts, judge=judge)
+        for _ in range(self.parse_retries):
+            reason = self._unparseable({judge: report})
+            if not reason:
+                break
+            print(f"⚠️ Unparseable {judge} report ({reason}); asking again")
+            report = self._call_judge(*prompts, judge=judge, retry=(report, reason))
+        return report
+
+    def _judge_criterion(self, prompts: tuple, judge: str) -> str:
+        if self.mode == "score":
+            return self._judge_score_only(prompts, judge)
+        return self._judge(prompts, judge)
+
+    def judge_faithfulness(self, original: str, generated: str) -> str:
+        return self._judge_criterion(self._faithfulness_prompts(original, generated), "faithfulness")
+
+    def judge_completeness(self, original: str, generated: str) -> str:
+        return self._judge_criterion(self._completeness_prompts(original, generated), "completeness")
+
+    def judge_robustness(self, original: str, generated: str) -> str:
+        return self._judge_criterion(self._robustness_prompts(original, generated), "robustness")
+
+    def judge_all(self, original: str, generated: str, robustness_original: str = None) -> JudgeResult:
+        """
+        Runs the three judges concurrently on worker threads, so the
+        latency is that of the slowest judge rather than the sum.
+        `robustness_original` lets robustness be judged against a
+        different source (e.g. the full email instead of an excerpt).
+        """
+        if self.mode == "combined":
+            return self.judge_combined(original, generated, robustness_original)
+
+        if robustness_original is None:
+            robustness_original = original
+
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            # Each judge runs in a copy of the caller's context (usage tags)
+            def submit(fn, *args):
+                return executor.submit(contextvars.copy_context().run, fn, *args)
+
+            faith = submit(self.judge_faithfulness, original, generated)
+            comp = submit(self.judge_completeness, original, generated)
+            rob = submit(self.judge_robustness, robustness_original, generated)
+
+            return JudgeResult(
+                faithfulness=faith.result(),
+                completeness=comp.result(),
+                robustness=rob.result(),
+            )
+
+
+class AsyncLLMEvaluator(LLMEvaluator):
+    """
+    asyncio version of LLMEvaluator backed by AsyncAzureOpenAI.
+    Uses exactly the same judge prompts as the sync evaluator.
+
+    `semaphore` (optional asyncio.Semaphore) bounds requests in flight;
+    it can be shared with an AsyncGenerateEmail.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        mode: str = "separate",
+        cache: ResponseCache = None,
+        semaphore: asyncio.Semaphore = None,
+    ):
+        super().__init__(model, mode, cache)
+        self.semaphore = semaphore
+
+    @staticmethod
+    def _make_client():
+        return get_client(async_client=True)
+
+    async def _call_judge(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        response_format: dict = None,
+        judge: str = None,
+        retry: tuple = None,
+        params: dict = None,
+    ) -> str:
+        messages = self._judge_messages(system_prompt, user_prompt, retry)
+        extra = {"response_format": response_format} if response_format else {}
+        extra.update(params or {})
+
+        # Score-only calls are their own kind in the usage summary
+        kind = "score" if extra.get("logprobs") else "judge"
+        with span(kind, judge=judge, retry=retry is not None), \
+                track_call(kind, self.model, judge=judge) as call:
+            key = self.cache.make_key(self.model, messages, 0, **extra)
+            cached = self.cache.get(key)
+            if cached is not None:
+                call["cached"] = True
+                return cached
+
+            async with self.semaphore or contextlib.nullcontext():
+                response = await self.limiter.acall(
+                    lambda: self.client.chat.completions.create(
+                        model=self.model,
+                        messages=messages,
+                        temperature=0,
+                        **extra
+                    ),
+                    estimate_tokens(messages),
+                    call,
+                )
+            call["response"] = response
+            self._record_usage(response)
+            content = self._content(response, extra)
+
+            self.cache.set(key, content)
+            return content
+
+    async def _judge(self, prompts: tuple, judge: str) -> str:
+        report = await self._call_judge(*prompts, judge=judge)
+        for _ in range(self.parse_retries):
+            reason = self._unparseable({judge: report})
+            if not reason:
+                break
+            print(f"⚠️ Unparseable {judge} report ({reason}); asking again")
+            report = await self._call_judge(*prompts, judge=judge, retry=(report, reason))
+        return report
+
+    async def _judge_score_only(self, prompts: tuple, judge: str) -> str:
+        raw = await self._call_judge(
+            *self._score_only_prompts(prompts, judge), judge=judge, params=self._score_params()
+        )
+        return self._score_report(raw) or await self._judge(prompts, judge)
+
+    async def _judge_criterion(self, prompts: tuple, judge: str) -> str:
+        if self.mode == "score":
+            return await self._judge_score_only(prompts, judge)
+        return await self._judge(prompts, judge)
+
+    async def judge_faithfulness(self, original: str, generated: str) -> str:
+        return await self._judge_criterion(self._faithfulness_prompts(original, generated), "faithfulness")
+
+    async def judge_completeness(self, original: str, generated: str) -> str:
+        return await self._judge_criterion(self._completeness_prompts(original, generated), "completeness")
+
+    async def judge_robustness(self, original: str, generated: str) -> str:
+        return await self._judge_criterion(self._robustness_prompts(original, generated), "robustness")
+
+    async def judge_combined(self, original: str, generated: str, robustness_original: str = None) -> JudgeResult:
+        prompts = self._combined_prompts(original, generated, robustness_original)
+        raw = await self._call_judge(*prompts, response_format=COMBINED_RESPONSE_FORMAT, judge="combined")
+        with span("parse_combined"):
+            result = self._format_combined(raw)
+
+        for _ in range(self.parse_retries):
+            reason = self._unparseable(vars(result))
+            if not reason:
+                break
+            print(f"⚠️ Unparseable combined report ({reason}); asking again")
+            raw = await self._call_judge(
+                *prompts, response_format=COMBINED_RESPONSE_FORMAT, judge="combined", retry=(raw, reason)
+            )
+            with span("parse_combined"):
+                result = self._format_combined(raw)
+        return result
+
+    async def judge_all(self, original: str, generated: str, robustness_original: str = None) -> JudgeResult:
+        if self.mode == "combined":
+            return await self.judge_combined(original, generated, robustness_original)
+
+        if robustness_original is None:
+            robustness_original = original
+
+        faith, comp, rob = await asyncio.gather(
+            self.judge_faithfulness(original, generated),
+            self.judge_completeness(original, generated),
+            self.judge_robustness(robustness_original, generated),
+        )
+        return JudgeResult(faithfulness=faith, completeness=comp, robustness=rob)
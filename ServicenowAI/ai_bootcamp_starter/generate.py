@@ -1,87 +1,296 @@
-import os
-import yaml
+import asyncio
+import contextlib
 from dotenv import load_dotenv
-from openai import AzureOpenAI
+from clients import get_client
+from rate_limit import get_limiter, estimate_tokens
+from response_cache import ResponseCache, get_default_cache
+from prompt_registry import PromptRegistry, get_prompt_registry
+from usage_metrics import track_call
+from tracing import span
 
 load_dotenv()
-import os
-import yaml
 
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-PROMPT_PATH = os.path.join(BASE_DIR, "prompts.yaml")
+# Short header/sign-off lines stripped from generated bodies
+BANNED_STARTS = ("subject:", "dear", "regards:", "sincerely,", "best,")
 
-with open(PROMPT_PATH, "r", encoding="utf-8") as f:
-    prompts = yaml.safe_load(f)
+
+class BodyCleaner:
+    """
+    Incremental version of GenerateEmail._clean_body for streamed text.
+
+    feed() takes raw chunks and returns the cleaned text that is safe to
+    show so far; flush() returns whatever is left at the end. A line is
+    held back only while it could still turn out to be a short banned
+    header (fewer than 4 words starting with a BANNED_STARTS prefix), so
+    normal prose is passed through almost immediately. Leading/trailing
+    whitespace is dropped like the final .strip() in _clean_body.
+    """
+
+    def __init__(self):
+        self._raw = []
+        self._line = ""
+        self._line_kept = False
+        self._pending_ws = ""
+        self._emitted = False
+        self._lines_kept = 0
+        self._after_cr = False
+
+    @staticmethod
+    def _decide(line: str):
+        """True = keep, False = drop, None = not decidable yet."""
+        low = line.lower().strip()
+        if len(low.split()) >= 4:
+            return True
+        if low.startswith(BANNED_STARTS):
+            return None
+        if low and not any(b.startswith(low) for b in BANNED_STARTS):
+            return True
+        return None
+
+    def _write(self, text: str) -> str:
+        # Hold whitespace until real content follows, so the output is stripped
+        out = []
+        for ch in text:
+            if ch.isspace():
+                if self._emitted:
+                    self._pending_ws += ch
+            else:
+                out.append(self._pending_ws)
+                out.append(ch)
+                self._pending_ws = ""
+                self._emitted = True
+        return "".join(out)
+
+    def _start_line(self) -> str:
+        sep = "\n" if self._lines_kept else ""
+        self._lines_kept += 1
+        self._line_kept = True
+        return self._write(sep + self._line)
+
+    def feed(self, chunk: str) -> str:
+        self._raw.append(chunk)
+        out = []
+
+        # A "\r\n" split across two chunks is still a single line break
+        if self._after_cr and chunk.startswith("\n"):
+            chunk = chunk[1:]
+        if chunk:
+            self._after_cr = chunk.endswith("\r")
+
+        for part in chunk.splitlines(keepends=True):
+            ended = part.endswith(("\n", "\r"))
+            text = part.rstrip("\r\n")
+
+            if self._line_kept:
+                out.append(self._write(text))
+            else:
+                self._line += text
+                if self._decide(self._line):
+                    out.append(self._start_line())
+
+            if ended:
+                if not self._line_kept and self._decide(self._line) is None:
+                    low = self._line.lower().strip()
+                    if not (len(low.split()) < 4 and low.startswith(BANNED_STARTS)):
+                        out.append(self._start_line())
+                self._line = ""
+                self._line_kept = False
+
+        return "".join(out)
+
+    def flush(self) -> str:
+        out = ""
+        if self._line and not self._line_kept:
+            low = self._line.lower().strip()
+            if not (len(low.split()) < 4 and low.startswith(BANNED_STARTS)):
+                out = self._start_line()
+
+        if not self._emitted and not out:
+            # Same fallback as _clean_body: never return an empty body
+            return self.raw_text()
+        return out
+
+    def raw_text(self) -> str:
+        """Everything fed so far, stripped as _call_api would return it."""
+        return "".join(self._raw).strip()
 
 
 class GenerateEmail:
-    def __init__(self, model: str):
-        self.client = AzureOpenAI(
-            azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-            api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-            api_version=os.getenv("AZURE_OPENAI_API_VERSION")
-        )
+    temperature = 0.7
+
+    def __init__(self, model: str, cache: ResponseCache = None, prompts: PromptRegistry = None):
+        self.client = self._make_client()
         self.model = model
+        self.cache = cache if cache is not None else get_default_cache()
+        self.limiter = get_limiter(model)
+        self.prompts = prompts or get_prompt_registry()
 
-    def _call_api(self, messages):
-        try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=0.7,
-            )
-            return response.choices[0].message.content.strip()
-        except Exception as e:
-            return f"Error: {str(e)}"
+    @property
+    def prompt_version(self) -> str:
+        """Hash of the prompts currently in use, for cache and result keys."""
+        return self.prompts.version
 
-    def get_prompt(self, action, role, **kwargs):
-        if action not in prompts:
-            raise ValueError(f"Prompt action '{action}' not found in prompts.yaml")
+    @staticmethod
+    def _make_client():
+        return get_client()
+
+    def _call_api(self, messages, action: str = None):
+        """
+        Paced and retried through the deployment's shared RateLimiter.
+        Raises (rate_limit.ModelCallError once retries run out) instead
+        of returning an error string, so failures are never scored.
+        """
+        with track_call("generate", self.model, action=action) as call:
+            key = self.cache.make_key(self.model, messages, self.temperature)
+            cached = self.cache.get(key)
+            if cached is not None:
+                call["cached"] = True
+                return cached
 
-        if role not in prompts[action]:
-            raise ValueError(f"Role '{role}' missing under '{action}' in prompts.yaml")
+            response = self.limiter.call(
+                lambda: self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=self.temperature,
+                ),
+                estimate_tokens(messages),
+                call,
+            )
+            call["response"] = response
+            content = response.choices[0].message.content.strip()
 
-        template = prompts[action][role]
-        return template.format(**kwargs)
+            self.cache.set(key, content)
+            return content
+
+    def get_prompt(self, action, role, **kwargs):
+        return self.prompts.render(action, role, **kwargs)
 
     @staticmethod
     def _clean_body(text: str) -> str:
-        banned_starts = ("subject:", "dear", "regards:", "sincerely,", "best,")
         lines = text.splitlines()
         cleaned = []
 
         for line in lines:
             low = line.lower().strip()
-            if len(low.split()) < 4 and low.startswith(banned_starts):
+            if len(low.split()) < 4 and low.startswith(BANNED_STARTS):
                 continue
             cleaned.append(line)
 
         return "\n".join(cleaned).strip() or text
 
+    def build_messages(self, action: str, selected_text: str, tone_type: str = "Professional") -> list:
+        return self.prompts.messages(action, selected_text=selected_text, tone_type=tone_type)
+
     def generate(self, action: str, selected_text: str, tone_type: str = "Professional") -> str:
-        args = {
-            "selected_text": selected_text,
-            "tone_type": tone_type,
-        }
+        with span("generate", action=action, tone=tone_type, input_chars=len(selected_text)):
+            messages = self.build_messages(action, selected_text, tone_type)
+
+            raw_output = self._call_api(messages, action)
+            with span("clean_body"):
+                return self._clean_body(raw_output)
+
+    def generate_stream(self, action: str, selected_text: str, tone_type: str = "Professional"):
+        """
+        Like generate(), but yields cleaned text chunks as tokens arrive
+        (stream=True). Opening the stream is paced and retried like
+        _call_api, and the limiter slot is held until the stream ends;
+        failures (including mid-stream ones) are raised.
+        """
+        messages = self.build_messages(action, selected_text, tone_type)
+
+        # Streamed responses carry no usage block, so tokens are not counted here
+        with span("generate", action=action, tone=tone_type, input_chars=len(selected_text), stream=True), \
+                track_call("generate", self.model, action=action) as call:
+            key = self.cache.make_key(self.model, messages, self.temperature)
+            cached = self.cache.get(key)
+            if cached is not None:
+                call["cached"] = True
+                yield self._clean_body(cached)
+                return
+
+            cleaner = BodyCleaner()
+            chunks = self.limiter.stream(
+                lambda: self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=self.temperature,
+                    stream=True,
+                ),
+                estimate_tokens(messages),
+                call,
+            )
+            # Closing releases the limiter slot if the reader stops early
+            with contextlib.closing(chunks):
+                for chunk in chunks:
+                    # Azure sends content-filter chunks without choices
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if not delta:
+                        continue
+
+                    text = cleaner.feed(delta)
+                    if text:
+                        yield text
+
+            tail = cleaner.flush()
+            if tail:
+                yield tail
+
+            self.cache.set(key, cleaner.raw_text())
 
-        system_prompt = (
-            "You are a professional writing assistant.\n"
-            "Rules:\n"
-            "- Output ONLY the rewritten paragraph content.\n"
-            "- Do NOT include subject lines, greetings, or signatures.\n"
-            "- Do NOT provide explanations.\n"
-            "- Return plain text only."
-        )
 
-        user_prompt = self.get_prompt(action, "user", **args)
+class AsyncGenerateEmail(GenerateEmail):
+    """
+    asyncio version of GenerateEmail backed by AsyncAzureOpenAI.
+    Prompt building and body cleaning are shared with the sync class.
+
+    `semaphore` (optional asyncio.Semaphore) bounds requests in flight;
+    it can be shared with an AsyncLLMEvaluator.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        cache: ResponseCache = None,
+        semaphore: asyncio.Semaphore = None,
+        prompts: PromptRegistry = None,
+    ):
+        super().__init__(model, cache, prompts)
+        self.semaphore = semaphore
+
+    @staticmethod
+    def _make_client():
+        return get_client(async_client=True)
 
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt},
-        ]
+    async def _call_api(self, messages, action: str = None):
+        with track_call("generate", self.model, action=action) as call:
+            key = self.cache.make_key(self.model, messages, self.temperature)
+            cached = self.cache.get(key)
+            if cached is not None:
+                call["cached"] = True
+                return cached
 
-        raw_output = self._call_api(messages)
-        return self._clean_body(raw_output)
+            async with self.semaphore or contextlib.nullcontext():
+                response = await self.limiter.acall(
+                    lambda: self.client.chat.completions.create(
+                        model=self.model,
+                        messages=messages,
+                        temperature=self.temperature,
+                    ),
+                    estimate_tokens(messages),
+                    call,
+                )
+            call["response"] = response
+            content = response.choices[0].message.content.strip()
 
+            self.cache.set(key, content)
+            return content
 
+    async def generate(self, action: str, selected_text: str, tone_type: str = "Professional") -> str:
+        with span("generate", action=action, tone=tone_type, input_chars=len(selected_text)):
+            messages = self.build_messages(action, selected_text, tone_type)
 
+            raw_output = await self._call_api(messages, action)
+            with span("clean_body"):
+                return self._clean_body(raw_output)
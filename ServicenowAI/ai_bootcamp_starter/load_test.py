@@ -0,0 +1,273 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import itertools
+import json
+import math
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from mock_openai_server import MockOpenAIServer, add_config_arguments, config_from_args
+
+SCENARIOS = (
+    "generate",
+    "judge",
+    "evaluate_dataset",
+    "synthetic_parallel",
+    "experimental_parallel",
+)
+
+
+# ---------------- ENVIRONMENT ----------------
+def configure_environment(endpoint: str, max_concurrency: int):
+    """
+    Points every client at `endpoint` and lifts the quota pacing so the
+    measured limit is the server, not the local token buckets. Must run
+    before the project modules are imported.
+    """
+    os.environ["AZURE_OPENAI_ENDPOINT"] = endpoint
+    os.environ.setdefault("AZURE_OPENAI_API_KEY", "mock")
+    os.environ.setdefault("AZURE_OPENAI_API_VERSION", "2024-06-01")
+    os.environ["RESPONSE_CACHE_DISABLE"] = "1"
+    os.environ["MODEL_RPM"] = "1000000"
+    os.environ["MODEL_TPM"] = "1000000000"
+    os.environ["MODEL_INITIAL_CONCURRENCY"] = str(max_concurrency)
+    os.environ["MODEL_MAX_CONCURRENCY"] = str(max_concurrency)
+
+
+def fresh_state():
+    # New limiters (AIMD starts over) and new pooled clients for each run
+    from clients import reset_clients
+    from rate_limit import reset_limiters
+
+    reset_clients()
+    reset_limiters()
+
+
+def timed(obj, method: str, samples: list):
+    """Wraps obj.method on the instance, appending each call's duration."""
+    fn = getattr(obj, method)
+
+    if asyncio.iscoroutinefunction(fn):
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                samples.append(time.perf_counter() - start)
+    else:
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                samples.append(time.perf_counter() - start)
+
+    setattr(obj, method, wrapper)
+    return obj
+
+
+def sample_texts(n: int) -> list:
+    from dataset_registry import default_registry
+
+    records = default_registry().iter_records("SHORTEN")
+    texts = (r["content"].strip() for r in records if r.get("content", "").strip())
+    return list(itertools.islice(itertools.cycle(list(texts)), n))
+
+
+# ---------------- SCENARIOS ----------------
+# Each runs one pass at `concurrency`, appends per-model-call latencies
+# to `samples` and returns the number of items completed.
+def run_generate(concurrency, n, samples, models):
+    from generate import GenerateEmail
+    from response_cache import ResponseCache
+
+    generator = timed(GenerateEmail(models["gen"], cache=ResponseCache(enabled=False)), "_call_api", samples)
+    texts = sample_texts(n)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda text: generator.generate("shorten", text), texts))
+    return len(results)
+
+
+def run_judge(concurrency, n, samples, models):
+    from evaluate import LLMEvaluator
+    from response_cache import ResponseCache
+
+    evaluator = timed(
+        LLMEvaluator(models["judge"], mode=models["judge_mode"], cache=ResponseCache(enabled=False)),
+        "_call_judge", samples,
+    )
+    texts = sample_texts(n)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda text: evaluator.judge_all(text, text), texts))
+    return len(results)
+
+
+def run_evaluate_dataset(concurrency, n, samples, models):
+    """
+    Concurrency 1 runs the original sequential metrics.evaluate_dataset;
+    higher levels run the async engine, so the curve shows both.
+    """
+    import metrics
+    from generate import GenerateEmail, AsyncGenerateEmail
+    from evaluate import LLMEvaluator, AsyncLLMEvaluator
+    from response_cache import ResponseCache
+
+    no_cache = ResponseCache(enabled=False)
+    path, action = metrics.DATASETS["SHORTEN"]
+    used = []
+
+    # Plots and prints are not part of the measured path
+    report_results = metrics.report_results
+    metrics.report_results = lambda name, table: used.append(len(table))
+    try:
+        if concurrency == 1:
+            metrics.generator = timed(GenerateEmail(models["gen"], cache=no_cache), "_call_api", samples)
+            metrics.evaluator = timed(
+                LLMEvaluator(models["judge"], mode=models["judge_mode"], cache=no_cache),
+                "_call_judge", samples,
+            )
+            metrics.evaluate_dataset(metrics.load_jsonl(path), "SHORTEN", action, n)
+        else:
+            metrics.async_generator = timed(
+                AsyncGenerateEmail(models["gen"], cache=no_cache), "_call_api", samples
+            )
+            metrics.async_evaluator = timed(
+                AsyncLLMEvaluator(models["judge"], mode=models["judge_mode"], cache=no_cache),
+                "_call_judge", samples,
+            )
+            results = asyncio.run(
+                metrics.evaluate_all_async({"SHORTEN": (path, action)}, n, concurrency)
+            )
+            used.append(len(results["SHORTEN"]))
+    finally:
+        metrics.report_results = report_results
+    return sum(used)
+
+
+def run_synthetic_parallel(concurrency, n, samples, models, experimental=False):
+    # The generators have fixed task lists (36 emails); n does not apply
+    if experimental:
+        from optional_synthetic_email_generator import ExperimentalSyntheticEmailGenerator as Generator
+        from optional_synthetic_email_generator import generate_parallel, TASKS
+    else:
+        from synthetic_email_generator import SyntheticEmailGenerator as Generator
+        from synthetic_email_generator import generate_parallel, TASKS
+
+    generator = timed(Generator(models["gen"]), "generate_email", samples)
+    with tempfile.TemporaryDirectory() as tmp:
+        generate_parallel(generator, os.path.join(tmp, "out.jsonl"), max_workers=concurrency)
+    return len(TASKS)
+
+
+RUNNERS = {
+    "generate": run_generate,
+    "judge": run_judge,
+    "evaluate_dataset": run_evaluate_dataset,
+    "synthetic_parallel": run_synthetic_parallel,
+    "experimental_parallel": lambda *a: run_synthetic_parallel(*a, experimental=True),
+}
+
+
+# ---------------- MEASUREMENT ----------------
+def percentile(values, q):
+    if not values:
+        return None
+    # Nearest-rank percentile
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def measure(server, scenario, concurrency, n, models) -> dict:
+    fresh_state()
+    server.reset()
+    samples = []
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        items = RUNNERS[scenario](concurrency, n, samples, models)
+    wall = time.perf_counter() - start
+
+    stats = server.stats()
+    return {
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "items": items,
+        "calls": len(samples),
+        "requests": stats["requests"],
+        "throttled": stats["throttled"],
+        "errors": stats["errors"],
+        "peak_in_flight": stats["peak_in_flight"],
+        "wall_s": wall,
+        "items_per_s": items / wall if wall else 0.0,
+        "requests_per_s": stats["requests"] / wall if wall else 0.0,
+        "tokens_per_s": stats["completion_tokens"] / wall if wall else 0.0,
+        "p50_ms": (percentile(samples, 50) or 0) * 1000,
+        "p95_ms": (percentile(samples, 95) or 0) * 1000,
+        "p99_ms": (percentile(samples, 99) or 0) * 1000,
+    }
+
+
+def print_table(rows):
+    base = rows[0]["wall_s"]
+    print(f"\n{rows[0]['scenario'].upper()}")
+    print("-" * 96)
+    print(f"{'conc':>5} {'items':>6} {'reqs':>6} {'429':>5} {'5xx':>5} {'wall s':>8} "
+          f"{'items/s':>8} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'speedup':>8}")
+    for row in rows:
+        print(
+            f"{row['concurrency']:>5} {row['items']:>6} {row['requests']:>6} "
+            f"{row['throttled']:>5} {row['errors']:>5} {row['wall_s']:>8.2f} "
+            f"{row['items_per_s']:>8.2f} {row['requests_per_s']:>7.1f} "
+            f"{row['p50_ms']:>8.0f} {row['p95_ms']:>8.0f} {row['p99_ms']:>8.0f} "
+            f"{base / row['wall_s']:>7.2f}x"
+        )
+
+
+# ---------------- MAIN ----------------
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Load-test the generation and evaluation paths against a local mock deployment"
+    )
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument(
+        "--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16],
+        help="concurrency levels for the scaling curve"
+    )
+    parser.add_argument("--items", type=int, default=24, help="items per run (generate / judge / evaluate_dataset)")
+    parser.add_argument("--judge-mode", choices=("separate", "combined", "score"), default="separate")
+    parser.add_argument("--json", default=None, help="also write all rows to this JSON file")
+    add_config_arguments(parser)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    models = {"gen": "mock-gen", "judge": "mock-judge", "judge_mode": args.judge_mode}
+
+    with MockOpenAIServer(config_from_args(args)) as server:
+        configure_environment(server.url, max(args.concurrency))
+        print(f"🧪 Mock deployment at {server.url} "
+              f"({args.latency} {args.latency_ms:.0f} ms, {args.tokens_per_second:.0f} tok/s, "
+              f"429 {args.throttle_rate:.0%}, 5xx {args.error_rate:.0%})")
+        print("Latency percentiles are per model call, as seen by the caller (pacing and retries included).")
+
+        all_rows = []
+        for scenario in args.scenarios:
+            rows = [measure(server, scenario, c, args.items, models) for c in args.concurrency]
+            print_table(rows)
+            all_rows.extend(rows)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(all_rows, f, indent=2)
+        print(f"\nWrote {len(all_rows)} rows to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,29 @@
-import json
+import argparse
+import asyncio
+import itertools
+import math
 import os
-import re
+import time
+from concurrent.futures import ProcessPoolExecutor
 from dotenv import load_dotenv
-from generate import GenerateEmail
-from evaluate import LLMEvaluator
-import matplotlib.pyplot as plt
+from generate import GenerateEmail, AsyncGenerateEmail
+from evaluate import LLMEvaluator, AsyncLLMEvaluator, JUDGE_MODES, CRITERIA
+from score_parser import parse_score
+from response_cache import get_default_cache
+from clients import format_connection_stats, reset_clients
+from usage_metrics import usage, usage_tags, count_calls
+import tracing
+from tracing import span
+from results_store import ResultsStore, DEFAULT_RESULTS_PATH
+from dataset_registry import default_registry, iter_dataset, parse_filter
+import rate_limit
+import results_table
+from results_table import build_table
+from report import ReportBuilder, DEFAULT_REPORT_PATH
+import adaptive
+from adaptive import StoppingRule
+from dedup import Deduplicator, DEFAULT_THRESHOLD as DEDUP_DEFAULT
+from precheck import Prechecker, POLICIES as PRECHECK_POLICIES, POLICY as PRECHECK_POLICY, AUDIT_RATE
 
 # ---------------- ENV ----------------
 load_dotenv()
@@ -12,130 +31,822 @@ load_dotenv()
 MODEL_GEN = os.getenv("AZURE_GPT_41_DEPLOYMENT", "gpt-4.1")
 MODEL_JUDGE = os.getenv("AZURE_GPT_4O_MINI_DEPLOYMENT", "gpt-4o-mini")
 
+# "separate" = three judge prompts, "combined" = one JSON-schema call
+JUDGE_MODE = os.getenv("JUDGE_MODE", "separate")
+
 generator = GenerateEmail(model=MODEL_GEN)
-evaluator = LLMEvaluator(model=MODEL_JUDGE)
+evaluator = LLMEvaluator(model=MODEL_JUDGE, mode=JUDGE_MODE)
+
+async_generator = AsyncGenerateEmail(model=MODEL_GEN)
+async_evaluator = AsyncLLMEvaluator(model=MODEL_JUDGE, mode=JUDGE_MODE)
+
+# Max model requests in flight at once for the async engine
+DEFAULT_CONCURRENCY = int(os.getenv("EVAL_CONCURRENCY", "8"))
+
+# Records scheduled per round when scoring a whole corpus
+ROUND_SIZE = 512
+
+# Target tone when scoring the TONE dataset
+EVAL_TONE = "Professional"
+
+# Copied from experimental synthetic records into the results table
+EXPERIMENTAL_FIELDS = ("structure_type", "ambiguity_level", "noise_level")
 
-DATASETS = {
-    "SHORTEN": ("C:\\Users\\User\\Desktop\\ServicenowAI\\ai_bootcamp_starter\\datasets\\shorten.jsonl", "shorten"),
-    "LENGTHEN": ("C:\\Users\\User\\Desktop\\ServicenowAI\\ai_bootcamp_starter\\datasets\\lengthen.jsonl", "lengthen"),
-    "TONE": ("C:\\Users\\User\\Desktop\\ServicenowAI\\ai_bootcamp_starter\\datasets\\tone.jsonl", "tone"),
-}
+# Checkpoint of scored samples (set up in __main__); with RESUME on,
+# samples already in the store are reused instead of re-scored
+results_store = None
+RESUME = False
+
+# Collects charts for the HTML/PNG report (set up in __main__)
+reporter = None
+
+# Jaccard threshold for dropping near-duplicate records before scoring
+# (set with --dedup); None scores every record
+DEDUP_THRESHOLD = None
+
+# Local checks run on every rewrite before the LLM judges (see precheck.py)
+prechecker = Prechecker()
+
+# Dataset files live under datasets/ next to this file unless
+# EMAIL_DATA_ROOT or --data-root points somewhere else
+registry = default_registry()
+DATASETS = registry.evaluation_datasets()
 
 # ---------------- HELPERS ----------------
-def load_jsonl(path):
-    if not os.path.exists(path):
-        print(f"❌ File not found: {path}")
-        return []
-
-    records = []
-    with open(path, "r", encoding="utf-8") as f:
-        for line in f:
-            try:
-                records.append(json.loads(line))
-            except json.JSONDecodeError:
+def load_jsonl(path, **options):
+    """Lazy record stream (JSONL, Parquet or Arrow); see dataset_registry.iter_dataset."""
+    return iter_dataset(path, **options)
+
+
+def _deduplicated(records, numbered=False):
+    """(records, Deduplicator) with near-duplicates dropped, or (records, None) when off."""
+    if DEDUP_THRESHOLD is None:
+        return records, None
+    dedup = Deduplicator(DEDUP_THRESHOLD)
+    return dedup.filter(records, numbered=numbered), dedup
+
+
+def _report_dedup(name, dedup):
+    if dedup is not None and dedup.duplicates:
+        print(f"🧹 {name}: skipped {dedup.duplicates} near-duplicate records")
+
+
+def evaluate_dataset(records, name, action, max_samples=10):
+    """Scores records one at a time, reports them and returns the result rows."""
+    rows = []
+    records, dedup = _deduplicated(records)
+
+    print(f"\n{name} RESULTS")
+    print("-" * 40)
+
+    with usage_tags(dataset=name), span("dataset", dataset=name, action=action):
+        for rec in records:
+            if max_samples and len(rows) >= max_samples:
+                break
+
+            row = _score_record(rec, name, action)
+            if row is None:
                 continue
-    return records
 
+            rows.append(row)
+            print(f"✓ Evaluated sample {len(rows)}")
 
-def extract_score(text):
-    if not text:
-        return None
-    match = re.search(r"([0-5])\s*(/5)?", text)
-    return int(match.group(1)) if match else None
+    _report_dedup(name, dedup)
+    report_results(name, build_table(rows))
+    return rows
 
 
-def plot_averages(name, faith, comp, rob):
-    plt.figure()
-    plt.bar(
-        ["Faithfulness", "Completeness", "Robustness"],
-        [sum(faith) / len(faith), sum(comp) / len(comp), sum(rob) / len(rob)]
-    )
-    plt.title(f"{name} – Average Evaluation Scores")
-    plt.ylim(0, 5)
-    plt.ylabel("Score (0–5)")
-    plt.show()
+def _calls_per_judgment():
+    """Judge requests one rewrite costs (parse retries not counted)."""
+    return 1 if evaluator.mode == "combined" else len(CRITERIA)
 
 
-def plot_trends(name, faith, comp, rob):
-    plt.figure()
-    plt.plot(faith, label="Faithfulness")
-    plt.plot(comp, label="Completeness")
-    plt.plot(rob, label="Robustness")
-    plt.title(f"{name} – Score Trend Across Samples")
-    plt.xlabel("Sample Index")
-    plt.ylabel("Score (0–5)")
-    plt.ylim(0, 5)
-    plt.legend()
-    plt.show()
+def _adaptive_order(records, seed):
+    """Records in stratified random order (the whole dataset is read first)."""
+    records = list(records)
+    order = adaptive.stratified_order([adaptive.stratum(rec) for rec in records], seed)
+    return [records[i] for i in order]
 
 
-def evaluate_dataset(records, name, action, max_samples=10):
-    faith, comp, rob = [], [], []
+def _report_adaptive(name, rule, attempted, total, calls):
+    print(f"\n{name} ADAPTIVE SAMPLING")
+    print("-" * 40)
+    print(adaptive.format_savings(rule, attempted, total, calls))
+
+
+def evaluate_dataset_adaptive(records, name, action, rule):
+    """
+    evaluate_dataset that scores records in stratified random order
+    until `rule` (a StoppingRule) is met, then reports the samples and
+    calls saved against a full pass.
+    """
+    rows = []
+    records, dedup = _deduplicated(records)
+    ordered = _adaptive_order(records, rule.seed)
+    attempted = 0
 
     print(f"\n{name} RESULTS")
     print("-" * 40)
 
-    used = 0
+    with usage_tags(dataset=name), span("dataset", dataset=name, action=action), count_calls() as calls:
+        for rec in ordered:
+            if rule.done():
+                break
 
-    for rec in records:
-        if used >= max_samples:
-            break
+            attempted += 1
+            row = _score_record(rec, name, action)
+            if row is None:
+                continue
 
-        original = rec.get("content", "").strip()
-        if not original:
-            continue
+            rows.append(row)
+            rule.add(row)
+            print(f"✓ Evaluated sample {len(rows)}")
 
-        try:
-            if action == "tone":
-                generated = generator.generate(
-                    "tone", original, tone_type="Professional"
-                )
+    _report_dedup(name, dedup)
+    report_results(name, build_table(rows))
+    _report_adaptive(name, rule, attempted, len(ordered), calls["calls"])
+    return rows
+
+
+def _parse_scores(judged):
+    """(f, c, r); a criterion whose report cannot be parsed is None."""
+    scores = []
+    with span("parse"):
+        for name in CRITERIA:
+            score, error = parse_score(getattr(judged, name))
+            if error is not None:
+                print(f"⚠️ Unparseable {name} report: {error}")
+            scores.append(score)
+    return tuple(scores)
+
+
+def _score_record(rec, name, action):
+    """
+    Generates and judges one record (judges on worker threads).
+    Returns its result row, or None when the record is skipped or a
+    score is missing.
+    """
+    original = rec.get("content", "").strip()
+    if not original:
+        return None
+
+    with span("record", dataset=name, id=rec.get("id"), input_chars=len(original)) as sp:
+        done = _resume_lookup(name, rec)
+        if done is not None:
+            sp.set_attribute("resumed", True)
+            return _valid(_result_row(rec, name, action, *done))
+
+        started = time.perf_counter()
+        with count_calls() as calls:
+            try:
+                if action == "tone":
+                    generated = generator.generate(
+                        "tone", original, tone_type=EVAL_TONE
+                    )
+                else:
+                    generated = generator.generate(action, original)
+            except Exception as e:
+                print("⚠️ Generation failed:", e)
+                return None
+
+            check = prechecker.check(original, generated, action)
+            scored_by = "llm"
+            if prechecker.needs_judges(check, f"{name}:{rec.get('id')}", _calls_per_judgment()):
+                try:
+                    judged = evaluator.judge_all(original, generated)
+                except Exception as e:
+                    print("⚠️ Evaluation failed:", e)
+                    return None
+                scores = _parse_scores(judged)
+                prechecker.compare(check, scores)
             else:
-                generated = generator.generate(action, original)
-        except Exception as e:
-            print("⚠️ Generation failed:", e)
-            continue
-
-        try:
-            f = extract_score(
-                evaluator.judge_faithfulness(original, generated)
-            )
-            c = extract_score(
-                evaluator.judge_completeness(original, generated)
-            )
-            r = extract_score(
-                evaluator.judge_robustness(original, generated)
-            )
-        except Exception as e:
-            print("⚠️ Evaluation failed:", e)
-            continue
-
-        if None not in (f, c, r):
-            faith.append(f)
-            comp.append(c)
-            rob.append(r)
-            used += 1
-            print(f"✓ Evaluated sample {used}")
-
-    if used == 0:
+                scores, scored_by = check.scores, "precheck"
+
+        row = _result_row(
+            rec, name, action, scores, time.perf_counter() - started, calls["tokens"],
+            scored_by, check.label if check else None,
+        )
+        _checkpoint(row)
+        return _valid(row)
+
+
+def report_results(name, table):
+    """Prints one dataset's results and queues its charts for the report."""
+    summary = results_table.summarize(table, by=())
+
+    if summary.empty:
         print("⚠️ No valid samples evaluated")
         return
 
-    print(f"Faithfulness Avg : {sum(faith) / used:.2f}")
-    print(f"Completeness Avg : {sum(comp) / used:.2f}")
-    print(f"Robustness Avg   : {sum(rob) / used:.2f}")
-    print(f"Samples Used    : {used}")
+    row = summary.iloc[0]
+    for criterion, label in zip(CRITERIA, ("Faithfulness Avg :", "Completeness Avg :", "Robustness Avg   :")):
+        print(
+            f"{label} {row[f'{criterion}_mean']:.2f}"
+            f"  (95% CI {row[f'{criterion}_ci_low']:.2f}–{row[f'{criterion}_ci_high']:.2f})"
+        )
+    print(f"Samples Used    : {int(row['n'])}")
+
+    # 📊 VISUALIZATION (rendered off the scoring path, see report.py)
+    if reporter is not None:
+        reporter.add_dataset(name, table, summary)
+
+
+# ---------------- RESULT ROWS ----------------
+def _result_row(rec, name, action, scores, latency_s=None, tokens=None, scored_by="llm", precheck=None):
+    """One row of the results table (see results_table.COLUMNS)."""
+    f, c, r = scores
+    return {
+        "dataset": name,
+        "id": rec.get("id"),
+        "model": MODEL_GEN,
+        "judge_model": MODEL_JUDGE,
+        "prompts": generator.prompts.label,
+        "action": action,
+        "tone": EVAL_TONE if action == "tone" else None,
+        "faithfulness": f,
+        "completeness": c,
+        "robustness": r,
+        "latency_s": latency_s,
+        "tokens": tokens,
+        "input_chars": len(rec.get("content", "").strip()),
+        "scored_by": scored_by,
+        "precheck": precheck,
+        **{field: rec.get(field) for field in EXPERIMENTAL_FIELDS},
+    }
+
+
+def _valid(row):
+    return None if any(row[c] is None for c in CRITERIA) else row
+
+
+# ---------------- CHECKPOINTS ----------------
+def _store_key(name, rec):
+    return ResultsStore.make_key(
+        name, rec.get("id"), MODEL_GEN, generator.prompt_version, MODEL_JUDGE, evaluator.mode
+    )
+
+
+def _resume_lookup(name, rec):
+    """
+    ((f, c, r), latency_s, tokens, scored_by, precheck) from the results store when resuming
+    and this record was already scored (scores may be None if its
+    reports were unparseable), otherwise None.
+    """
+    if not RESUME or results_store is None:
+        return None
+
+    row = results_store.get(_store_key(name, rec))
+    if row is None:
+        return None
+    scores = (row["faithfulness"], row["completeness"], row["robustness"])
+    return scores, row.get("latency_s"), row.get("tokens"), row.get("scored_by", "llm"), row.get("precheck")
+
+
+def _checkpoint(row):
+    if results_store is None:
+        return
+
+    results_store.append({
+        **row,
+        "prompt_version": generator.prompt_version,
+        "judge_mode": evaluator.mode,
+    })
+
+
+# ---------------- ASYNC ENGINE ----------------
+async def _score_record_async(rec, name, action):
+    """
+    Generates and judges one record; the three judges run concurrently.
+    Returns its result row, or None when the record is skipped or a
+    score is missing.
+    """
+    original = rec.get("content", "").strip()
+    if not original:
+        return None
+
+    with span("record", dataset=name, id=rec.get("id"), input_chars=len(original)) as sp:
+        done = _resume_lookup(name, rec)
+        if done is not None:
+            sp.set_attribute("resumed", True)
+            return _valid(_result_row(rec, name, action, *done))
+
+        started = time.perf_counter()
+        with count_calls() as calls:
+            try:
+                if action == "tone":
+                    generated = await async_generator.generate(
+                        "tone", original, tone_type=EVAL_TONE
+                    )
+                else:
+                    generated = await async_generator.generate(action, original)
+            except Exception as e:
+                print("⚠️ Generation failed:", e)
+                return None
+
+            check = prechecker.check(original, generated, action)
+            scored_by = "llm"
+            if prechecker.needs_judges(check, f"{name}:{rec.get('id')}", _calls_per_judgment()):
+                try:
+                    judged = await async_evaluator.judge_all(original, generated)
+                except Exception as e:
+                    print("⚠️ Evaluation failed:", e)
+                    return None
+                scores = _parse_scores(judged)
+                prechecker.compare(check, scores)
+            else:
+                scores, scored_by = check.scores, "precheck"
+
+        row = _result_row(
+            rec, name, action, scores, time.perf_counter() - started, calls["tokens"],
+            scored_by, check.label if check else None,
+        )
+        _checkpoint(row)
+        return _valid(row)
+
+
+async def _collect_scores_async(numbered_records, name, action, max_samples=10):
+    """
+    Scores (position, record) pairs and returns [(position, row)]
+    for the first `max_samples` records that produce three valid scores
+    (all of them when max_samples is 0). Records are scheduled in rounds
+    sized to the number of samples still missing (at most ROUND_SIZE),
+    so a small run is a single round. Concurrency is bounded by the
+    semaphore on the async clients.
+    """
+    limit = max_samples or math.inf
+    scored = []
+    remaining = iter(numbered_records)
+
+    with usage_tags(dataset=name), span("dataset", dataset=name, action=action):
+        while len(scored) < limit:
+            batch = list(itertools.islice(remaining, min(limit - len(scored), ROUND_SIZE)))
+            if not batch:
+                break
+
+            results = await asyncio.gather(
+                *(_score_record_async(rec, name, action) for _, rec in batch)
+            )
+            scored.extend(
+                (position, res)
+                for (position, _), res in zip(batch, results)
+                if res is not None
+            )
+
+    return scored
+
 
-    # 📊 VISUALIZATION
-    plot_averages(name, faith, comp, rob)
-    plot_trends(name, faith, comp, rob)
+def _rows(scored):
+    return [row for _, row in scored]
+
+
+async def evaluate_dataset_async(records, name, action, max_samples=10):
+    """
+    Concurrent version of evaluate_dataset, with the same sample
+    selection: the first `max_samples` records (in file order) that
+    produce three valid scores.
+    """
+    numbered, dedup = _deduplicated(enumerate(records), numbered=True)
+    scored = await _collect_scores_async(numbered, name, action, max_samples)
+    _report_dedup(name, dedup)
+    return _rows(scored)
+
+
+async def evaluate_dataset_adaptive_async(records, name, action, rule):
+    """
+    Concurrent evaluate_dataset_adaptive: scores adaptive.ROUND_SIZE
+    records at a time and checks `rule` between rounds.
+    """
+    rows = []
+    records, dedup = _deduplicated(records)
+    ordered = _adaptive_order(records, rule.seed)
+    attempted = 0
+
+    with usage_tags(dataset=name), span("dataset", dataset=name, action=action), count_calls() as calls:
+        while attempted < len(ordered) and not rule.done():
+            # First round fills up to min_samples, later ones are small for a prompt stop
+            size = rule.min_samples - rule.n if rule.n < rule.min_samples else adaptive.ROUND_SIZE
+            if rule.max_samples:
+                size = min(size, rule.max_samples - rule.n)
+            batch = ordered[attempted:attempted + size]
+            attempted += len(batch)
+
+            results = await asyncio.gather(*(_score_record_async(rec, name, action) for rec in batch))
+            for row in results:
+                if row is not None:
+                    rows.append(row)
+                    rule.add(row)
+
+    _report_dedup(name, dedup)
+    _report_adaptive(name, rule, attempted, len(ordered), calls["calls"])
+    return rows
+
+
+async def evaluate_all_async(
+    datasets, max_samples=10, concurrency=DEFAULT_CONCURRENCY, read_options=None, rules=None
+):
+    """
+    Runs every dataset at once over one shared concurrency limit.
+    `read_options` (skip / sample_rate / seed / shard) are passed to
+    load_jsonl. With `rules` ({name: StoppingRule}) the datasets are
+    evaluated adaptively instead. Returns {name: [result rows]}.
+    """
+    read_options = read_options or {}
+    sem = asyncio.Semaphore(concurrency)
+    async_generator.semaphore = sem
+    async_evaluator.semaphore = sem
+    names = list(datasets)
+
+    def evaluate(name):
+        records = load_jsonl(datasets[name][0], **read_options)
+        if rules:
+            return evaluate_dataset_adaptive_async(records, name, datasets[name][1], rules[name])
+        return evaluate_dataset_async(records, name, datasets[name][1], max_samples)
+
+    results = await asyncio.gather(*(evaluate(name) for name in names))
+    return dict(zip(names, results))
+
+
+# ---------------- SHARDED RUNNER ----------------
+def _init_shard_worker(judge_mode, cache_enabled, results_path, resume, workers, trace_output, precheck):
+    """Per-process setup: fresh clients, a share of the quota, own results handle."""
+    global async_generator, async_evaluator, results_store, RESUME, prechecker
+
+    # Spans are sent back to the parent, which writes them
+    tracing.configure(trace_output)
+
+    rate_limit.QUOTA_SHARE = 1 / workers
+    reset_clients()
+    rate_limit.reset_limiters()
+
+    async_generator = AsyncGenerateEmail(model=MODEL_GEN)
+    async_evaluator = AsyncLLMEvaluator(model=MODEL_JUDGE, mode=judge_mode)
+    evaluator.mode = judge_mode
+    get_default_cache().enabled = cache_enabled
+    results_store = ResultsStore(results_path) if results_path else None
+    RESUME = resume
+    prechecker = Prechecker(*precheck)
+
+
+def _run_shard(name, path, action, concurrency, read_options=None, exclude=frozenset(), records=None):
+    """
+    Scores one shard inside a worker: the (position, record) pairs in
+    `records` when the parent dealt them out, otherwise every line of
+    `path` selected by `read_options` except the line numbers in
+    `exclude` (near-duplicates found by the parent). Returns
+    ([(position, row)], usage state of this shard's model calls, its
+    finished spans, its pre-check stats).
+    """
+    usage.reset()
+    prechecker.reset()
+    tracing.tracer.drain()
+
+    async def run():
+        sem = asyncio.Semaphore(concurrency)
+        async_generator.semaphore = sem
+        async_evaluator.semaphore = sem
+        numbered = records
+        if numbered is None:
+            numbered = load_jsonl(path, numbered=True, **read_options)
+            if exclude:
+                numbered = (item for item in numbered if item[0] not in exclude)
+        return await _collect_scores_async(numbered, name, action, max_samples=0)
+
+    return asyncio.run(run()), usage.state(), tracing.tracer.drain(), prechecker.state()
+
+
+def merge_shards(shard_results, max_samples=10):
+    """
+    Reducer: puts the shards' rows back in file order and keeps the
+    first `max_samples` (a guard; budgeted runs never score more).
+    """
+    scored = sorted(itertools.chain.from_iterable(shard_results), key=lambda item: item[0])
+    if max_samples:
+        scored = scored[:max_samples]
+    return _rows(scored)
+
+
+def _deal(items, workers):
+    """Round-robin split of `items` into at most `workers` non-empty chunks."""
+    return [chunk for chunk in (items[w::workers] for w in range(workers)) if chunk]
+
+
+def evaluate_all_sharded(
+    datasets,
+    workers,
+    max_samples=10,
+    concurrency=DEFAULT_CONCURRENCY,
+    read_options=None,
+    results_path=None,
+):
+    """
+    Spreads every dataset across `workers` processes, each with its own
+    async client and `concurrency` requests in flight, and merges the
+    shards with merge_shards. Returns {name: [result rows]}.
+
+    With a budget the parent deals out only the records still needed:
+    the next `max_samples - scored` records in file order, in passes
+    until the budget is met or the dataset ends. That is the prefix the
+    async engine attempts, so both make the same calls. With
+    max_samples 0 each worker reads its own lines of the file instead.
+    """
+    read_options = dict(read_options or {})
+    # Sub-shards of an explicit --shard i/n, so the two compose
+    first, step = read_options.pop("shard", None) or (0, 1)
+
+    initargs = (
+        evaluator.mode, get_default_cache().enabled, results_path, RESUME, workers,
+        tracing.tracer.output, (prechecker.policy, prechecker.audit_rate, prechecker.seed),
+    )
+    shard_scores = {name: [] for name in datasets}
+
+    def collect(name, future):
+        scored, shard_usage, shard_spans, shard_precheck = future.result()
+        shard_scores[name].append(scored)
+        usage.merge(shard_usage)
+        prechecker.merge(shard_precheck)
+        tracing.tracer.ingest(shard_spans)
+        return len(scored)
+
+    with ProcessPoolExecutor(workers, initializer=_init_shard_worker, initargs=initargs) as pool:
+        if max_samples:
+            # Near-duplicates are dropped from the whole (unsharded) stream,
+            # so the same records are kept as in a single process
+            streams, dedups = {}, {}
+            for name, (path, _) in datasets.items():
+                streams[name], dedups[name] = _deduplicated(
+                    load_jsonl(path, numbered=True, **read_options, shard=(first, step)), numbered=True
+                )
+            missing = {name: max_samples for name in datasets}
+
+            while missing:
+                futures = {}
+                for name in missing:
+                    batch = list(itertools.islice(streams[name], missing[name]))
+                    futures[name] = [
+                        pool.submit(_run_shard, name, None, datasets[name][1], concurrency, records=chunk)
+                        for chunk in _deal(batch, workers)
+                    ]
+                for name, shard_futures in futures.items():
+                    missing[name] -= sum(collect(name, future) for future in shard_futures)
+                missing = {
+                    name: count for name, count in missing.items() if count > 0 and futures[name]
+                }
+
+            for name, dedup in dedups.items():
+                _report_dedup(name, dedup)
+        else:
+            shards = [(first + step * w, step * workers) for w in range(workers)]
+            excludes = {}
+            for name, (path, _) in datasets.items():
+                if DEDUP_THRESHOLD is not None:
+                    dedup = Deduplicator(DEDUP_THRESHOLD)
+                    excludes[name] = dedup.duplicate_positions(
+                        load_jsonl(path, numbered=True, **read_options, shard=(first, step))
+                    )
+                    _report_dedup(name, dedup)
+
+            futures = {
+                name: [
+                    pool.submit(
+                        _run_shard, name, path, action, concurrency,
+                        {**read_options, "shard": shard}, excludes.get(name, frozenset()),
+                    )
+                    for shard in shards
+                ]
+                for name, (path, action) in datasets.items()
+            }
+            for name, shard_futures in futures.items():
+                for future in shard_futures:
+                    collect(name, future)
+
+    return {name: merge_shards(scores, max_samples) for name, scores in shard_scores.items()}
 
 
 # ---------------- MAIN ----------------
+def parse_shard(value):
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected INDEX/COUNT, e.g. 0/4")
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"shard {value} out of range")
+    return index, count
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Batch LLM-as-a-Judge evaluation")
+    parser.add_argument(
+        "--max-samples", type=int, default=None,
+        help="valid samples per dataset (0 = every record; default 10, or no cap with --target-ci)"
+    )
+    parser.add_argument(
+        "--target-ci", type=float, default=None, metavar="WIDTH",
+        help="adaptive: score records in stratified random order until every criterion's "
+             "95%% CI is at most WIDTH wide (--max-samples is then the budget)"
+    )
+    parser.add_argument(
+        "--min-samples", type=int, default=adaptive.MIN_SAMPLES,
+        help="adaptive: valid samples before the CI is first checked"
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+        help="max model requests in flight (async engine, per worker)"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=1,
+        help="split each dataset across this many processes"
+    )
+    parser.add_argument(
+        "--sync", action="store_true",
+        help="use the original one-record-at-a-time loop"
+    )
+    parser.add_argument(
+        "--judge-mode", choices=JUDGE_MODES, default=JUDGE_MODE,
+        help="separate: one request per criterion, combined: one JSON request"
+    )
+    parser.add_argument(
+        "--dedup", type=float, nargs="?", const=DEDUP_DEFAULT, default=None, metavar="THRESHOLD",
+        help=f"skip records whose text is a near-duplicate of an earlier one (Jaccard, default {DEDUP_DEFAULT})"
+    )
+    parser.add_argument(
+        "--precheck", choices=PRECHECK_POLICIES, default=PRECHECK_POLICY,
+        help="local checks before the judges: shadow = only compare, skip = flagged rewrites are "
+             "not judged, audit = like skip but --audit-rate of them are judged anyway"
+    )
+    parser.add_argument(
+        "--audit-rate", type=float, default=AUDIT_RATE,
+        help="share of flagged rewrites still judged under --precheck audit"
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true",
+        help="bypass the on-disk response cache"
+    )
+    parser.add_argument(
+        "--results", default=DEFAULT_RESULTS_PATH,
+        help="JSONL file each scored sample is appended to"
+    )
+    parser.add_argument(
+        "--resume", action="store_true",
+        help="reuse samples already in --results instead of re-scoring them"
+    )
+    parser.add_argument(
+        "--data-root", default=None,
+        help="directory holding shorten/lengthen/tone.jsonl (default: EMAIL_DATA_ROOT or ./datasets)"
+    )
+    parser.add_argument(
+        "--datasets", nargs="+", default=None, metavar="NAME",
+        help=f"subset of {', '.join(DATASETS)}"
+    )
+    parser.add_argument(
+        "--sample-rate", type=float, default=None,
+        help="keep this fraction of records (deterministic per --seed)"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--shard", type=parse_shard, default=None, metavar="INDEX/COUNT",
+        help="only read every COUNT-th record starting at INDEX"
+    )
+    parser.add_argument(
+        "--skip", type=int, default=0,
+        help="skip this many selected records per dataset"
+    )
+    parser.add_argument(
+        "--where", action="append", type=parse_filter, default=[], metavar="FIELD=V1,V2",
+        help="only score records whose FIELD is one of the values (pushed down for Parquet)"
+    )
+    parser.add_argument(
+        "--table-out", default=None,
+        help="save the results table as .parquet, .arrow, .csv or .jsonl"
+    )
+    parser.add_argument(
+        "--report", default=DEFAULT_REPORT_PATH,
+        help="static report with summary tables and charts (.html, or .png for charts only)"
+    )
+    parser.add_argument("--no-report", action="store_true", help="skip the charts and report")
+    parser.add_argument(
+        "--usage-out", default=None,
+        help="export per-call usage to .prom, .json or .csv"
+    )
+    parser.add_argument(
+        "--group-by", nargs="+", default=[], choices=results_table.GROUP_COLUMNS, metavar="COLUMN",
+        help=f"also summarize all datasets by these columns ({', '.join(results_table.GROUP_COLUMNS)})"
+    )
+    parser.add_argument(
+        "--trace", default=tracing.TRACE_OUTPUT, metavar="console|FILE",
+        help="record spans: 'console' for a flame summary, or an OTLP/JSON lines file"
+    )
+    return parser.parse_args()
+
+
+def print_cache_stats():
+    stats = get_default_cache().stats()
+    if not stats["enabled"]:
+        return
+    print("\nRESPONSE CACHE")
+    print("-" * 40)
+    print(f"Hits / Misses    : {stats['hits']} / {stats['misses']} ({stats['hit_rate']:.0%})")
+    print(f"Entries on disk  : {stats['entries']} ({stats['bytes'] / 1024:.0f} KiB)")
+
+
 if __name__ == "__main__":
-    for name, (path, action) in DATASETS.items():
-        records = load_jsonl(path)
-        evaluate_dataset(records, name, action)
+    args = parse_args()
+    evaluator.mode = async_evaluator.mode = args.judge_mode
+    if args.no_cache:
+        get_default_cache().enabled = False
+    tracing.configure(args.trace)
+    prechecker = Prechecker(args.precheck, args.audit_rate, args.seed)
+    DEDUP_THRESHOLD = args.dedup
+
+    results_store = ResultsStore(args.results)
+    RESUME = args.resume
+    if not args.no_report:
+        reporter = ReportBuilder(args.report)
+    if RESUME:
+        print(f"Resuming: {len(results_store)} samples already in {args.results}")
+
+    if args.data_root:
+        registry = default_registry(data_root=args.data_root)
+        DATASETS = registry.evaluation_datasets()
+    if args.datasets:
+        unknown = set(args.datasets) - set(DATASETS)
+        if unknown:
+            raise SystemExit(f"Unknown datasets: {', '.join(sorted(unknown))}")
+        DATASETS = {name: DATASETS[name] for name in args.datasets}
+
+    read_options = {
+        "skip": args.skip,
+        "sample_rate": args.sample_rate,
+        "seed": args.seed,
+        "shard": args.shard,
+        "filters": dict(args.where),
+    }
+
+    if args.workers > 1 and (args.sync or args.skip or args.target_ci):
+        raise SystemExit("--workers cannot be combined with --sync, --skip or --target-ci")
+
+    max_samples = args.max_samples if args.max_samples is not None else (0 if args.target_ci else 10)
+    rules = {
+        name: StoppingRule(args.target_ci, args.min_samples, max_samples, args.seed)
+        for name in DATASETS
+    } if args.target_ci else None
+
+    all_rows = []
+    if args.sync:
+        for name, (path, action) in DATASETS.items():
+            records = load_jsonl(path, **read_options)
+            if rules:
+                all_rows += evaluate_dataset_adaptive(records, name, action, rules[name])
+            else:
+                all_rows += evaluate_dataset(records, name, action, max_samples)
+    else:
+        if args.workers > 1:
+            all_results = evaluate_all_sharded(
+                DATASETS, args.workers, max_samples, args.concurrency,
+                read_options, args.results,
+            )
+        else:
+            all_results = asyncio.run(
+                evaluate_all_async(DATASETS, max_samples, args.concurrency, read_options, rules)
+            )
+        for name, rows in all_results.items():
+            print(f"\n{name} RESULTS")
+            print("-" * 40)
+            report_results(name, build_table(rows))
+            all_rows += rows
+
+    table = build_table(all_rows)
+    for by in (["dataset"], args.group_by):
+        if by:
+            print(f"\nSUMMARY BY {' / '.join(by).upper()} (mean [95% bootstrap CI])")
+            print("-" * 40)
+            print(results_table.format_summary(results_table.summarize(table, by), by))
+    if args.table_out:
+        results_table.save_table(table, args.table_out)
+        print(f"\nResults table saved to {args.table_out} ({len(table)} rows)")
+
+    print("\nMODEL USAGE")
+    print("-" * 40)
+    print(usage.format_summary())
+    if args.usage_out:
+        usage.export(args.usage_out)
+        print(f"Usage exported to {args.usage_out}")
+
+    if prechecker.enabled:
+        print("\nPRE-CHECK")
+        print("-" * 40)
+        print(prechecker.format_summary())
 
+    # Worker processes keep their own cache / HTTP counters
+    if args.workers == 1:
+        print_cache_stats()
+        print(f"\nHTTP: {format_connection_stats()}")
 
+    if tracing.tracer.enabled:
+        print()
+        tracing.flush()
+        if args.trace != "console":
+            print(f"Trace spans written to {args.trace}")
 
+    if reporter is not None:
+        group_bys = [["dataset"]] + ([args.group_by] if args.group_by else [])
+        print(f"\n📊 Report written to {reporter.write(table, group_bys)}")
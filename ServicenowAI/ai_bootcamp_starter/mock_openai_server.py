@@ -0,0 +1,375 @@
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "normal", "lognormal")
+
+
+# ---------------- CONFIG ----------------
+@dataclass
+class MockServerConfig:
+    """
+    Behaviour of the mock deployment. Latency is time-to-first-token;
+    completion tokens are then emitted at `tokens_per_second`, so a
+    longer answer takes longer, as it does on the real service.
+    """
+
+    latency: str = "lognormal"
+    latency_ms: float = 300.0      # median (lognormal), mean (normal), value (fixed), max (uniform)
+    latency_sigma: float = 0.4     # lognormal shape / normal stddev as a fraction of latency_ms
+    tokens_per_second: float = 400.0
+    error_rate: float = 0.0        # share of requests answered with HTTP 500
+    throttle_rate: float = 0.0     # share of requests answered with HTTP 429
+    retry_after_ms: int = 200
+    max_concurrency: int = 0       # > 0: requests beyond this are answered with 429
+    seed: int = 0
+
+
+# ---------------- CANNED ANSWERS ----------------
+def _rewrite_for(messages) -> str:
+    # Echo the text being rewritten so the cleaners and judges see realistic input
+    user = messages[-1]["content"] if messages else ""
+    lines = [line for line in user.splitlines() if line.strip()]
+    body = " ".join(lines[1:3]) if len(lines) > 1 else user
+    return f"Subject: Update\n{body.strip() or 'Rewritten text.'}"
+
+
+def _judge_report(rng) -> str:
+    score = rng.choice([3, 4, 4, 5])
+    return (
+        f"Score: {score} / 5\n"
+        "Verdict: The rewrite keeps the important facts.\n\n"
+        "Reasoning:\n"
+        "- Names, dates and numbers are preserved\n"
+        "- No new information was introduced\n\n"
+        "Missing Elements:\n"
+        "- None"
+    )
+
+
+def _score_logprobs(rng) -> tuple:
+    """One-digit score-only answer and its top_logprobs, peaked on that digit."""
+    score = rng.choice([3, 4, 4, 5])
+    confidence = rng.choice([0.5, 0.8, 0.95])
+    rest = (1 - confidence) / 5
+    top = [
+        {"token": str(digit), "logprob": math.log(confidence if digit == score else rest), "bytes": None}
+        for digit in range(6)
+    ]
+    top.sort(key=lambda item: -item["logprob"])
+    return str(score), {"content": [{"token": str(score), "logprob": top[0]["logprob"], "bytes": None, "top_logprobs": top}]}
+
+
+def _combined_report(rng) -> str:
+    def criterion():
+        return {
+            "score": rng.choice([3, 4, 4, 5]),
+            "verdict": "Mostly faithful.",
+            "reasoning": ["Facts are preserved", "Tone is appropriate"],
+        }
+
+    report = {name: criterion() for name in ("faithfulness", "completeness", "robustness")}
+    report["completeness"]["missing_elements"] = []
+    return json.dumps(report)
+
+
+def _synthetic_email(messages) -> str:
+    user = messages[-1]["content"] if messages else ""
+    match = re.search(r'"id":\s*(\d+)', user)
+    record = {
+        "id": int(match.group(1)) if match else 0,
+        "subject": "Mock subject",
+        "content": "Mock email body with a date (March 3) and a link https://portal.company.com/ticket/123.",
+    }
+    for field in ("structure_type", "ambiguity_level", "noise_level"):
+        found = re.search(rf'"{field}":\s*"([^"]*)"', user)
+        if found:
+            record[field] = found.group(1)
+    if "selected_excerpt" in user:
+        record["selected_excerpt"] = record["content"]
+        record["technical_assets"] = ["https://portal.company.com/ticket/123"]
+    return json.dumps(record)
+
+
+def answer_for(body: dict, rng) -> str:
+    """Picks a canned answer shaped like what the caller parses."""
+    messages = body.get("messages", [])
+    system = messages[0]["content"] if messages and messages[0]["role"] == "system" else ""
+
+    if body.get("response_format"):
+        return _combined_report(rng)
+    if "Output ONLY valid JSON" in system:
+        return _synthetic_email(messages)
+    if body.get("temperature") == 0:
+        return _judge_report(rng)
+    return _rewrite_for(messages)
+
+
+def count_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+# ---------------- SERVER ----------------
+class MockOpenAIServer:
+    """
+    Local stand-in for an Azure OpenAI deployment that speaks the
+    chat-completions API (plain and streamed). Runs in a background
+    thread; use as a context manager or call start() / stop().
+    """
+
+    def __init__(self, config: MockServerConfig = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or MockServerConfig()
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = None
+        self.reset()
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    # ---------------- LIFECYCLE ----------------
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # ---------------- SAMPLING ----------------
+    def _sample_latency(self) -> float:
+        cfg = self.config
+        with self._lock:
+            if cfg.latency == "fixed":
+                ms = cfg.latency_ms
+            elif cfg.latency == "uniform":
+                ms = self._rng.uniform(0, cfg.latency_ms)
+            elif cfg.latency == "normal":
+                ms = self._rng.gauss(cfg.latency_ms, cfg.latency_sigma * cfg.latency_ms)
+            else:
+                ms = self._rng.lognormvariate(math.log(cfg.latency_ms), cfg.latency_sigma)
+        return max(ms, 0.0) / 1000
+
+    def _roll(self, rate: float) -> bool:
+        with self._lock:
+            return self._rng.random() < rate
+
+    # ---------------- STATS ----------------
+    def reset(self):
+        """Clears the counters and reseeds, so every run sees the same draws."""
+        with self._lock:
+            self._rng = random.Random(self.config.seed)
+            self.requests = 0
+            self.throttled = 0
+            self.errors = 0
+            self.in_flight = 0
+            self.peak_in_flight = 0
+            self.completion_tokens = 0
+            self.service_times = []
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "throttled": self.throttled,
+                "errors": self.errors,
+                "peak_in_flight": self.peak_in_flight,
+                "completion_tokens": self.completion_tokens,
+                "service_times": list(self.service_times),
+            }
+
+    def _enter(self) -> bool:
+        with self._lock:
+            self.requests += 1
+            limit = self.config.max_concurrency
+            if limit and self.in_flight >= limit:
+                return False
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            return True
+
+    def _leave(self, started: float, tokens: int):
+        with self._lock:
+            self.in_flight -= 1
+            self.completion_tokens += tokens
+            self.service_times.append(time.monotonic() - started)
+
+    # ---------------- HANDLER ----------------
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, status: int, payload: dict, headers: dict = None):
+                out = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(out)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(out)
+
+            def _throttle(self):
+                with server._lock:
+                    server.throttled += 1
+                self._send_json(
+                    429,
+                    {"error": {"code": "429", "message": "Rate limit exceeded (mock)"}},
+                    {"retry-after-ms": str(server.config.retry_after_ms)},
+                )
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                cfg = server.config
+
+                if not server._enter():
+                    self._throttle()
+                    return
+
+                started = time.monotonic()
+                tokens = 0
+                try:
+                    if server._roll(cfg.throttle_rate):
+                        self._throttle()
+                        return
+                    if server._roll(cfg.error_rate):
+                        with server._lock:
+                            server.errors += 1
+                        self._send_json(500, {"error": {"code": "500", "message": "Internal error (mock)"}})
+                        return
+
+                    logprobs = None
+                    with server._lock:
+                        if body.get("logprobs"):
+                            content, logprobs = _score_logprobs(server._rng)
+                        else:
+                            content = answer_for(body, server._rng)
+                    tokens = count_tokens(content)
+                    prompt_tokens = count_tokens(json.dumps(body.get("messages", [])))
+
+                    time.sleep(server._sample_latency())
+                    if body.get("stream"):
+                        self._stream(content)
+                    else:
+                        time.sleep(tokens / cfg.tokens_per_second)
+                        self._send_json(200, {
+                            "id": "chatcmpl-mock",
+                            "object": "chat.completion",
+                            "created": int(time.time()),
+                            "model": body.get("model", "mock"),
+                            "choices": [{
+                                "index": 0,
+                                "finish_reason": "stop",
+                                "message": {"role": "assistant", "content": content},
+                                "logprobs": logprobs,
+                            }],
+                            "usage": {
+                                "prompt_tokens": prompt_tokens,
+                                "completion_tokens": tokens,
+                                "total_tokens": prompt_tokens + tokens,
+                            },
+                        })
+                finally:
+                    server._leave(started, tokens)
+
+            def _stream(self, content: str):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+
+                def write_event(data: str):
+                    event = f"data: {data}\n\n".encode("utf-8")
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(event), event))
+                    self.wfile.flush()
+
+                # Roughly one token (4 chars) per event, paced at tokens_per_second
+                delay = 1 / server.config.tokens_per_second
+                for i in range(0, len(content), 4):
+                    write_event(json.dumps({
+                        "id": "chatcmpl-mock",
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": "mock",
+                        "choices": [{"index": 0, "delta": {"content": content[i:i + 4]}, "finish_reason": None}],
+                    }))
+                    time.sleep(delay)
+
+                write_event("[DONE]")
+                self.wfile.write(b"0\r\n\r\n")
+
+        return Handler
+
+
+# ---------------- CLI ----------------
+def add_config_arguments(parser):
+    """Adds one flag per MockServerConfig field (shared with load_test.py)."""
+    defaults = MockServerConfig()
+    parser.add_argument("--latency", choices=LATENCY_DISTRIBUTIONS, default=defaults.latency)
+    parser.add_argument("--latency-ms", type=float, default=defaults.latency_ms)
+    parser.add_argument("--latency-sigma", type=float, default=defaults.latency_sigma)
+    parser.add_argument("--tokens-per-second", type=float, default=defaults.tokens_per_second)
+    parser.add_argument("--error-rate", type=float, default=defaults.error_rate)
+    parser.add_argument("--throttle-rate", type=float, default=defaults.throttle_rate)
+    parser.add_argument("--retry-after-ms", type=int, default=defaults.retry_after_ms)
+    parser.add_argument("--max-concurrency", type=int, default=defaults.max_concurrency)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+
+
+def config_from_args(args) -> MockServerConfig:
+    return MockServerConfig(
+        latency=args.latency,
+        latency_ms=args.latency_ms,
+        latency_sigma=args.latency_sigma,
+        tokens_per_second=args.tokens_per_second,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        retry_after_ms=args.retry_after_ms,
+        max_concurrency=args.max_concurrency,
+        seed=args.seed,
+    )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Offline mock Azure OpenAI chat-completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8799)
+    add_config_arguments(parser)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    server = MockOpenAIServer(config_from_args(args), args.host, args.port)
+
+    print(f"🧪 Mock Azure OpenAI listening on {server.url}")
+    print(f"   set AZURE_OPENAI_ENDPOINT={server.url} (any API key works)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
@@ -1,9 +1,13 @@
 import streamlit as st
-import json
 import os
 from dotenv import load_dotenv
 from evaluate import LLMEvaluator
 from generate import GenerateEmail
+from rewrite_cache import RewriteLRU
+from clients import format_connection_stats
+import tracing
+from tracing import span
+from dataset_registry import default_registry
 
 # ---------------- ENV ----------------
 load_dotenv()
@@ -17,24 +21,34 @@ st.set_page_config(
 MODEL_GEN = os.getenv("AZURE_GPT_41_DEPLOYMENT", "gpt-4.1")
 MODEL_JUDGE = os.getenv("AZURE_GPT_4O_MINI_DEPLOYMENT", "gpt-4o-mini")
 
-generator = GenerateEmail(model=MODEL_GEN)
-evaluator = LLMEvaluator(model=MODEL_JUDGE)
+@st.cache_resource
+def get_generator(model):
+    # Built once per server process; reruns reuse its pooled connections
+    return GenerateEmail(model=model)
+
+
+@st.cache_resource
+def get_evaluator(model):
+    return LLMEvaluator(model=model)
+
+
+generator = get_generator(MODEL_GEN)
+evaluator = get_evaluator(MODEL_JUDGE)
+
+
+@st.cache_resource
+def get_rewrite_cache():
+    # One LRU per server process, shared by every session
+    return RewriteLRU()
+
+
+rewrite_cache = get_rewrite_cache()
 
 # ---------------- DATA LOADING ----------------
 @st.cache_data
 def load_experimental_data():
-    path = "C:\\Users\\User\\Desktop\\ServicenowAI\\synthetic_datasets\\synthetic_experimental.jsonl"
-    if not os.path.exists(path):
-        return []
-
-    records = []
-    with open(path, "r", encoding="utf-8") as f:
-        for line in f:
-            try:
-                records.append(json.loads(line))
-            except json.JSONDecodeError:
-                continue
-    return records
+    # Resolved under EMAIL_SYNTHETIC_ROOT (default ../synthetic_datasets)
+    return list(default_registry().iter_records("SYNTHETIC_EXPERIMENTAL"))
 
 
 data = load_experimental_data()
@@ -75,6 +89,13 @@ with st.sidebar:
             ["Professional", "Friendly", "Sympathetic"]
         )
 
+    cache_stats = rewrite_cache.stats()
+    st.caption(
+        f"Rewrite cache: {cache_stats['entries']} entries, "
+        f"{cache_stats['hit_rate']:.0%} hit rate"
+    )
+    st.caption(f"HTTP: {format_connection_stats()}")
+
     filtered = []
     for d in data:
         if structure_filter != "All" and d["structure_type"] != structure_filter:
@@ -110,6 +131,49 @@ with m3:
 
 st.divider()
 
+gen_key = f"gen_{record['id']}"
+stream_key = f"stream_{gen_key}"
+
+
+def rewrite_key(source_text):
+    return RewriteLRU.make_key(
+        action, tone_choice, str(source_text), MODEL_GEN, generator.prompt_version
+    )
+
+
+# ---------------- STREAMING ----------------
+def stream_generation():
+    """
+    Streams the rewrite, or shows the cached one. Sessions asking for
+    the same rewrite meanwhile wait for this one and get the full text.
+    """
+    source_text = record["content"]
+
+    def render():
+        if action == "tone":
+            chunks = generator.generate_stream("tone", source_text, tone_type=tone_choice)
+        else:
+            chunks = generator.generate_stream(action, source_text)
+
+        live = st.empty()
+        try:
+            with live.container():
+                return st.write_stream(chunks)
+        finally:
+            live.empty()
+
+    try:
+        result = rewrite_cache.get_or_generate(
+            rewrite_key(source_text), render, should_cache=lambda text: not text.startswith("Error")
+        )
+    except Exception as e:
+        result = f"Error: {str(e)}"
+    finally:
+        tracing.flush()
+
+    st.session_state[gen_key] = result
+
+
 # ---------------- EMAIL PANELS ----------------
 col1, col2 = st.columns(2)
 
@@ -128,11 +192,13 @@ with col1:
 
 with col2:
     st.markdown("### 📤 Model Output")
-    gen_key = f"gen_{record['id']}"
 
     if gen_key not in st.session_state:
         st.session_state[gen_key] = ""
 
+    if st.session_state.pop(stream_key, False):
+        stream_generation()
+
     st.text_area(
         "Generated / Model Response",
         key=gen_key,
@@ -141,18 +207,8 @@ with col2:
 
 # ---------------- GENERATION ----------------
 def run_generation():
-    source_text = record["content"]
-
-    if action == "tone":
-        result = generator.generate(
-            "tone",
-            source_text,
-            tone_type=tone_choice
-        )
-    else:
-        result = generator.generate(action, source_text)
-
-    st.session_state[gen_key] = result
+    # Looked up (or streamed) into the Model Output panel on this rerun
+    st.session_state[stream_key] = True
 
 
 st.divider()
@@ -189,21 +245,22 @@ if st.button("Run Evaluation", type="primary"):
     if not st.session_state[gen_key].strip():
         st.warning("Generate or paste model output first.")
     else:
-        with st.spinner("Evaluating..."):
-            faith = evaluator.judge_faithfulness(
-                record["selected_excerpt"],
-                st.session_state[gen_key]
-            )
-
-            comp = evaluator.judge_completeness(
-                record["selected_excerpt"],
-                st.session_state[gen_key]
-            )
-
-            rob = evaluator.judge_robustness(
-                record["content"],
-                st.session_state[gen_key]
-            )
+        try:
+            with st.spinner("Evaluating..."), span("evaluate", action=action):
+                judged = evaluator.judge_all(
+                    record["selected_excerpt"],
+                    st.session_state[gen_key],
+                    robustness_original=record["content"]
+                )
+        except Exception as e:
+            st.error(f"Evaluation failed: {str(e)}")
+            st.stop()
+        finally:
+            tracing.flush()
+
+        faith = judged.faithfulness
+        comp = judged.completeness
+        rob = judged.robustness
 
         st.success("Evaluation Complete")
 
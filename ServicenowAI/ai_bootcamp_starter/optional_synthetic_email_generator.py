@@ -1,14 +1,26 @@
 import os
 import json
+import argparse
 import time
 import random
 from dotenv import load_dotenv
-from openai import AzureOpenAI
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from clients import get_client, format_connection_stats
+from rate_limit import get_limiter, estimate_tokens
+from usage_metrics import track_call, usage
+from streaming_output import StreamingJsonlWriter, run_ordered
+from dedup import dedup_file
 
 # ---------------- ENV SETUP ----------------
 load_dotenv()
 
+# Jaccard threshold for dropping near-duplicate emails after a parallel
+# run (see dedup.py); 0 / unset keeps every record
+DEDUP_THRESHOLD = float(os.getenv("SYNTHETIC_DEDUP_THRESHOLD", "0")) or None
+
+# Seed for the structure/ambiguity/noise labels, so a resumed run labels
+# the remaining ids exactly like the interrupted one
+DEFAULT_SEED = int(os.getenv("SYNTHETIC_SEED", "42"))
+
 # ---------------- EXPERIMENTAL SYNTHETIC EMAIL GENERATOR ----------------
 class ExperimentalSyntheticEmailGenerator:
     """
@@ -16,12 +28,9 @@ class ExperimentalSyntheticEmailGenerator:
     """
 
     def __init__(self, model: str):
-        self.client = AzureOpenAI(
-            azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-            api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-            api_version=os.getenv("AZURE_OPENAI_API_VERSION")
-        )
+        self.client = get_client()
         self.model = model
+        self.limiter = get_limiter(model)
 
     def generate_email(
         self,
@@ -65,27 +74,34 @@ Return ONLY JSON:
 }}
 """
 
-        try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0.8
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+
+        # Throttles and transient errors are retried by the shared limiter;
+        # a call that still fails raises ModelCallError
+        with track_call("synthetic", self.model, action=tone.lower()) as call:
+            response = self.limiter.call(
+                lambda: self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=0.8
+                ),
+                estimate_tokens(messages),
+                call,
             )
+            call["response"] = response
 
-            raw = response.choices[0].message.content.strip()
+        raw = response.choices[0].message.content.strip()
 
-            if raw.startswith("```"):
-                raw = raw.replace("```json", "").replace("```", "").strip()
+        if raw.startswith("```"):
+            raw = raw.replace("```json", "").replace("```", "").strip()
 
+        try:
             parsed = json.loads(raw)
-            parsed["id"] = email_id
-            return parsed
-
-        except Exception as e:
-            # FALLBACK — NEVER DROP RECORDS
+        except json.JSONDecodeError as e:
+            # FALLBACK — the model answered, but not with JSON
             return {
                 "id": email_id,
                 "subject": f"Fallback subject for {topic}",
@@ -98,6 +114,9 @@ Return ONLY JSON:
                 "error": str(e)
             }
 
+        parsed["id"] = email_id
+        return parsed
+
 
 # ---------------- EXPERIMENT CONFIG ----------------
 TOPICS = [
@@ -114,54 +133,68 @@ STRUCTURES = ["paragraph", "bullets", "numbered", "mixed"]
 AMBIGUITY = ["low", "medium", "high"]
 NOISE = ["low", "medium", "high"]
 
-TASKS = []
-eid = 1
-for t in TOPICS:
-    for tone in TONES:
-        for l in LENGTHS:
-            TASKS.append((
-                eid,
-                t,
-                tone,
-                l,
-                random.choice(STRUCTURES),
-                random.choice(AMBIGUITY),
-                random.choice(NOISE)
-            ))
-            eid += 1
+
+def build_tasks(seed: int = DEFAULT_SEED) -> list:
+    """Every topic x tone x length, with labels drawn from random.Random(seed)."""
+    rng = random.Random(seed)
+    tasks = []
+    eid = 1
+    for t in TOPICS:
+        for tone in TONES:
+            for l in LENGTHS:
+                tasks.append((
+                    eid,
+                    t,
+                    tone,
+                    l,
+                    rng.choice(STRUCTURES),
+                    rng.choice(AMBIGUITY),
+                    rng.choice(NOISE)
+                ))
+                eid += 1
+    return tasks
+
+
+TASKS = build_tasks()
 
 
 # ---------------- PARALLEL GENERATION ----------------
-def generate_parallel(generator, output_path, max_workers=5):
+def generate_parallel(generator, output_path, max_workers=None, resume=False, dedup=DEDUP_THRESHOLD, tasks=None):
+    """
+    Effective concurrency is set by the generator's AIMD limiter, which
+    grows until the deployment starts throttling; `max_workers` only
+    caps the thread pool (defaults to the limiter's maximum).
+
+    Records are streamed to `output_path` in id order as they finish;
+    with `resume`, ids already in a partial file are skipped. With
+    `dedup` (a Jaccard threshold) near-duplicates are then removed.
+    `tasks` defaults to TASKS; resume with the seed the run started with.
+    """
     start = time.time()
-    results = []
 
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = [
-            executor.submit(generator.generate_email, *task)
-            for task in TASKS
-        ]
-
-        for future in as_completed(futures):
-            try:
-                result = future.result()
-                results.append(result)
-            except Exception as e:
-                print("Worker crashed:", e)
+    if max_workers is None:
+        max_workers = generator.limiter.controller.maximum
 
-    print(f"Collected {len(results)} records")
+    writer = StreamingJsonlWriter(output_path, resume=resume)
+    try:
+        # Fallback records are retried like crashed tasks instead of written
+        written = run_ordered(
+            generator.generate_email, tasks or TASKS, writer, max_workers, failed=lambda record: "error" in record
+        )
+    finally:
+        writer.close()
 
-    results.sort(key=lambda x: x.get("id", float("inf")))
+    print(f"Collected {written} records")
 
-    with open(output_path, "w", encoding="utf-8") as f:
-        for r in results:
-            f.write(json.dumps(r, ensure_ascii=False) + "\n")
+    if dedup and not writer.incomplete:
+        removed = dedup_file(output_path, threshold=dedup).duplicates
+        print(f"🧹 Dropped {removed} near-duplicate records from {output_path}")
 
     return time.time() - start
 
 
 # ---------------- ENTRY POINT ----------------
-def run_experiment():
+def run_experiment(resume=False, seed=DEFAULT_SEED):
     os.makedirs("synthetic_datasets", exist_ok=True)
 
     model_name = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME", "gpt-4.1")
@@ -170,17 +203,31 @@ def run_experiment():
     out_file = "synthetic_datasets/synthetic_experimental.jsonl"
 
     print("Running EXPERIMENTAL synthetic generation...")
-    duration = generate_parallel(generator, out_file)
+    tasks = build_tasks(seed)
+    duration = generate_parallel(generator, out_file, resume=resume, tasks=tasks)
 
     print("\nEXPERIMENT COMPLETE")
     print("-" * 40)
-    print(f"Records generated : {len(TASKS)}")
+    print(f"Records generated : {len(tasks)} (seed {seed})")
     print(f"Output file       : {out_file}")
     print(f"Time taken        : {duration:.2f} seconds")
+    print(f"Connections       : {format_connection_stats()}")
+    print("-" * 40)
+    print(usage.format_summary())
     print("-" * 40)
 
 
 if __name__ == "__main__":
-    run_experiment()
+    parser = argparse.ArgumentParser(description="Experimental synthetic email generation")
+    parser.add_argument(
+        "--resume", action="store_true",
+        help="continue an interrupted run from the last complete record in the output file"
+    )
+    parser.add_argument(
+        "--seed", type=int, default=DEFAULT_SEED,
+        help="seed for the structure/ambiguity/noise labels (use the same one with --resume)"
+    )
+    args = parser.parse_args()
+    run_experiment(resume=args.resume, seed=args.seed)
 
 
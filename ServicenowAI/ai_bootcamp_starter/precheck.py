@@ -0,0 +1,310 @@
+import hashlib
+import os
+import re
+import threading
+from dataclasses import dataclass, field
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CRITERIA = ("faithfulness", "completeness", "robustness")
+
+# Policies:
+#   off    - no pre-check
+#   shadow - score locally, still judge everything (measures agreement)
+#   skip   - flagged rewrites keep their local scores, no judge calls
+#   audit  - like skip, but PRECHECK_AUDIT_RATE of flagged rewrites are
+#            still judged so agreement keeps being measured
+POLICIES = ("off", "shadow", "skip", "audit")
+POLICY = os.getenv("PRECHECK_POLICY", "shadow")
+AUDIT_RATE = float(os.getenv("PRECHECK_AUDIT_RATE", "0.1"))
+
+# Allowed generated/original length ratio per action
+LENGTH_BANDS = {
+    "shorten": (0.15, 1.0),
+    "lengthen": (1.0, 5.0),
+    "tone": (0.5, 2.0),
+}
+
+# Share of the original's content words a good rewrite typically keeps
+EXPECTED_OVERLAP = {"shorten": 0.5, "lengthen": 0.8, "tone": 0.4}
+
+# An LLM score at or below this counts as a failed rewrite when
+# comparing with the pre-check flags
+FAIL_SCORE = 3
+
+# Reasons that flag a rewrite (skippable under skip / audit)
+FLAGS = ("empty_output", "error_output", "dropped_entities", "length_out_of_band")
+
+# ---------------- FEATURES ----------------
+# Things prompts.yaml says must be preserved exactly
+_URL = re.compile(r"(?:https?://|www\.)[^\s<>\"')\]]+", re.IGNORECASE)
+_EMAIL = re.compile(r"\b[\w.+-]+@[\w-]+(?:\.[\w-]+)+\b")
+_NUMBER = re.compile(r"\d+(?:[.,:/-]\d+)*")
+_MONTH = re.compile(
+    r"\b(jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|june?|july?|aug(?:ust)?"
+    r"|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)\b",
+    re.IGNORECASE,
+)
+_WORD = re.compile(r"[a-z]{4,}")
+
+
+def entities(text: str) -> set:
+    """
+    URLs, e-mail addresses, numbers / dates / times and month names
+    ("May" is left out: as a word it is mostly the verb).
+    """
+    found = set()
+    for url in _URL.findall(text):
+        found.add(url.rstrip(".,;:!?").lower())
+    # URLs are matched whole, not as the numbers inside them
+    rest = _URL.sub(" ", text)
+    found.update(email.lower() for email in _EMAIL.findall(rest))
+    rest = _EMAIL.sub(" ", rest)
+    found.update(_NUMBER.findall(rest))
+    found.update(month.lower()[:3] for month in _MONTH.findall(rest))
+    return found
+
+
+def _content_words(text: str) -> set:
+    return set(_WORD.findall(text.lower()))
+
+
+@dataclass
+class PreCheck:
+    """Local verdict on one rewrite; `scores` are (f, c, r) estimates on 0-5."""
+    scores: tuple
+    flags: tuple
+    dropped: tuple = ()
+    invented: tuple = ()
+    length_ratio: float = 0.0
+    overlap: float = 0.0
+
+    @property
+    def flagged(self) -> bool:
+        return bool(self.flags)
+
+    @property
+    def label(self) -> str:
+        return "+".join(self.flags) or "pass"
+
+
+def precheck_batch(originals: list, generated: list, action: str) -> list:
+    """
+    Pre-scores many rewrites of one action at once. Texts are reduced
+    to a few numbers each (entity recall / precision, length ratio,
+    content-word overlap); scores and flags are then computed on whole
+    arrays.
+    """
+    n = len(originals)
+    recall = np.ones(n)
+    precision = np.ones(n)
+    ratio = np.zeros(n)
+    overlap = np.zeros(n)
+    empty = np.zeros(n, dtype=bool)
+    error = np.zeros(n, dtype=bool)
+    dropped, invented = [], []
+
+    for i, (original, rewrite) in enumerate(zip(originals, generated)):
+        original, rewrite = (original or "").strip(), (rewrite or "").strip()
+        empty[i] = not rewrite
+        error[i] = rewrite.startswith("Error:")
+
+        source, target = entities(original), entities(rewrite)
+        dropped.append(tuple(sorted(source - target)))
+        invented.append(tuple(sorted(target - source)))
+        if source:
+            recall[i] = 1 - len(dropped[i]) / len(source)
+        if target:
+            precision[i] = 1 - len(invented[i]) / len(target)
+
+        ratio[i] = len(rewrite) / max(len(original), 1)
+        words = _content_words(original)
+        overlap[i] = len(words & _content_words(rewrite)) / len(words) if words else 1.0
+
+    low, high = LENGTH_BANDS.get(action, (0.0, np.inf))
+    # Bounds are exclusive: a "shortened" text may not be as long as its input
+    length_ok = (ratio > low) & (ratio < high)
+    kept = np.minimum(1.0, overlap / EXPECTED_OVERLAP.get(action, 0.5))
+    off_band = (~length_ok).astype(float)
+
+    estimates = np.stack([
+        5 * precision - 2 * (1 - recall),
+        5 * recall * kept - off_band,
+        5 * kept - 2 * (1 - precision) - off_band,
+    ], axis=1)
+    broken = empty | error
+    estimates[broken] = 0
+    estimates = np.clip(np.rint(estimates), 0, 5).astype(int)
+
+    masks = {
+        "empty_output": empty,
+        "error_output": error & ~empty,
+        "dropped_entities": (recall < 1) & ~broken,
+        "length_out_of_band": ~length_ok & ~broken,
+    }
+    return [
+        PreCheck(
+            scores=tuple(int(s) for s in estimates[i]),
+            flags=tuple(flag for flag in FLAGS if masks[flag][i]),
+            dropped=dropped[i],
+            invented=invented[i],
+            length_ratio=float(ratio[i]),
+            overlap=float(overlap[i]),
+        )
+        for i in range(n)
+    ]
+
+
+def precheck(original: str, generated: str, action: str) -> PreCheck:
+    return precheck_batch([original], [generated], action)[0]
+
+
+# ---------------- POLICY + STATS ----------------
+def _audited(seed: int, key, rate: float) -> bool:
+    # Deterministic per-record coin flip, as dataset_registry._sampled
+    digest = hashlib.blake2b(f"{seed}:{key}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") / 2 ** 64 < rate
+
+
+@dataclass
+class _Stats:
+    checked: int = 0
+    flagged: int = 0
+    skipped: int = 0
+    calls_saved: int = 0
+    flag_counts: dict = field(default_factory=dict)
+    # Rewrites scored both locally and by the LLM judges
+    compared: int = 0
+    abs_error: list = field(default_factory=lambda: [0.0] * len(CRITERIA))
+    within_one: list = field(default_factory=lambda: [0] * len(CRITERIA))
+    flagged_compared: int = 0
+    flagged_llm_fail: int = 0
+    passed_compared: int = 0
+    passed_llm_fail: int = 0
+
+
+class Prechecker:
+    """
+    Runs the pre-check in front of the LLM judges, decides per rewrite
+    whether the judges are still needed, and keeps the numbers that
+    show what that saved and how far the local scores can be trusted.
+    """
+
+    def __init__(self, policy: str = POLICY, audit_rate: float = AUDIT_RATE, seed: int = 0):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown pre-check policy {policy!r} (expected one of {', '.join(POLICIES)})")
+        self.policy = policy
+        self.audit_rate = audit_rate
+        self.seed = seed
+        self._lock = threading.Lock()
+        self.stats = _Stats()
+
+    @property
+    def enabled(self) -> bool:
+        return self.policy != "off"
+
+    def reset(self):
+        with self._lock:
+            self.stats = _Stats()
+
+    def check(self, original: str, generated: str, action: str) -> PreCheck:
+        """PreCheck of one rewrite, or None when the policy is off."""
+        if not self.enabled:
+            return None
+
+        result = precheck(original, generated, action)
+        with self._lock:
+            self.stats.checked += 1
+            if result.flagged:
+                self.stats.flagged += 1
+                for flag in result.flags:
+                    self.stats.flag_counts[flag] = self.stats.flag_counts.get(flag, 0) + 1
+        return result
+
+    def needs_judges(self, result: PreCheck, key, calls_per_judgment: int) -> bool:
+        """
+        False when the local scores stand in for the judges; the calls
+        that would have been made are counted as saved.
+        """
+        if result is None or not result.flagged or self.policy == "shadow":
+            return True
+        if self.policy == "audit" and _audited(self.seed, key, self.audit_rate):
+            return True
+
+        with self._lock:
+            self.stats.skipped += 1
+            self.stats.calls_saved += calls_per_judgment
+        return False
+
+    def compare(self, result: PreCheck, llm_scores: tuple):
+        """Records the agreement of local and LLM scores for one rewrite."""
+        if result is None or any(score is None for score in llm_scores):
+            return
+
+        llm_fail = min(llm_scores) <= FAIL_SCORE
+        with self._lock:
+            stats = self.stats
+            stats.compared += 1
+            for i, (local, llm) in enumerate(zip(result.scores, llm_scores)):
+                stats.abs_error[i] += abs(local - llm)
+                stats.within_one[i] += abs(local - llm) <= 1
+            if result.flagged:
+                stats.flagged_compared += 1
+                stats.flagged_llm_fail += llm_fail
+            else:
+                stats.passed_compared += 1
+                stats.passed_llm_fail += llm_fail
+
+    # ---------------- MERGING ----------------
+    def state(self) -> _Stats:
+        """Picklable snapshot, e.g. to send back from a worker process."""
+        with self._lock:
+            return self.stats
+
+    def merge(self, other: _Stats):
+        with self._lock:
+            stats = self.stats
+            for name in ("checked", "flagged", "skipped", "calls_saved", "compared",
+                         "flagged_compared", "flagged_llm_fail", "passed_compared", "passed_llm_fail"):
+                setattr(stats, name, getattr(stats, name) + getattr(other, name))
+            for flag, count in other.flag_counts.items():
+                stats.flag_counts[flag] = stats.flag_counts.get(flag, 0) + count
+            for i in range(len(CRITERIA)):
+                stats.abs_error[i] += other.abs_error[i]
+                stats.within_one[i] += other.within_one[i]
+
+    # ---------------- REPORT ----------------
+    def format_summary(self) -> str:
+        stats = self.stats
+        if not stats.checked:
+            return "No rewrites pre-checked"
+
+        flags = ", ".join(f"{flag} {count}" for flag, count in sorted(stats.flag_counts.items()))
+        lines = [
+            f"Policy           : {self.policy}"
+            + (f" (audit rate {self.audit_rate:.0%})" if self.policy == "audit" else ""),
+            f"Checked / Flagged: {stats.checked} / {stats.flagged}" + (f"  ({flags})" if flags else ""),
+            f"Judging skipped  : {stats.skipped} rewrites, {stats.calls_saved} judge calls saved",
+        ]
+        if stats.compared:
+            lines.append(f"Agreement with LLM judges over {stats.compared} rewrites:")
+            for i, criterion in enumerate(CRITERIA):
+                lines.append(
+                    f"  {criterion.capitalize():<14} MAE {stats.abs_error[i] / stats.compared:.2f}"
+                    f"  within ±1 {stats.within_one[i] / stats.compared:.0%}"
+                )
+            if stats.flagged_compared:
+                lines.append(
+                    f"  Flagged rewrites the LLM also scored <= {FAIL_SCORE}: "
+                    f"{stats.flagged_llm_fail}/{stats.flagged_compared} "
+                    f"({stats.flagged_llm_fail / stats.flagged_compared:.0%})"
+                )
+            if stats.passed_compared:
+                lines.append(
+                    f"  Passed rewrites the LLM scored <= {FAIL_SCORE}: "
+                    f"{stats.passed_llm_fail}/{stats.passed_compared} "
+                    f"({stats.passed_llm_fail / stats.passed_compared:.0%})"
+                )
+        return "\n".join(lines)
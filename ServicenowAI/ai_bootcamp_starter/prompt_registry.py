@@ -0,0 +1,240 @@
+import hashlib
+import os
+import string
+import threading
+import time
+from dataclasses import dataclass
+import yaml
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROMPT_PATH = os.path.join(BASE_DIR, "prompts.yaml")
+
+ROLES = ("system", "user")
+
+# Used for every action that has no `system:` entry in prompts.yaml
+DEFAULT_SYSTEM_PROMPT = (
+    "You are a professional writing assistant.\n"
+    "Rules:\n"
+    "- Output ONLY the rewritten paragraph content.\n"
+    "- Do NOT include subject lines, greetings, or signatures.\n"
+    "- Do NOT provide explanations.\n"
+    "- Return plain text only."
+)
+
+
+# ---------------- TEMPLATES ----------------
+class CompiledTemplate:
+    """
+    A str.format template split once into literal text and field names,
+    so rendering is a single join. Only plain {name} fields are allowed.
+    """
+
+    def __init__(self, text: str, where: str):
+        self.text = text
+        self._parts = []
+        fields = []
+
+        try:
+            parsed = list(string.Formatter().parse(text))
+        except ValueError as e:
+            raise ValueError(f"{where}: {e}") from e
+
+        for literal, field, spec, conversion in parsed:
+            if field is None:
+                self._parts.append((literal, None))
+                continue
+            if not field.isidentifier() or spec or conversion:
+                raise ValueError(f"{where}: only plain {{name}} placeholders are supported, got {{{field}}}")
+            self._parts.append((literal, field))
+            fields.append(field)
+
+        self.placeholders = frozenset(fields)
+
+    def render(self, values: dict) -> str:
+        missing = self.placeholders - values.keys()
+        if missing:
+            raise ValueError(f"Missing placeholder values: {', '.join(sorted(missing))}")
+
+        out = []
+        for literal, field in self._parts:
+            out.append(literal)
+            if field is not None:
+                out.append(str(values[field]))
+        return "".join(out)
+
+
+# ---------------- REGISTRY ----------------
+@dataclass(frozen=True)
+class PromptSnapshot:
+    """
+    One loaded version of the prompts file: its short content hash and
+    the templates compiled from exactly that content.
+    """
+    version: str
+    templates: dict
+    system_messages: dict
+
+    def template(self, action: str, role: str) -> CompiledTemplate:
+        if action not in self.templates:
+            raise ValueError(f"Prompt action '{action}' not found in prompts.yaml")
+        if role not in self.templates[action]:
+            raise ValueError(f"Role '{role}' missing under '{action}' in prompts.yaml")
+        return self.templates[action][role]
+
+    def messages(self, action: str, **values) -> list:
+        """[system, user] messages; the system dict is shared, do not mutate it."""
+        if action not in self.templates:
+            raise ValueError(f"Prompt action '{action}' not found in prompts.yaml")
+        return [
+            self.system_messages[action],
+            {"role": "user", "content": self.templates[action]["user"].render(values)},
+        ]
+
+
+class PromptRegistry:
+    """
+    Validated, precompiled view of prompts.yaml.
+
+    Every action needs a `user` template containing {selected_text};
+    `system` is optional and must be static. System messages are built
+    once and shared between calls. The file is re-checked at most every
+    `check_interval` seconds and reloaded when it changes; a broken
+    edit is reported and the last good version stays active.
+
+    A reload swaps in a new PromptSnapshot with a single assignment, so
+    a reader never pairs one version's hash with another's templates.
+    Callers that need several things from one version use snapshot().
+    """
+
+    def __init__(self, path: str = PROMPT_PATH, check_interval: float = 1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._next_check = 0.0
+        self._stamp = None
+        self._load()
+
+    # ---------------- LOADING ----------------
+    def _file_stamp(self):
+        st = os.stat(self.path)
+        return st.st_mtime_ns, st.st_size
+
+    def _load(self):
+        stamp = self._file_stamp()
+        with open(self.path, "rb") as f:
+            raw = f.read()
+
+        templates, system_messages = self._compile(yaml.safe_load(raw))
+
+        # Short content hash of prompts.yaml, for keying caches and results
+        self._snapshot = PromptSnapshot(hashlib.sha256(raw).hexdigest()[:12], templates, system_messages)
+        self._stamp = stamp
+
+    def _compile(self, data):
+        if not isinstance(data, dict) or not data:
+            raise ValueError(f"{self.path}: expected a mapping of actions")
+
+        templates = {}
+        system_messages = {}
+
+        for action, roles in data.items():
+            if not isinstance(roles, dict):
+                raise ValueError(f"{self.path}: '{action}' must map roles to templates")
+
+            unknown = set(roles) - set(ROLES)
+            if unknown:
+                raise ValueError(f"{self.path}: unknown role(s) under '{action}': {', '.join(sorted(unknown))}")
+            if "user" not in roles:
+                raise ValueError(f"Role 'user' missing under '{action}' in prompts.yaml")
+
+            templates[action] = {}
+            for role, text in roles.items():
+                if not isinstance(text, str):
+                    raise ValueError(f"{self.path}: {action}.{role} must be a string")
+                templates[action][role] = CompiledTemplate(text, f"{action}.{role}")
+
+            if "selected_text" not in templates[action]["user"].placeholders:
+                raise ValueError(f"{self.path}: {action}.user must contain {{selected_text}}")
+
+            system = templates[action].get("system")
+            if system is not None and system.placeholders:
+                raise ValueError(f"{self.path}: {action}.system must not contain placeholders")
+
+            system_text = system.text if system is not None else DEFAULT_SYSTEM_PROMPT
+            system_messages[action] = {"role": "system", "content": system_text}
+
+        return templates, system_messages
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+
+        with self._lock:
+            if now < self._next_check:
+                return
+            self._next_check = now + self.check_interval
+
+            try:
+                stamp = self._file_stamp()
+            except OSError as e:
+                print(f"⚠️ Keeping prompts version {self.version}; {e}")
+                return
+            if stamp == self._stamp:
+                return
+
+            # Remembered even if the load fails, so a broken edit is reported once
+            self._stamp = stamp
+            old_version = self.version
+            try:
+                self._load()
+            except (OSError, ValueError, yaml.YAMLError) as e:
+                print(f"⚠️ Keeping prompts version {self.version}; reload failed: {e}")
+                return
+
+            if self.version != old_version:
+                print(f"🔄 Reloaded {os.path.basename(self.path)} (version {self.version})")
+
+    @property
+    def version(self) -> str:
+        return self._snapshot.version
+
+    @property
+    def label(self) -> str:
+        """File name and version, e.g. prompts.yaml@1a2b3c4d5e6f (results and sweep tables)."""
+        return f"{os.path.basename(self.path)}@{self.snapshot().version}"
+
+    # ---------------- LOOKUP ----------------
+    def snapshot(self) -> PromptSnapshot:
+        """The current version, after picking up any change to the file."""
+        self._maybe_reload()
+        return self._snapshot
+
+    def actions(self):
+        return list(self.snapshot().templates)
+
+    def placeholders(self, action: str, role: str = "user") -> frozenset:
+        return self.template(action, role).placeholders
+
+    def template(self, action: str, role: str) -> CompiledTemplate:
+        return self.snapshot().template(action, role)
+
+    def render(self, action: str, role: str, **values) -> str:
+        return self.template(action, role).render(values)
+
+    def messages(self, action: str, **values) -> list:
+        """[system, user] messages; the system dict is shared, do not mutate it."""
+        return self.snapshot().messages(action, **values)
+
+
+_default_registry = None
+_default_lock = threading.Lock()
+
+
+def get_prompt_registry() -> PromptRegistry:
+    """Process-wide registry for prompts.yaml (PROMPT_PATH env var overrides)."""
+    global _default_registry
+    with _default_lock:
+        if _default_registry is None:
+            _default_registry = PromptRegistry(os.getenv("PROMPT_PATH", PROMPT_PATH))
+        return _default_registry
@@ -0,0 +1,390 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from dotenv import load_dotenv
+import openai
+
+load_dotenv()
+
+# ---------------- QUOTA SETTINGS ----------------
+# Per-deployment quota, as shown on the Azure OpenAI deployment page
+DEFAULT_RPM = float(os.getenv("MODEL_RPM", "300"))
+DEFAULT_TPM = float(os.getenv("MODEL_TPM", "150000"))
+
+MAX_RETRIES = int(os.getenv("MODEL_MAX_RETRIES", "6"))
+BASE_DELAY = float(os.getenv("MODEL_RETRY_BASE_DELAY", "0.5"))
+MAX_DELAY = float(os.getenv("MODEL_RETRY_MAX_DELAY", "30"))
+
+MIN_CONCURRENCY = int(os.getenv("MODEL_MIN_CONCURRENCY", "1"))
+MAX_CONCURRENCY = int(os.getenv("MODEL_MAX_CONCURRENCY", "32"))
+INITIAL_CONCURRENCY = int(os.getenv("MODEL_INITIAL_CONCURRENCY", "4"))
+
+# Completion budget assumed before the real usage is known
+DEFAULT_COMPLETION_TOKENS = 512
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+
+class ModelCallError(Exception):
+    """Raised when a model call still fails after all retries."""
+
+
+def estimate_tokens(messages, completion_tokens: int = DEFAULT_COMPLETION_TOKENS) -> int:
+    # ~4 characters per token is close enough for quota pacing
+    chars = sum(len(str(m.get("content", ""))) for m in messages)
+    return chars // 4 + completion_tokens
+
+
+def retry_after_seconds(error):
+    """Reads Retry-After (or Azure's retry-after-ms) from an API error."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+
+    headers = response.headers
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        if "retry-after" in headers:
+            return float(headers["retry-after"])
+    except ValueError:
+        return None
+    return None
+
+
+# ---------------- TOKEN BUCKET ----------------
+class TokenBucket:
+    """
+    Refills `rate_per_minute` units per minute up to one minute's worth.
+    reserve() always succeeds and returns how long the caller must wait
+    before its reservation is covered, so it works for threads and
+    coroutines alike.
+    """
+
+    def __init__(self, rate_per_minute: float):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = rate_per_minute
+        self.level = rate_per_minute
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.level -= amount
+            if self.level >= 0:
+                return 0.0
+            return -self.level / self.rate
+
+    def adjust(self, delta: float):
+        """Corrects an earlier reservation once real usage is known."""
+        with self._lock:
+            self.level = min(self.capacity, self.level - delta)
+
+
+# ---------------- AIMD CONCURRENCY ----------------
+class AIMDController:
+    """
+    Additive-increase / multiplicative-decrease concurrency limit.
+    Starts in slow-start (+1 per success) until the first throttle;
+    after that each success adds 1/limit (about +1 per full window)
+    and a throttle halves the limit. The limit is halved at most once
+    per window: 429s for requests sent before the last decrease come
+    from the same overload and are ignored.
+    """
+
+    def __init__(
+        self,
+        initial: int = INITIAL_CONCURRENCY,
+        minimum: int = MIN_CONCURRENCY,
+        maximum: int = MAX_CONCURRENCY,
+    ):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = float(max(minimum, min(initial, maximum)))
+        self.in_flight = 0
+        self.slow_start = True
+        self.last_decrease = float("-inf")
+        self._cond = threading.Condition()
+        # (loop, future) of coroutines waiting in acquire_async
+        self._async_waiters = []
+
+    def try_acquire(self) -> bool:
+        with self._cond:
+            if self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return True
+            return False
+
+    def acquire(self):
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    async def acquire_async(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._cond:
+                if self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    return
+                waiter = (loop, loop.create_future())
+                self._async_waiters.append(waiter)
+            try:
+                await waiter[1]
+            finally:
+                with self._cond:
+                    if waiter in self._async_waiters:
+                        self._async_waiters.remove(waiter)
+
+    def _notify(self):
+        """Wakes every waiter, threads and coroutines alike; call with _cond held."""
+        self._cond.notify_all()
+        for loop, future in self._async_waiters:
+            try:
+                # Waiters may sit on other threads' event loops
+                loop.call_soon_threadsafe(_wake, future)
+            except RuntimeError:
+                pass  # loop already closed
+        self._async_waiters.clear()
+
+    def release(self):
+        with self._cond:
+            self.in_flight -= 1
+            self._notify()
+
+    def on_success(self):
+        with self._cond:
+            step = 1.0 if self.slow_start else 1.0 / self.limit
+            self.limit = min(self.maximum, self.limit + step)
+            self._notify()
+
+    def on_throttle(self, sent_at: float = None):
+        """
+        Halves the limit for a 429 on a request sent at `sent_at`
+        (time.monotonic()), unless the limit was already cut after it was sent.
+        """
+        with self._cond:
+            if sent_at is not None and sent_at < self.last_decrease:
+                return
+            self.slow_start = False
+            self.limit = max(self.minimum, self.limit / 2)
+            self.last_decrease = time.monotonic()
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
+
+
+# ---------------- RATE LIMITER ----------------
+class RateLimiter:
+    """
+    Shared pacing for one deployment: request and token buckets,
+    a cool-down window set from Retry-After, an AIMD concurrency limit
+    and jittered exponential retries.
+    """
+
+    def __init__(
+        self,
+        rpm: float = DEFAULT_RPM,
+        tpm: float = DEFAULT_TPM,
+        max_retries: int = MAX_RETRIES,
+        controller: AIMDController = None,
+    ):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_retries = max_retries
+        self.controller = controller or AIMDController()
+        self.blocked_until = 0.0
+
+        self.retries = 0
+        self.throttles = 0
+        self._lock = threading.Lock()
+
+    # ---------------- PACING ----------------
+    def _wait_time(self, tokens: int) -> float:
+        wait = max(self.requests.reserve(1), self.tokens.reserve(tokens))
+        return max(wait, self.blocked_until - time.monotonic())
+
+    def _backoff(self, attempt: int, error, sent_at: float = None) -> float:
+        delay = random.uniform(0, min(MAX_DELAY, BASE_DELAY * 2 ** attempt))
+        retry_after = retry_after_seconds(error)
+
+        if isinstance(error, openai.RateLimitError):
+            self.controller.on_throttle(sent_at)
+            with self._lock:
+                self.throttles += 1
+                if retry_after:
+                    # Everyone sharing this deployment backs off together
+                    self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+
+        with self._lock:
+            self.retries += 1
+        return max(delay, retry_after or 0)
+
+    def _settle(self, response, estimated: int):
+        usage = getattr(response, "usage", None)
+        if usage is not None and getattr(usage, "total_tokens", None):
+            self.tokens.adjust(usage.total_tokens - estimated)
+        self.controller.on_success()
+
+    # ---------------- CALLS ----------------
+    def _open(self, fn, estimated_tokens: int, info: dict) -> tuple:
+        """
+        The retry loop of call(): returns (fn()'s result, time it was sent)
+        with the concurrency slot still held; the caller releases it.
+        """
+        info["queued_s"] = 0.0
+
+        for attempt in range(self.max_retries + 1):
+            info["retries"] = attempt
+            queued = time.monotonic()
+            time.sleep(self._wait_time(estimated_tokens))
+            self.controller.acquire()
+            info["queued_s"] += time.monotonic() - queued
+
+            sent_at = time.monotonic()
+            try:
+                return fn(), sent_at
+            except RETRYABLE_ERRORS as e:
+                self.controller.release()
+                if attempt == self.max_retries:
+                    raise ModelCallError(f"gave up after {attempt + 1} attempts: {e}") from e
+                delay = self._backoff(attempt, e, sent_at)
+            except BaseException:
+                self.controller.release()
+                raise
+
+            time.sleep(delay)
+            info["queued_s"] += delay
+
+    def call(self, fn, estimated_tokens: int, info: dict = None):
+        """
+        Runs fn() under the limits, retrying throttles and transient errors.
+        If `info` is given, info["retries"] is set to the retries used and
+        info["queued_s"] to the time spent waiting on pacing and backoff.
+        """
+        info = info if info is not None else {}
+        response, _ = self._open(fn, estimated_tokens, info)
+        try:
+            self._settle(response, estimated_tokens)
+        finally:
+            self.controller.release()
+        return response
+
+    def stream(self, fn, estimated_tokens: int, info: dict = None, completion_tokens: int = DEFAULT_COMPLETION_TOKENS):
+        """
+        call() for stream=True responses: yields the chunks of fn()'s
+        stream and holds the concurrency slot until the stream is
+        exhausted or closed. Settles with the usage chunk if the stream
+        sends one, otherwise with the prompt estimate plus ~4 characters
+        per streamed token (`completion_tokens` is the completion budget
+        included in `estimated_tokens`). Opening is retried like call();
+        a throttle once chunks have been yielded is reported to the AIMD
+        controller and raised.
+        """
+        info = info if info is not None else {}
+        stream, sent_at = self._open(fn, estimated_tokens, info)
+
+        total_tokens = None
+        chars = 0
+        try:
+            for chunk in stream:
+                usage = getattr(chunk, "usage", None)
+                if usage is not None and getattr(usage, "total_tokens", None):
+                    total_tokens = usage.total_tokens
+                for choice in chunk.choices or ():
+                    delta = getattr(choice, "delta", None)
+                    chars += len(getattr(delta, "content", None) or "")
+                yield chunk
+        except openai.RateLimitError:
+            self.controller.on_throttle(sent_at)
+            with self._lock:
+                self.throttles += 1
+            raise
+        else:
+            if total_tokens is None:
+                total_tokens = estimated_tokens - completion_tokens + chars // 4
+            self.tokens.adjust(total_tokens - estimated_tokens)
+            self.controller.on_success()
+        finally:
+            self.controller.release()
+            close = getattr(stream, "close", None)
+            if close is not None:
+                close()
+
+    async def acall(self, coro_fn, estimated_tokens: int, info: dict = None):
+        """asyncio version of call(); coro_fn() must return an awaitable."""
+        info = info if info is not None else {}
+        info["queued_s"] = 0.0
+
+        for attempt in range(self.max_retries + 1):
+            info["retries"] = attempt
+            queued = time.monotonic()
+            await asyncio.sleep(self._wait_time(estimated_tokens))
+            await self.controller.acquire_async()
+            info["queued_s"] += time.monotonic() - queued
+
+            sent_at = time.monotonic()
+            try:
+                response = await coro_fn()
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    raise ModelCallError(f"gave up after {attempt + 1} attempts: {e}") from e
+                delay = self._backoff(attempt, e, sent_at)
+            else:
+                self._settle(response, estimated_tokens)
+                return response
+            finally:
+                self.controller.release()
+
+            await asyncio.sleep(delay)
+            info["queued_s"] += delay
+
+    def stats(self) -> dict:
+        return {
+            "concurrency_limit": int(self.controller.limit),
+            "in_flight": self.controller.in_flight,
+            "retries": self.retries,
+            "throttles": self.throttles,
+        }
+
+
+# ---------------- SHARED LIMITERS ----------------
+# Fraction of the deployment quota this process may use; worker
+# processes that share one deployment each get 1 / workers
+QUOTA_SHARE = 1.0
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(model: str) -> RateLimiter:
+    """One limiter per deployment, shared by every class in the process."""
+    with _limiters_lock:
+        if model not in _limiters:
+            _limiters[model] = RateLimiter(
+                rpm=DEFAULT_RPM * QUOTA_SHARE,
+                tpm=DEFAULT_TPM * QUOTA_SHARE,
+            )
+        return _limiters[model]
+
+
+def reset_limiters():
+    """Forgets all limiters (and their AIMD state), e.g. between benchmark runs."""
+    with _limiters_lock:
+        _limiters.clear()
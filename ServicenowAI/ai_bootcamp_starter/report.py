@@ -0,0 +1,170 @@
+import base64
+import html
+import io
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from matplotlib.figure import Figure
+import results_table
+from results_table import CRITERIA
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_REPORT_PATH = os.path.join(BASE_DIR, "results", "eval_report.html")
+
+# Trend lines with more samples are drawn as this many bucket means
+MAX_TREND_POINTS = 2000
+
+DPI = 110
+
+
+# ---------------- CHARTS ----------------
+# Figures are built with the object API (no pyplot), so nothing opens a
+# window or touches global state and they can render on a worker thread.
+def plot_averages(name, summary) -> Figure:
+    """Bar per criterion with its bootstrap CI, from a one-row summarize() frame."""
+    row = summary.iloc[0]
+    means = [row[f"{c}_mean"] for c in CRITERIA]
+
+    fig = Figure(figsize=(6, 4), dpi=DPI)
+    ax = fig.subplots()
+    ax.bar(
+        ["Faithfulness", "Completeness", "Robustness"],
+        means,
+        yerr=[
+            [m - row[f"{c}_ci_low"] for m, c in zip(means, CRITERIA)],
+            [row[f"{c}_ci_high"] - m for m, c in zip(means, CRITERIA)],
+        ],
+        capsize=6,
+    )
+    ax.set_title(f"{name} – Average Evaluation Scores (95% CI)")
+    ax.set_ylim(0, 5)
+    ax.set_ylabel("Score (0–5)")
+    return fig
+
+
+def downsample(values: np.ndarray, max_points: int = MAX_TREND_POINTS):
+    """(x, y): the series itself, or means of equal buckets if it is longer than max_points."""
+    n = len(values)
+    if n <= max_points:
+        return np.arange(n), values
+
+    size = -(-n // max_points)
+    padded = np.full(size * -(-n // size), np.nan)
+    padded[:n] = values
+    buckets = padded.reshape(-1, size)
+    return np.arange(len(buckets)) * size + size / 2, np.nanmean(buckets, axis=1)
+
+
+def plot_trends(name, table, max_points: int = MAX_TREND_POINTS) -> Figure:
+    fig = Figure(figsize=(8, 4), dpi=DPI)
+    ax = fig.subplots()
+    for criterion in CRITERIA:
+        x, y = downsample(table[criterion].to_numpy(dtype=float, na_value=np.nan), max_points)
+        ax.plot(x, y, label=criterion.capitalize())
+
+    bucketed = len(table) > max_points
+    ax.set_title(f"{name} – Score Trend Across Samples" + (" (bucket means)" if bucketed else ""))
+    ax.set_xlabel("Sample Index")
+    ax.set_ylabel("Score (0–5)")
+    ax.set_ylim(0, 5)
+    ax.legend()
+    return fig
+
+
+def _png(fig: Figure) -> bytes:
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", bbox_inches="tight")
+    return buffer.getvalue()
+
+
+# ---------------- REPORT ----------------
+class ReportBuilder:
+    """
+    Renders each dataset's charts on a background thread as soon as its
+    results are added, then writes one static report when the run ends.
+    A .html path gets the summary tables and the charts inline; a .png
+    path gets every chart stacked into a single image.
+    """
+
+    def __init__(self, path: str = DEFAULT_REPORT_PATH, max_points: int = MAX_TREND_POINTS):
+        self.path = path
+        self.max_points = max_points
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="report")
+        self._charts = []
+
+    def add_dataset(self, name: str, table, summary):
+        """Queues the charts of one dataset; returns immediately."""
+        if summary.empty:
+            return
+        self._charts.append((name, self._executor.submit(self._render, name, table, summary)))
+
+    def _render(self, name, table, summary):
+        return [
+            _png(plot_averages(name, summary)),
+            _png(plot_trends(name, table, self.max_points)),
+        ]
+
+    def write(self, table, group_bys=(("dataset",),)) -> str:
+        """Waits for the charts and writes the report; returns its path."""
+        charts = [(name, future.result()) for name, future in self._charts]
+        self._executor.shutdown()
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        if os.path.splitext(self.path)[1].lower() == ".png":
+            self._write_png(charts)
+        else:
+            self._write_html(table, group_bys, charts)
+        return self.path
+
+    def _write_png(self, charts):
+        images = [png for _, pngs in charts for png in pngs]
+        if not images:
+            return
+
+        import matplotlib.image as mpimg
+
+        decoded = [mpimg.imread(io.BytesIO(png), format="png") for png in images]
+        height = sum(img.shape[0] for img in decoded) / DPI
+        width = max(img.shape[1] for img in decoded) / DPI
+        fig = Figure(figsize=(width, height), dpi=DPI)
+        axes = fig.subplots(len(decoded), 1, squeeze=False)[:, 0]
+        for ax, img in zip(axes, decoded):
+            ax.imshow(img)
+            ax.axis("off")
+        fig.subplots_adjust(0, 0, 1, 1, 0, 0)
+        fig.savefig(self.path, format="png")
+
+    def _write_html(self, table, group_bys, charts):
+        sections = []
+        for by in group_bys:
+            summary = results_table.summarize(table, by)
+            if summary.empty:
+                continue
+            sections.append(
+                f"<h2>Summary by {html.escape(' / '.join(by) or 'all')}</h2>"
+                + summary.to_html(index=False, float_format=lambda v: f"{v:.2f}", na_rep="–", border=0)
+            )
+
+        for name, pngs in charts:
+            images = "".join(
+                f'<img alt="{html.escape(name)}" src="data:image/png;base64,{base64.b64encode(png).decode()}">'
+                for png in pngs
+            )
+            sections.append(f"<h2>{html.escape(name)}</h2><div class=charts>{images}</div>")
+
+        page = f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Evaluation report</title>
+<style>
+body {{ font-family: sans-serif; margin: 2em; }}
+table {{ border-collapse: collapse; font-size: 0.9em; }}
+th, td {{ padding: 4px 10px; text-align: right; border-bottom: 1px solid #ddd; }}
+.charts img {{ max-width: 48%; margin: 0.5em 1% 0 0; }}
+</style></head><body>
+<h1>LLM-as-a-Judge evaluation report</h1>
+<p>{len(table)} scored samples · generated {time.strftime("%Y-%m-%d %H:%M:%S")}</p>
+{"".join(sections) or "<p>No valid samples evaluated.</p>"}
+</body></html>
+"""
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(page)
@@ -0,0 +1,195 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_CACHE_PATH = os.getenv(
+    "RESPONSE_CACHE_PATH", os.path.join(BASE_DIR, ".cache", "responses.sqlite3")
+)
+DEFAULT_MAX_BYTES = int(float(os.getenv("RESPONSE_CACHE_MAX_MB", "256")) * 1024 * 1024)
+DEFAULT_MAX_AGE = float(os.getenv("RESPONSE_CACHE_MAX_AGE_DAYS", "30")) * 24 * 3600
+
+# How many writes between two eviction passes
+EVICT_EVERY = 200
+
+
+class ResponseCache:
+    """
+    Persistent, content-addressed cache of model responses (SQLite).
+
+    Keys are a SHA-256 of (model, messages, temperature, extra request
+    options), so an identical request always maps to the same entry.
+    Entries older than `max_age_seconds` are ignored and evicted; when
+    the stored text exceeds `max_bytes` the least recently used rows
+    are dropped. `enabled=False` turns every lookup into a bypass.
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_CACHE_PATH,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        max_age_seconds: float = DEFAULT_MAX_AGE,
+        enabled: bool = True,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.enabled = enabled
+
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+    # ---------------- CONNECTION ----------------
+    def _connection(self):
+        # Reopen after a fork: SQLite handles must not cross processes
+        if self._conn is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created REAL NOT NULL,
+                    accessed REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_accessed ON responses(accessed)")
+            conn.commit()
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    # ---------------- KEYS ----------------
+    @staticmethod
+    def make_key(model: str, messages: list, temperature: float, **extra) -> str:
+        payload = {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "extra": extra,
+        }
+        blob = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    # ---------------- READ / WRITE ----------------
+    def get(self, key: str):
+        if not self.enabled:
+            return None
+
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT value, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None or now - row[1] > self.max_age_seconds:
+                self.misses += 1
+                return None
+
+            conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def set(self, key: str, value: str):
+        if not self.enabled:
+            return
+
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, created, accessed) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now),
+            )
+            conn.commit()
+
+            self._writes += 1
+            if self._writes % EVICT_EVERY == 0:
+                self._evict(conn)
+
+    # ---------------- EVICTION ----------------
+    def _evict(self, conn):
+        conn.execute(
+            "DELETE FROM responses WHERE created < ?",
+            (time.time() - self.max_age_seconds,),
+        )
+
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total > self.max_bytes:
+            # Drop least recently used rows until back under budget
+            excess = total - self.max_bytes
+            freed = 0
+            doomed = []
+            for key, size in conn.execute("SELECT key, size FROM responses ORDER BY accessed"):
+                doomed.append((key,))
+                freed += size
+                if freed >= excess:
+                    break
+            conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
+
+        conn.commit()
+
+    def evict(self):
+        with self._lock:
+            self._evict(self._connection())
+
+    def clear(self):
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM responses")
+            conn.commit()
+
+    # ---------------- STATS ----------------
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        with self._lock:
+            entries, size = self._connection().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": size,
+        }
+
+
+# ---------------- DEFAULT INSTANCE ----------------
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_default_cache() -> ResponseCache:
+    """
+    Process-wide cache shared by GenerateEmail and LLMEvaluator.
+    Set RESPONSE_CACHE_DISABLE=1 to bypass it.
+    """
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = ResponseCache(
+                enabled=os.getenv("RESPONSE_CACHE_DISABLE", "0") != "1"
+            )
+        return _default_cache
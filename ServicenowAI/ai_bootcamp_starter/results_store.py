@@ -0,0 +1,79 @@
+import json
+import os
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_RESULTS_PATH = os.path.join(BASE_DIR, "results", "eval_results.jsonl")
+
+
+class ResultsStore:
+    """
+    Append-only JSONL checkpoint of scored samples.
+
+    Every finished sample is written (and flushed) as one line, so an
+    interrupted run loses at most the samples that were in flight.
+    Rows are keyed by (dataset, id, model, prompt_version, judge_model,
+    judge_mode); when a key appears more than once the last row wins.
+    A torn final line from a crash is cut off on load, so the next row
+    starts on a line of its own.
+    """
+
+    def __init__(self, path: str = DEFAULT_RESULTS_PATH):
+        self.path = path
+        self._rows = {}
+        self._lock = threading.Lock()
+
+        if os.path.exists(path):
+            with open(path, "rb+") as f:
+                end = 0
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    end += len(line)
+                    try:
+                        row = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self._rows[self.key_of(row)] = row
+                # Drop the torn tail, as StreamingJsonlWriter._recover does
+                f.truncate(end)
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+
+    @staticmethod
+    def make_key(dataset: str, record_id, model: str, prompt_version: str, judge_model: str, judge_mode: str) -> tuple:
+        return (dataset, str(record_id), model, prompt_version, judge_model, judge_mode)
+
+    @classmethod
+    def key_of(cls, row: dict) -> tuple:
+        return cls.make_key(
+            row["dataset"], row["id"], row["model"], row["prompt_version"],
+            row.get("judge_model"), row.get("judge_mode"),
+        )
+
+    def get(self, key: tuple):
+        with self._lock:
+            return self._rows.get(key)
+
+    def __contains__(self, key: tuple) -> bool:
+        with self._lock:
+            return key in self._rows
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._rows)
+
+    def append(self, row: dict):
+        row = {**row, "ts": time.time()}
+        line = json.dumps(row, ensure_ascii=False) + "\n"
+
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            self._rows[self.key_of(row)] = row
+
+    def close(self):
+        with self._lock:
+            self._file.close()
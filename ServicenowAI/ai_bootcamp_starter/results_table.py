@@ -0,0 +1,203 @@
+import os
+import numpy as np
+import pandas as pd
+from dataset_registry import iter_dataset, matches
+
+CRITERIA = ("faithfulness", "completeness", "robustness")
+
+SCORE_MAX = 5
+# Scores are binned to hundredths: score-only judging reports the
+# expected value of its logprob distribution, not a whole number
+SCORE_STEPS = 100
+SCORE_VALUES = np.arange(SCORE_MAX * SCORE_STEPS + 1) / SCORE_STEPS
+
+# One row per scored record
+COLUMNS = {
+    "dataset": "category",
+    "id": "string",
+    # Generator deployment, judge deployment and prompts file@version
+    "model": "category",
+    "judge_model": "category",
+    "prompts": "category",
+    "action": "category",
+    "tone": "category",
+    "faithfulness": "Float32",
+    "completeness": "Float32",
+    "robustness": "Float32",
+    "latency_s": "float32",
+    "tokens": "Int32",
+    "input_chars": "Int32",
+    # "llm", or "precheck" when the local pre-check scores stood in for the judges
+    "scored_by": "category",
+    # Pre-check flags ("pass", "dropped_entities", ...); empty when it was off
+    "precheck": "category",
+    # Set for the experimental synthetic corpus only
+    "structure_type": "category",
+    "ambiguity_level": "category",
+    "noise_level": "category",
+}
+
+# Upper bounds (chars) of the "length" group-by buckets
+LENGTH_BUCKETS = (0, 300, 800, np.inf)
+LENGTH_LABELS = ("short", "medium", "long")
+
+GROUP_COLUMNS = (
+    "dataset", "model", "judge_model", "prompts", "action", "tone", "length", "scored_by", "precheck",
+    "structure_type", "ambiguity_level", "noise_level",
+)
+
+
+# ---------------- TABLE ----------------
+def build_table(rows) -> pd.DataFrame:
+    """
+    Columnar results table from row dicts (see COLUMNS). Scores are
+    nullable Float32 and the labels are categoricals, so millions of rows
+    stay small and group-bys run on integer codes.
+    """
+    frame = pd.DataFrame.from_records(list(rows), columns=list(COLUMNS))
+    return frame.astype(COLUMNS)
+
+
+def save_table(frame: pd.DataFrame, path: str):
+    """Writes the table as Parquet, Arrow IPC (.arrow / .feather), CSV or JSONL."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    ext = os.path.splitext(path)[1].lower()
+
+    if ext == ".parquet":
+        frame.to_parquet(path, index=False, compression="zstd")
+    elif ext in (".arrow", ".feather"):
+        frame.reset_index(drop=True).to_feather(path)
+    elif ext == ".csv":
+        frame.to_csv(path, index=False)
+    else:
+        frame.to_json(path, orient="records", lines=True, force_ascii=False)
+
+
+def load_table(path: str, filters: dict = None) -> pd.DataFrame:
+    """
+    Reads a table written by save_table, or a results JSONL checkpoint.
+    `filters` ({column: value(s)}) are pushed down for Parquet / Arrow.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".parquet", ".arrow", ".feather"):
+        from columnar_io import read_table
+        return read_table(path, filters, columns=list(COLUMNS)).to_pandas().astype(COLUMNS)
+    if ext == ".csv":
+        return build_table(r for r in pd.read_csv(path).to_dict("records") if matches(r, filters))
+    return build_table(iter_dataset(path, filters=filters))
+
+
+def with_length(frame: pd.DataFrame) -> pd.DataFrame:
+    """Adds the categorical `length` bucket of input_chars."""
+    return frame.assign(
+        length=pd.cut(frame["input_chars"].astype("float64"), LENGTH_BUCKETS, labels=LENGTH_LABELS, right=False)
+    )
+
+
+def valid(frame: pd.DataFrame) -> pd.DataFrame:
+    """Rows where all three criteria have a score."""
+    return frame.dropna(subset=list(CRITERIA))
+
+
+# ---------------- STATISTICS ----------------
+def score_bins(scores) -> np.ndarray:
+    """Index into SCORE_VALUES of each score."""
+    return np.rint(np.asarray(scores, dtype=float) * SCORE_STEPS).astype(np.int64)
+
+
+def _score_counts(frame: pd.DataFrame, by: list, criterion: str) -> pd.DataFrame:
+    """Groups x SCORE_VALUES matrix of how often each score occurs."""
+    bins = score_bins(frame[criterion].to_numpy(dtype=float))
+    if not by:
+        counts = np.bincount(bins, minlength=len(SCORE_VALUES))
+        return pd.DataFrame([counts])
+
+    counts = frame.assign(_score=bins).groupby(by, observed=True)["_score"].value_counts()
+    return counts.unstack(fill_value=0).reindex(columns=range(len(SCORE_VALUES)), fill_value=0)
+
+
+def bootstrap_ci(counts: np.ndarray, n_boot: int = 2000, ci: float = 0.95, seed: int = 0):
+    """
+    Percentile bootstrap CI of the mean for each row of score counts.
+
+    Scores only take the values in SCORE_VALUES, so resampling n scores
+    with replacement is a multinomial draw over the counts of the values
+    that occur (six at most for whole-number scores). The cost is n_boot
+    x distinct values per group whatever the number of rows.
+    """
+    rng = np.random.default_rng(seed)
+    counts = np.atleast_2d(counts)
+    low, high = np.full(len(counts), np.nan), np.full(len(counts), np.nan)
+    alpha = (1 - ci) / 2
+
+    for i, row in enumerate(counts):
+        n = int(row.sum())
+        if n == 0:
+            continue
+        seen = row > 0
+        draws = rng.multinomial(n, row[seen] / n, size=n_boot)
+        means = draws @ SCORE_VALUES[seen] / n
+        low[i], high[i] = np.quantile(means, [alpha, 1 - alpha])
+
+    return low, high
+
+
+def summarize(frame: pd.DataFrame, by=("dataset",), n_boot: int = 2000, ci: float = 0.95, seed: int = 0) -> pd.DataFrame:
+    """
+    Per group: sample count, mean / std / bootstrap CI per criterion,
+    mean latency and total tokens. `by` may include "length" or the
+    experimental structure_type / ambiguity_level / noise_level.
+    """
+    by = list(by)
+    frame = valid(with_length(frame) if "length" in by else frame)
+    if frame.empty:
+        return pd.DataFrame()
+
+    scores = frame[list(CRITERIA)].astype("float64")
+    if by:
+        stats = scores.groupby([frame[col] for col in by], observed=True).agg(["count", "mean", "std"])
+        extra = frame.groupby(by, observed=True).agg(latency_s=("latency_s", "mean"), tokens=("tokens", "sum"))
+    else:
+        stats = scores.agg(["count", "mean", "std"]).unstack().to_frame().T
+        extra = pd.DataFrame({"latency_s": [frame["latency_s"].mean()], "tokens": [frame["tokens"].sum()]})
+
+    out = pd.DataFrame(index=stats.index)
+    out["n"] = stats[(CRITERIA[0], "count")].astype("int64")
+
+    for criterion in CRITERIA:
+        counts = _score_counts(frame, by, criterion)
+        if by:
+            counts = counts.reindex(stats.index, fill_value=0)
+        low, high = bootstrap_ci(counts.to_numpy(), n_boot, ci, seed)
+        out[f"{criterion}_mean"] = stats[(criterion, "mean")]
+        out[f"{criterion}_std"] = stats[(criterion, "std")]
+        out[f"{criterion}_ci_low"] = low
+        out[f"{criterion}_ci_high"] = high
+
+    out["latency_s"] = extra["latency_s"].to_numpy()
+    out["tokens"] = extra["tokens"].to_numpy()
+    return out.reset_index() if by else out.reset_index(drop=True)
+
+
+def format_summary(summary: pd.DataFrame, by=("dataset",)) -> str:
+    if summary.empty:
+        return "No valid samples evaluated"
+
+    by = list(by)
+    label_width = max([len(" / ".join(by))] + [
+        len(" / ".join(str(v) for v in values)) for values in summary[by].itertuples(index=False)
+    ]) + 2 if by else 6
+
+    header = f"{' / '.join(by) or 'all':<{label_width}}{'n':>9}" + "".join(
+        f"{name.capitalize():>24}" for name in CRITERIA
+    )
+    lines = [header, "-" * len(header)]
+    for row in summary.itertuples(index=False):
+        row = row._asdict()
+        label = " / ".join(str(row[col]) for col in by) or "all"
+        cells = "".join(
+            f"{row[f'{c}_mean']:>8.2f} [{row[f'{c}_ci_low']:.2f}, {row[f'{c}_ci_high']:.2f}]".rjust(24)
+            for c in CRITERIA
+        )
+        lines.append(f"{label:<{label_width}}{row['n']:>9}{cells}")
+    return "\n".join(lines)
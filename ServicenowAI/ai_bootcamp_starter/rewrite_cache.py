@@ -0,0 +1,140 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAX_BYTES = int(float(os.getenv("REWRITE_CACHE_MAX_MB", "64")) * 1024 * 1024)
+
+# Rough per-entry bookkeeping cost (key tuple, OrderedDict node)
+ENTRY_OVERHEAD = 256
+
+
+class _InFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        # False if the owner was interrupted (e.g. a Streamlit rerun)
+        self.finished = False
+
+
+class RewriteLRU:
+    """
+    Bounded, thread-safe in-memory LRU of generated rewrites.
+
+    Meant to be created once per process (st.cache_resource) so every
+    Streamlit session shares it. Concurrent misses on the same key are
+    coalesced: one caller generates, the others wait for its result.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._inflight = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(action: str, tone_type: str, text: str, model: str, prompt_version: str) -> tuple:
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return (action, tone_type, digest, model, prompt_version)
+
+    @staticmethod
+    def _size(value: str) -> int:
+        return len(value.encode("utf-8")) + ENTRY_OVERHEAD
+
+    # ---------------- READ / WRITE ----------------
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value: str):
+        size = self._size(value)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._size(self._entries.pop(key))
+
+            self._entries[key] = value
+            self._bytes += size
+
+            while self._bytes > self.max_bytes:
+                _, old = self._entries.popitem(last=False)
+                self._bytes -= self._size(old)
+                self.evictions += 1
+
+    def get_or_generate(self, key, generate_fn, should_cache=lambda value: True):
+        """
+        Returns the cached rewrite for `key`, or calls `generate_fn()`
+        exactly once across all threads asking for the same key.
+        Results rejected by `should_cache` (e.g. errors) are returned
+        but not stored. If the generating caller is interrupted before
+        it finishes, a waiter takes over and generates itself.
+        """
+        while True:
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return self._entries[key]
+
+                waiter = self._inflight.get(key)
+                if waiter is None:
+                    self.misses += 1
+                    owner = _InFlight()
+                    self._inflight[key] = owner
+                    break
+                self.coalesced += 1
+
+            waiter.done.wait()
+            if waiter.error is not None:
+                raise waiter.error
+            if waiter.finished:
+                return waiter.value
+
+        try:
+            value = generate_fn()
+            owner.value = value
+            owner.finished = True
+            if should_cache(value):
+                self.put(key, value)
+            return value
+        except Exception as e:
+            owner.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            owner.done.set()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    # ---------------- STATS ----------------
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,157 @@
+import re
+from dataclasses import dataclass, field
+from typing import Optional
+
+SCORE_MAX = 5
+
+# Verdict of the reports score-only judging builds from logprobs; their
+# score is the expected value of the distribution, e.g. "Score: 3.62 / 5"
+SCORE_ONLY_VERDICT = "Score-only"
+
+# "Score: 4 / 5", "**Score:** 4/5", "- Score - 4 out of 5", "Faithfulness score: 4"
+# Anchored at the start of a line so digits inside reasoning never match.
+_SCORE_LINE = re.compile(
+    r"^[\s>*_#-]*(?:[a-z]+\s+)?score[\s*_]*[:=\-–][\s*_]*"
+    r"(?P<value>-?\d+(?:\.\d+)?)[\s*_]*"
+    r"(?:(?:/|out\s+of)\s*(?P<scale>\d+))?",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+_SCORE_LABEL = re.compile(r"^[\s>*_#-]*(?:[a-z]+\s+)?score[\s*_]*[:=\-–]", re.IGNORECASE | re.MULTILINE)
+
+# Used only when no Score: line exists, and only if it is unambiguous
+_BARE_FRACTION = re.compile(r"(?<![\d.])(\d)\s*/\s*5(?!\d)")
+
+_VERDICT_LINE = re.compile(r"^[\s>*_#-]*verdict[\s*_]*:[\s*_]*(?P<value>.*?)[\s*_]*$", re.IGNORECASE | re.MULTILINE)
+
+# Section headers the judge prompts ask for, e.g. "Reasoning:" / "Missing Elements:"
+_SECTION_HEADER = re.compile(
+    r"^[\s>*_#]*(?P<name>reasoning|missing\s+elements)[\s*_]*:[\s*_]*(?P<rest>.*)$",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+_BULLET = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s+")
+
+
+# ---------------- RESULT ----------------
+@dataclass
+class ParsedReport:
+    """
+    One judge report. `score` is None when the report could not be
+    parsed; `error` then says why. It is a whole number, except in
+    score-only reports (hundredths).
+    """
+    score: Optional[float]
+    verdict: str = ""
+    reasoning: list = field(default_factory=list)
+    missing_elements: Optional[list] = None
+    anchored: bool = True
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.score is not None
+
+
+def _failure(reason: str) -> ParsedReport:
+    return ParsedReport(score=None, anchored=False, error=reason)
+
+
+# ---------------- PARSING ----------------
+def _score_from(text: str):
+    """(score, anchored, error) for a report."""
+    if not text or not text.strip():
+        return None, False, "empty report"
+
+    stripped = text.lstrip()
+    if stripped[:6].lower() == "error:":
+        return None, False, f"judge returned an error: {stripped[6:].strip()[:120]}"
+
+    match = _SCORE_LINE.search(text)
+    if match is None:
+        if _SCORE_LABEL.search(text):
+            return None, False, "'Score:' line without a number"
+        fractions = set(_BARE_FRACTION.findall(text))
+        if len(fractions) == 1:
+            return int(fractions.pop()), False, None
+        if fractions:
+            return None, False, "no 'Score:' line and several different N/5 values"
+        return None, False, "no 'Score:' line"
+
+    scale = match.group("scale")
+    if scale is not None and int(scale) != SCORE_MAX:
+        return None, True, f"score given out of {scale}, expected out of {SCORE_MAX}"
+
+    value = float(match.group("value"))
+    fractional = not value.is_integer()
+    if fractional and not _is_score_only(text):
+        return None, True, f"non-integer score {match.group('value')}"
+    if not 0 <= value <= SCORE_MAX:
+        return None, True, f"score {match.group('value')} outside 0-{SCORE_MAX}"
+    return (round(value, 2) if fractional else int(value)), True, None
+
+
+def _is_score_only(text: str) -> bool:
+    verdict = _VERDICT_LINE.search(text)
+    return verdict is not None and verdict.group("value").startswith(SCORE_ONLY_VERDICT)
+
+
+def _sections(text: str) -> dict:
+    """Bullet items under each Reasoning: / Missing Elements: header."""
+    headers = list(_SECTION_HEADER.finditer(text))
+    sections = {}
+
+    for i, header in enumerate(headers):
+        end = headers[i + 1].start() if i + 1 < len(headers) else len(text)
+        body = [header.group("rest")] + text[header.end():end].splitlines()
+
+        items = []
+        for line in body:
+            line = _BULLET.sub("", line).strip()
+            if line:
+                items.append(line)
+        sections[" ".join(header.group("name").lower().split())] = items
+
+    return sections
+
+
+def parse_report(text: str) -> ParsedReport:
+    """
+    Parses a judge report in the format LLMEvaluator asks for:
+
+        Score: <0-5> / 5
+        Verdict: <Short label>
+        Reasoning:
+        - ...
+        Missing Elements:      (completeness only)
+        - ... or None
+    """
+    score, anchored, error = _score_from(text)
+    if error is not None:
+        return _failure(error)
+
+    verdict = _VERDICT_LINE.search(text)
+    sections = _sections(text)
+
+    missing = sections.get("missing elements")
+    if missing is not None and [m.lower().strip(".\"'") for m in missing] in ([], ["none"]):
+        missing = []
+
+    return ParsedReport(
+        score=score,
+        verdict=verdict.group("value") if verdict else "",
+        reasoning=sections.get("reasoning", []),
+        missing_elements=missing,
+        anchored=anchored,
+    )
+
+
+def parse_score(text: str) -> tuple:
+    """(score, None) or (None, reason); skips the Verdict and section parsing."""
+    score, _, error = _score_from(text)
+    return (None, error) if error is not None else (score, None)
+
+
+def extract_score(text):
+    """Score (0-5) of a judge report, or None if it cannot be parsed."""
+    return parse_score(text)[0]
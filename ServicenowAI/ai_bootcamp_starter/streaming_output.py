@@ -0,0 +1,158 @@
+import collections
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from columnar_io import is_columnar, convert
+
+# Tasks allowed to be submitted but not yet written, per worker
+WINDOW_PER_WORKER = 4
+
+# Tries per task (first call included) before run_ordered stops the run
+TASK_ATTEMPTS = 3
+
+
+# ---------------- WRITER ----------------
+class StreamingJsonlWriter:
+    """
+    Appends records to a JSONL file one line at a time, flushed after
+    each record. For .parquet / .arrow paths the lines go to
+    `<path>.partial.jsonl`, which close() converts and removes.
+
+    With `resume`, an existing partial file is kept: a torn last line
+    is cut off and `last_key` is the key of the last complete record.
+    While `incomplete` is set (a run stopped early or was interrupted)
+    close() leaves the partial file in place for the next resume.
+    """
+
+    def __init__(self, path: str, resume: bool = False, key: str = "id"):
+        self.path = path
+        self.key = key
+        self.partial_path = path + ".partial.jsonl" if is_columnar(path) else path
+        self.last_key = None
+        self.written = 0
+        self.incomplete = False
+        self.stopped_at = None
+
+        os.makedirs(os.path.dirname(self.partial_path) or ".", exist_ok=True)
+        if resume and os.path.exists(self.partial_path):
+            self._recover()
+            self._file = open(self.partial_path, "a", encoding="utf-8")
+        else:
+            self._file = open(self.partial_path, "w", encoding="utf-8")
+
+    def _recover(self):
+        with open(self.partial_path, "rb+") as f:
+            data_end = f.seek(0, os.SEEK_END)
+            # Only the tail is read; enough for one record
+            tail_size = min(data_end, 1 << 20)
+            f.seek(data_end - tail_size)
+            tail = f.read()
+
+            cut = tail.rfind(b"\n") + 1
+            if cut < len(tail):
+                f.truncate(data_end - tail_size + cut)
+            complete = tail[:cut].splitlines()
+
+        for line in reversed(complete):
+            try:
+                self.last_key = json.loads(line)[self.key]
+                return
+            except (json.JSONDecodeError, KeyError, TypeError):
+                continue
+
+    def write(self, record: dict):
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        self.written += 1
+
+    def close(self):
+        self._file.close()
+        if self.partial_path != self.path and not self.incomplete:
+            convert(self.partial_path, self.path)
+            os.remove(self.partial_path)
+
+
+# ---------------- ORDERED PARALLEL RUN ----------------
+def run_ordered(
+    work, tasks, writer: StreamingJsonlWriter, max_workers: int, window: int = None, failed=None,
+    attempts: int = TASK_ATTEMPTS,
+) -> int:
+    """
+    Calls work(*task) on a thread pool and writes each result as soon as
+    every earlier task has been written, so the file stays in task order
+    and is always a complete prefix of the run.
+
+    At most `window` tasks are submitted ahead of the oldest unwritten
+    one, which bounds both the futures and the reorder buffer: memory
+    does not grow with len(tasks). Tasks are (key, ...) tuples in
+    ascending key order; those up to writer.last_key (a resumed file)
+    are skipped.
+
+    A task that raises, or whose record `failed(record)` rejects, is
+    tried up to `attempts` times. If it still fails the run stops there:
+    later results are dropped and writer.stopped_at is its key, so the
+    file is still a prefix and a resumed run starts with that task.
+    Returns the number of records written in this run.
+    """
+    window = window or max_workers * WINDOW_PER_WORKER
+    remaining = (task for task in tasks if writer.last_key is None or task[0] > writer.last_key)
+
+    order = collections.deque()     # submitted keys, oldest first
+    buffer = {}                     # finished, waiting for earlier keys
+    in_flight = {}                  # future -> task
+    tries = {}                      # key -> calls so far, until it succeeds
+    stop = None
+    writer.incomplete = True
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        def submit(task):
+            tries[task[0]] = tries.get(task[0], 0) + 1
+            in_flight[executor.submit(work, *task)] = task
+
+        def fill():
+            while stop is None and len(order) < window:
+                task = next(remaining, None)
+                if task is None:
+                    return
+                order.append(task[0])
+                submit(task)
+
+        fill()
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                task = in_flight.pop(future)
+                key = task[0]
+                try:
+                    record = future.result()
+                    error = record.get("error", "rejected") if failed is not None and failed(record) else None
+                except Exception as e:
+                    error = e
+
+                if error is None:
+                    buffer[key] = record
+                    tries.pop(key, None)
+                elif stop is not None and key > stop:
+                    continue
+                elif tries[key] < attempts:
+                    print(f"⚠️ Task {key} failed (try {tries[key]}/{attempts}), retrying:", error)
+                    submit(task)
+                else:
+                    print(f"❌ Task {key} failed {attempts} times:", error)
+                    stop = key if stop is None else min(stop, key)
+
+            if stop is not None:
+                # Work past the failed key could never be written
+                for future, task in list(in_flight.items()):
+                    if task[0] > stop and future.cancel():
+                        del in_flight[future]
+
+            while order and order[0] in buffer and (stop is None or order[0] < stop):
+                writer.write(buffer.pop(order.popleft()))
+            fill()
+
+    writer.stopped_at = stop
+    writer.incomplete = stop is not None
+    if stop is not None:
+        print(f"⛔ Stopped at {writer.key} {stop}: every earlier record is in {writer.partial_path}; resume to retry it")
+    return writer.written
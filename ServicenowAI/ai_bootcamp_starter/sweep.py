@@ -0,0 +1,258 @@
+import argparse
+import asyncio
+import itertools
+import os
+import time
+from dataclasses import dataclass
+from dotenv import load_dotenv
+from generate import AsyncGenerateEmail
+from evaluate import AsyncLLMEvaluator, JUDGE_MODES, CRITERIA
+from score_parser import parse_score
+from prompt_registry import PromptRegistry, PROMPT_PATH
+from dataset_registry import default_registry
+from response_cache import get_default_cache
+from clients import format_connection_stats
+from usage_metrics import usage, usage_tags, count_calls
+import results_table
+from results_table import build_table
+
+# ---------------- ENV ----------------
+load_dotenv()
+
+MODEL_GEN = os.getenv("AZURE_GPT_41_DEPLOYMENT", "gpt-4.1")
+MODEL_JUDGE = os.getenv("AZURE_GPT_4O_MINI_DEPLOYMENT", "gpt-4o-mini")
+
+# Requests in flight across the whole grid
+DEFAULT_CONCURRENCY = int(os.getenv("SWEEP_CONCURRENCY", os.getenv("EVAL_CONCURRENCY", "16")))
+
+# Columns the comparison table is grouped by
+COMPARE_BY = ["model", "prompts", "judge_model", "dataset", "tone"]
+
+
+@dataclass(frozen=True)
+class Cell:
+    """One point of the grid; tone is None for actions other than tone."""
+    gen_model: str
+    judge_model: str
+    prompts: str
+    dataset: str
+    action: str
+    tone: str = None
+
+
+def build_grid(gen_models, judge_models, prompt_files, datasets, tones) -> list:
+    """Every combination; the tone axis only multiplies tone datasets."""
+    cells = []
+    for gen_model, judge_model, prompts, (name, action) in itertools.product(
+        gen_models, judge_models, prompt_files, datasets
+    ):
+        for tone in (tones if action == "tone" else [None]):
+            cells.append(Cell(gen_model, judge_model, prompts, name, action, tone))
+    return cells
+
+
+# ---------------- RUNNER ----------------
+class SweepRunner:
+    """
+    Scores every cell of a grid on the same records over one shared
+    semaphore, so cells overlap instead of running one after another.
+
+    A rewrite depends only on (generator, prompts, action, tone, record),
+    so cells that differ only in the judge await the same generation
+    task: each rewrite is generated once per run.
+    """
+
+    def __init__(self, cells, records: dict, concurrency: int = DEFAULT_CONCURRENCY, judge_mode: str = "separate"):
+        self.cells = cells
+        self.records = records
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.judge_mode = judge_mode
+
+        self._prompts = {path: PromptRegistry(path) for path in {cell.prompts for cell in cells}}
+        self._generators = {}
+        self._evaluators = {}
+        self._generations = {}
+        self.generation_requests = 0
+
+    def _generator(self, model, prompts) -> AsyncGenerateEmail:
+        key = (model, prompts)
+        if key not in self._generators:
+            self._generators[key] = AsyncGenerateEmail(
+                model=model, semaphore=self.semaphore, prompts=self._prompts[prompts]
+            )
+        return self._generators[key]
+
+    def _evaluator(self, model) -> AsyncLLMEvaluator:
+        if model not in self._evaluators:
+            self._evaluators[model] = AsyncLLMEvaluator(
+                model=model, mode=self.judge_mode, semaphore=self.semaphore
+            )
+        return self._evaluators[model]
+
+    async def _generate(self, cell: Cell, original: str) -> tuple:
+        with count_calls() as calls:
+            generator = self._generator(cell.gen_model, cell.prompts)
+            generated = await generator.generate(cell.action, original, tone_type=cell.tone or "Professional")
+        return generated, calls["tokens"]
+
+    def _generation(self, cell: Cell, index: int, original: str) -> asyncio.Future:
+        """
+        Shared task for one rewrite, started by the first cell that needs
+        it; resolves to (text, tokens used).
+        """
+        self.generation_requests += 1
+        key = (cell.gen_model, cell.prompts, cell.dataset, cell.tone, index)
+        if key not in self._generations:
+            self._generations[key] = asyncio.ensure_future(self._generate(cell, original))
+        return self._generations[key]
+
+    async def _score(self, cell: Cell, index: int, rec: dict):
+        original = rec.get("content", "").strip()
+        started = time.perf_counter()
+
+        with usage_tags(dataset=cell.dataset):
+            # Started outside count_calls so the shared task does not add
+            # its tokens to whichever cell happened to start it
+            generation = self._generation(cell, index, original)
+            try:
+                # shield: a failing judge must not cancel a rewrite other cells share
+                generated, generation_tokens = await asyncio.shield(generation)
+            except Exception as e:
+                print(f"⚠️ Generation failed ({cell.gen_model}, {cell.dataset}):", e)
+                return None
+
+            with count_calls() as calls:
+                try:
+                    judged = await self._evaluator(cell.judge_model).judge_all(original, generated)
+                except Exception as e:
+                    print(f"⚠️ Evaluation failed ({cell.judge_model}, {cell.dataset}):", e)
+                    return None
+
+        scores = {}
+        for name in CRITERIA:
+            score, error = parse_score(getattr(judged, name))
+            if error is not None:
+                print(f"⚠️ Unparseable {name} report: {error}")
+            scores[name] = score
+
+        return {
+            "dataset": cell.dataset,
+            "id": rec.get("id"),
+            "model": cell.gen_model,
+            "judge_model": cell.judge_model,
+            "prompts": self._prompts[cell.prompts].label,
+            "action": cell.action,
+            "tone": cell.tone,
+            **scores,
+            "latency_s": time.perf_counter() - started,
+            # What the sample costs on its own: a reused rewrite counts in every cell
+            "tokens": generation_tokens + calls["tokens"],
+            "input_chars": len(original),
+        }
+
+    async def run(self) -> list:
+        """Result rows of every cell x record (None scores where parsing failed)."""
+        jobs = [
+            self._score(cell, index, rec)
+            for cell in self.cells
+            for index, rec in enumerate(self.records[cell.dataset])
+        ]
+        rows = await asyncio.gather(*jobs)
+        return [row for row in rows if row is not None]
+
+
+# ---------------- MAIN ----------------
+def load_records(registry, names, max_samples) -> dict:
+    """The first `max_samples` records with content of each dataset; every cell scores these."""
+    return {
+        name: list(itertools.islice(
+            (rec for rec in registry.iter_records(name) if rec.get("content", "").strip()),
+            max_samples,
+        ))
+        for name in names
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Evaluate a grid of generator x judge x prompts x tone")
+    parser.add_argument("--gen-models", nargs="+", default=[MODEL_GEN], metavar="DEPLOYMENT")
+    parser.add_argument("--judge-models", nargs="+", default=[MODEL_JUDGE], metavar="DEPLOYMENT")
+    parser.add_argument(
+        "--prompts", nargs="+", default=[os.getenv("PROMPT_PATH", PROMPT_PATH)], metavar="YAML",
+        help="prompt files to compare (each is versioned by content hash)"
+    )
+    parser.add_argument("--datasets", nargs="+", default=None, metavar="NAME")
+    parser.add_argument(
+        "--tones", nargs="+", default=["Professional"],
+        help="target tones for tone datasets"
+    )
+    parser.add_argument("--max-samples", type=int, default=10, help="records per dataset (same for every cell)")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="requests in flight for the whole grid")
+    parser.add_argument("--judge-mode", choices=JUDGE_MODES, default=os.getenv("JUDGE_MODE", "separate"))
+    parser.add_argument("--data-root", default=None)
+    parser.add_argument("--no-cache", action="store_true", help="bypass the on-disk response cache")
+    parser.add_argument(
+        "--out", default=None,
+        help="save all result rows as .parquet, .arrow, .csv or .jsonl"
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.no_cache:
+        get_default_cache().enabled = False
+
+    registry = default_registry(data_root=args.data_root)
+    datasets = registry.evaluation_datasets()
+    if args.datasets:
+        unknown = set(args.datasets) - set(datasets)
+        if unknown:
+            raise SystemExit(f"Unknown datasets: {', '.join(sorted(unknown))}")
+        datasets = {name: datasets[name] for name in args.datasets}
+
+    cells = build_grid(
+        args.gen_models, args.judge_models, args.prompts,
+        [(name, action) for name, (_, action) in datasets.items()], args.tones,
+    )
+    records = load_records(registry, datasets, args.max_samples)
+    print(
+        f"Sweep: {len(cells)} cells x up to {args.max_samples} records "
+        f"({sum(len(records[c.dataset]) for c in cells)} samples), {args.concurrency} requests in flight"
+    )
+
+    runner = SweepRunner(cells, records, args.concurrency, args.judge_mode)
+    start = time.time()
+    rows = asyncio.run(runner.run())
+    elapsed = time.time() - start
+
+    table = build_table(rows)
+    # groupby drops missing keys; non-tone datasets have no tone
+    compared = table.assign(tone=table["tone"].astype("object").fillna("-")) if len(table) else table
+    summary = results_table.summarize(compared, COMPARE_BY)
+
+    print("\nSWEEP COMPARISON (mean [95% bootstrap CI])")
+    print("-" * 40)
+    print(results_table.format_summary(summary, COMPARE_BY))
+    if not summary.empty:
+        print("\nLATENCY / TOKENS PER SAMPLE")
+        print("-" * 40)
+        for row in summary.itertuples(index=False):
+            label = " / ".join(str(getattr(row, col)) for col in COMPARE_BY)
+            print(f"{label:<70} {row.latency_s:>7.2f} s {row.tokens / row.n:>9.0f} tok")
+
+    if args.out:
+        results_table.save_table(table, args.out)
+        print(f"\nResults table saved to {args.out} ({len(table)} rows)")
+
+    print("\nSWEEP RUN")
+    print("-" * 40)
+    print(f"Wall-clock      : {elapsed:.2f} s")
+    print(
+        f"Generations     : {len(runner._generations)} made for {runner.generation_requests} samples "
+        f"({runner.generation_requests - len(runner._generations)} reused across judges)"
+    )
+    print(f"HTTP            : {format_connection_stats()}")
+    print("\nMODEL USAGE")
+    print("-" * 40)
+    print(usage.format_summary())
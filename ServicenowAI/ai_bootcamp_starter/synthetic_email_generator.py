@@ -2,21 +2,26 @@ import os
 import json
 import time
 from dotenv import load_dotenv
-from openai import AzureOpenAI
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from clients import get_client, format_connection_stats
+from rate_limit import get_limiter, estimate_tokens
+from usage_metrics import track_call, usage
+from columnar_io import write_records
+from streaming_output import StreamingJsonlWriter, run_ordered
+from dedup import dedup_file
 
 # ---------------- ENV SETUP ----------------
 load_dotenv()
 
+# Jaccard threshold for dropping near-duplicate emails after a parallel
+# run (see dedup.py); 0 / unset keeps every record
+DEDUP_THRESHOLD = float(os.getenv("SYNTHETIC_DEDUP_THRESHOLD", "0")) or None
+
 # ---------------- SYNTHETIC EMAIL GENERATOR ----------------
 class SyntheticEmailGenerator:
     def __init__(self, model: str):
-        self.client = AzureOpenAI(
-            azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-            api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-            api_version=os.getenv("AZURE_OPENAI_API_VERSION")
-        )
+        self.client = get_client()
         self.model = model
+        self.limiter = get_limiter(model)
 
     def generate_email(self, email_id: int, topic: str, tone: str, length: str) -> dict:
         system_prompt = (
@@ -40,16 +45,28 @@ Return ONLY JSON:
 }}
 """
 
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            temperature=0.8
-        )
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
 
-        return json.loads(response.choices[0].message.content.strip())
+        # Throttles and transient errors are retried by the shared limiter
+        with track_call("synthetic", self.model, action=tone.lower()) as call:
+            response = self.limiter.call(
+                lambda: self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=0.8
+                ),
+                estimate_tokens(messages),
+                call,
+            )
+            call["response"] = response
+
+        record = json.loads(response.choices[0].message.content.strip())
+        # Task id, not whatever the model echoed (resume and ordering rely on it)
+        record["id"] = email_id
+        return record
 
 
 # ---------------- DATA CONFIG ----------------
@@ -80,32 +97,37 @@ def generate_sequential(generator, output_path):
     for task in TASKS:
         results.append(generator.generate_email(*task))
 
-    with open(output_path, "w", encoding="utf-8") as f:
-        for r in results:
-            f.write(json.dumps(r, ensure_ascii=False) + "\n")
+    write_records(output_path, results)
 
     return time.time() - start
 
 
 # ---------------- PARALLEL GENERATION ----------------
-def generate_parallel(generator, output_path, max_workers=5):
+def generate_parallel(generator, output_path, max_workers=None, resume=False, dedup=DEDUP_THRESHOLD):
+    """
+    Effective concurrency is set by the generator's AIMD limiter, which
+    grows until the deployment starts throttling; `max_workers` only
+    caps the thread pool (defaults to the limiter's maximum).
+
+    Records are streamed to `output_path` in id order as they finish
+    (see streaming_output.run_ordered); with `resume`, ids already in a
+    partial file are not generated again. With `dedup` (a Jaccard
+    threshold) near-duplicate emails are removed from the finished file.
+    """
     start = time.time()
-    results = []
-
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = [
-            executor.submit(generator.generate_email, *task)
-            for task in TASKS
-        ]
 
-        for future in as_completed(futures):
-            results.append(future.result())
+    if max_workers is None:
+        max_workers = generator.limiter.controller.maximum
 
-    results.sort(key=lambda x: x["id"])
+    writer = StreamingJsonlWriter(output_path, resume=resume)
+    try:
+        run_ordered(generator.generate_email, TASKS, writer, max_workers)
+    finally:
+        writer.close()
 
-    with open(output_path, "w", encoding="utf-8") as f:
-        for r in results:
-            f.write(json.dumps(r, ensure_ascii=False) + "\n")
+    if dedup and not writer.incomplete:
+        removed = dedup_file(output_path, threshold=dedup).duplicates
+        print(f"🧹 Dropped {removed} near-duplicate records from {output_path}")
 
     return time.time() - start
 
@@ -130,6 +152,9 @@ def benchmark():
     print(f"Sequential Time : {seq_time:.2f} seconds")
     print(f"Parallel Time   : {par_time:.2f} seconds")
     print(f"Speedup         : {seq_time / par_time:.2f}x faster")
+    print(f"Connections     : {format_connection_stats()}")
+    print("-" * 40)
+    print(usage.format_summary())
     print("-" * 40)
     print(" Files generated:")
     print(f" - {seq_file}")
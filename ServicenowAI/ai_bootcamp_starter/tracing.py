@@ -0,0 +1,260 @@
+import atexit
+import contextvars
+import json
+import os
+import secrets
+import threading
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Unset: tracing off. "console": flame summary on exit. Anything else:
+# path of a JSON Lines file, one OTLP/JSON export request per flush.
+TRACE_OUTPUT = os.getenv("TRACE_OUTPUT", "")
+MAX_SPANS = int(os.getenv("TRACE_MAX_SPANS", "200000"))
+
+SERVICE_NAME = "ai_bootcamp_starter"
+
+_current = contextvars.ContextVar("current_span", default=None)
+
+
+# ---------------- SPANS ----------------
+class _NoopSpan:
+    """Returned by span() while tracing is off; every method is a no-op."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set_attribute(self, key, value):
+        pass
+
+    def set_attributes(self, **attrs):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class Span:
+    __slots__ = (
+        "tracer", "name", "trace_id", "span_id", "parent_id",
+        "start_ns", "end_ns", "attributes", "error", "_token",
+    )
+
+    def __init__(self, tracer, name: str, attributes: dict):
+        parent = _current.get()
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = attributes
+        self.error = None
+        self.start_ns = self.end_ns = 0
+        self._token = None
+
+    def __enter__(self):
+        self._token = _current.set(self)
+        self.start_ns = time.time_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end_ns = time.time_ns()
+        _current.reset(self._token)
+        if exc is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        self.tracer._finish(self)
+        return False
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def set_attributes(self, **attrs):
+        self.attributes.update(attrs)
+
+    # Finished spans are pickled back from worker processes
+    def __getstate__(self):
+        return (self.name, self.trace_id, self.span_id, self.parent_id,
+                self.start_ns, self.end_ns, self.attributes, self.error)
+
+    def __setstate__(self, state):
+        (self.name, self.trace_id, self.span_id, self.parent_id,
+         self.start_ns, self.end_ns, self.attributes, self.error) = state
+        self.tracer = self._token = None
+
+
+# ---------------- TRACER ----------------
+class Tracer:
+    """
+    Collects finished spans in memory (up to MAX_SPANS) and writes them
+    as OTLP/JSON or prints a flame summary on flush().
+    """
+
+    def __init__(self, output: str = TRACE_OUTPUT, max_spans: int = MAX_SPANS):
+        self.output = output
+        self.max_spans = max_spans
+        self.enabled = bool(output)
+        self._spans = []
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def span(self, name: str, **attributes):
+        if not self.enabled:
+            return _NOOP
+        return Span(self, name, attributes)
+
+    def _finish(self, span: Span):
+        with self._lock:
+            if len(self._spans) < self.max_spans:
+                self._spans.append(span)
+            else:
+                self.dropped += 1
+
+    def drain(self) -> list:
+        """Removes and returns the finished spans."""
+        with self._lock:
+            spans, self._spans = self._spans, []
+        return spans
+
+    def ingest(self, spans: list):
+        """Adds spans finished elsewhere (e.g. drained in a worker process)."""
+        with self._lock:
+            room = max(self.max_spans - len(self._spans), 0)
+            self._spans.extend(spans[:room])
+            self.dropped += len(spans) - min(len(spans), room)
+
+    # ---------------- OUTPUT ----------------
+    def flush(self):
+        spans = self.drain()
+        if not spans:
+            return
+
+        if self.output == "console":
+            print(format_flame_summary(spans))
+            return
+
+        os.makedirs(os.path.dirname(self.output) or ".", exist_ok=True)
+        with self._lock, open(self.output, "a", encoding="utf-8") as f:
+            f.write(json.dumps(to_otlp(spans)) + "\n")
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(spans: list) -> dict:
+    """OTLP/JSON ExportTraceServiceRequest for a batch of finished spans."""
+    otlp_spans = []
+    for span in spans:
+        item = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": 1,
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns),
+            "attributes": [
+                {"key": key, "value": _otlp_value(value)}
+                for key, value in span.attributes.items()
+                if value is not None
+            ],
+            "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+        }
+        if span.parent_id:
+            item["parentSpanId"] = span.parent_id
+        otlp_spans.append(item)
+
+    return {
+        "resourceSpans": [{
+            "resource": {
+                "attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}],
+            },
+            "scopeSpans": [{
+                "scope": {"name": f"{SERVICE_NAME}.tracing"},
+                "spans": otlp_spans,
+            }],
+        }],
+    }
+
+
+def format_flame_summary(spans: list) -> str:
+    """
+    Aggregates spans by their name path (dataset > record > ...) into
+    an indented tree of count, total and self time. Children that ran
+    concurrently can add up to more than their parent.
+    """
+    by_id = {span.span_id: span for span in spans}
+    paths = {}
+
+    def path_of(span):
+        if span.span_id not in paths:
+            parent = by_id.get(span.parent_id)
+            paths[span.span_id] = (path_of(parent) if parent else ()) + (span.name,)
+        return paths[span.span_id]
+
+    nodes = {}
+    for span in spans:
+        node = nodes.setdefault(path_of(span), {"count": 0, "total": 0.0, "child": 0.0, "errors": 0})
+        duration = (span.end_ns - span.start_ns) / 1e9
+        node["count"] += 1
+        node["total"] += duration
+        node["errors"] += span.error is not None
+
+        parent = by_id.get(span.parent_id)
+        if parent:
+            nodes.setdefault(path_of(parent), {"count": 0, "total": 0.0, "child": 0.0, "errors": 0})
+            nodes[path_of(parent)]["child"] += duration
+
+    root_total = sum(node["total"] for path, node in nodes.items() if len(path) == 1) or 1.0
+
+    lines = [
+        "TRACE SUMMARY",
+        f"{'span':<40}{'count':>8}{'total s':>10}{'self s':>10}{'avg ms':>10}  share",
+        "-" * 90,
+    ]
+    for path in sorted(nodes):
+        node = nodes[path]
+        self_time = max(node["total"] - node["child"], 0.0)
+        avg_ms = node["total"] / node["count"] * 1000 if node["count"] else 0.0
+        share = min(node["total"] / root_total, 1.0)
+        label = ("  " * (len(path) - 1) + path[-1])[:39]
+        errors = f"  ({node['errors']} errors)" if node["errors"] else ""
+        lines.append(
+            f"{label:<40}{node['count']:>8}{node['total']:>10.2f}{self_time:>10.2f}"
+            f"{avg_ms:>10.1f}  {'█' * round(share * 20):<20}{errors}"
+        )
+    return "\n".join(lines)
+
+
+# ---------------- MODULE API ----------------
+tracer = Tracer()
+
+
+def span(name: str, **attributes):
+    """Context manager for a child of the current span (no-op when tracing is off)."""
+    if not tracer.enabled:
+        return _NOOP
+    return Span(tracer, name, attributes)
+
+
+def configure(output: str):
+    """Turns tracing on ("console" or a file path) or off (empty)."""
+    tracer.output = output
+    tracer.enabled = bool(output)
+
+
+def flush():
+    tracer.flush()
+
+
+atexit.register(tracer.flush)
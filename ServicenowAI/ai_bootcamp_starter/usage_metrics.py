@@ -0,0 +1,356 @@
+import contextlib
+import contextvars
+import csv
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, asdict, fields
+from dotenv import load_dotenv
+from tracing import span
+
+load_dotenv()
+
+# Raw per-call rows kept for JSON/CSV export; aggregates are always exact
+MAX_CALL_ROWS = int(os.getenv("USAGE_MAX_CALL_ROWS", "100000"))
+
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+LABELS = ("kind", "model", "action", "judge", "dataset")
+
+
+def _parse_prices(spec: str) -> dict:
+    """'gpt-4.1=2:8,gpt-4o-mini=0.15:0.6' -> {model: (input, output)} USD per 1M tokens."""
+    prices = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        model, _, pair = item.partition("=")
+        prompt_price, _, completion_price = pair.partition(":")
+        prices[model.strip()] = (float(prompt_price), float(completion_price or 0))
+    return prices
+
+
+MODEL_PRICES = _parse_prices(os.getenv("MODEL_PRICES_PER_1M", ""))
+
+
+# ---------------- TAGS ----------------
+_tags = contextvars.ContextVar("usage_tags", default={})
+
+
+@contextlib.contextmanager
+def usage_tags(**tags):
+    """Tags (action, judge, dataset, ...) added to every call recorded inside."""
+    token = _tags.set({**_tags.get(), **tags})
+    try:
+        yield
+    finally:
+        _tags.reset(token)
+
+
+_totals = contextvars.ContextVar("usage_totals", default=None)
+
+
+@contextlib.contextmanager
+def count_calls():
+    """
+    Yields {"calls", "tokens"} summed over the calls recorded inside,
+    including those made from copied contexts (judge threads, tasks).
+    Nested blocks also add their counts to the enclosing one.
+    """
+    parent = _totals.get()
+    totals = {"calls": 0, "tokens": 0}
+    token = _totals.set(totals)
+    try:
+        yield totals
+    finally:
+        _totals.reset(token)
+        if parent is not None:
+            parent["calls"] += totals["calls"]
+            parent["tokens"] += totals["tokens"]
+
+
+# ---------------- RECORDS ----------------
+@dataclass
+class CallRecord:
+    kind: str
+    model: str
+    action: str
+    judge: str
+    dataset: str
+    latency_s: float
+    prompt_tokens: int
+    completion_tokens: int
+    retries: int
+    cached: bool
+    ok: bool
+
+
+class _Aggregate:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.cached = 0
+        self.retries = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.latency_sum = 0.0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+
+    def add(self, rec: CallRecord):
+        self.calls += 1
+        self.errors += not rec.ok
+        self.cached += rec.cached
+        self.retries += rec.retries
+        self.prompt_tokens += rec.prompt_tokens
+        self.completion_tokens += rec.completion_tokens
+        self.latency_sum += rec.latency_s
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if rec.latency_s <= bound:
+                self.buckets[i] += 1
+
+    def merge(self, other: "_Aggregate"):
+        for name in ("calls", "errors", "cached", "retries", "prompt_tokens", "completion_tokens", "latency_sum"):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        self.buckets = [a + b for a, b in zip(self.buckets, other.buckets)]
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int):
+    prices = MODEL_PRICES.get(model)
+    if prices is None:
+        return None
+    return (prompt_tokens * prices[0] + completion_tokens * prices[1]) / 1_000_000
+
+
+# ---------------- RECORDER ----------------
+class UsageRecorder:
+    """
+    Per-call latency, token, retry and cache accounting for every model
+    call, aggregated by (kind, model, action, judge, dataset). Exports
+    Prometheus text, JSON or CSV.
+    """
+
+    def __init__(self, max_call_rows: int = MAX_CALL_ROWS):
+        self.max_call_rows = max_call_rows
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._aggregates = {}
+            self._calls = []
+
+    def record(
+        self,
+        kind: str,
+        model: str,
+        started: float,
+        response=None,
+        retries: int = 0,
+        cached: bool = False,
+        ok: bool = True,
+        **tags,
+    ):
+        """`started` is a time.perf_counter() taken before the call."""
+        tags = {**_tags.get(), **tags}
+        usage = getattr(response, "usage", None)
+
+        rec = CallRecord(
+            kind=kind,
+            model=model,
+            action=tags.get("action") or "",
+            judge=tags.get("judge") or "",
+            dataset=tags.get("dataset") or "",
+            latency_s=time.perf_counter() - started,
+            prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+            completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
+            retries=retries,
+            cached=cached,
+            ok=ok,
+        )
+        key = tuple(getattr(rec, label) for label in LABELS)
+
+        totals = _totals.get()
+        with self._lock:
+            if totals is not None:
+                totals["calls"] += 1
+                totals["tokens"] += rec.prompt_tokens + rec.completion_tokens
+            self._aggregates.setdefault(key, _Aggregate()).add(rec)
+            if len(self._calls) < self.max_call_rows:
+                self._calls.append(rec)
+        return rec
+
+    # ---------------- MERGING ----------------
+    def state(self) -> dict:
+        """Picklable snapshot, e.g. to send back from a worker process."""
+        with self._lock:
+            return {"aggregates": dict(self._aggregates), "calls": list(self._calls)}
+
+    def merge(self, state: dict):
+        with self._lock:
+            for key, agg in state["aggregates"].items():
+                self._aggregates.setdefault(key, _Aggregate()).merge(agg)
+            room = self.max_call_rows - len(self._calls)
+            self._calls.extend(state["calls"][:max(room, 0)])
+
+    # ---------------- EXPORT ----------------
+    def summary_rows(self) -> list:
+        with self._lock:
+            items = sorted(self._aggregates.items())
+
+        rows = []
+        for key, agg in items:
+            row = dict(zip(LABELS, key))
+            row.update(
+                calls=agg.calls,
+                errors=agg.errors,
+                cached=agg.cached,
+                retries=agg.retries,
+                prompt_tokens=agg.prompt_tokens,
+                completion_tokens=agg.completion_tokens,
+                avg_latency_s=agg.latency_sum / agg.calls if agg.calls else 0.0,
+                cost_usd=estimate_cost(row["model"], agg.prompt_tokens, agg.completion_tokens),
+            )
+            rows.append(row)
+        return rows
+
+    def to_json(self) -> str:
+        with self._lock:
+            calls = [asdict(rec) for rec in self._calls]
+        return json.dumps({"summary": self.summary_rows(), "calls": calls}, indent=2)
+
+    def to_csv(self, f):
+        """Writes one row per recorded call."""
+        writer = csv.writer(f)
+        writer.writerow([field.name for field in fields(CallRecord)])
+        with self._lock:
+            for rec in self._calls:
+                writer.writerow(astuple_row(rec))
+
+    def to_prometheus(self) -> str:
+        with self._lock:
+            items = sorted(self._aggregates.items())
+
+        counters = (
+            ("llm_calls_total", "Model calls", "calls"),
+            ("llm_call_errors_total", "Model calls that failed after retries", "errors"),
+            ("llm_cache_hits_total", "Model calls answered from the response cache", "cached"),
+            ("llm_retries_total", "Retried attempts", "retries"),
+            ("llm_prompt_tokens_total", "Prompt tokens", "prompt_tokens"),
+            ("llm_completion_tokens_total", "Completion tokens", "completion_tokens"),
+        )
+
+        lines = []
+        for metric, help_text, attr in counters:
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} counter")
+            for key, agg in items:
+                lines.append(f"{metric}{{{_labels(key)}}} {getattr(agg, attr)}")
+
+        metric = "llm_call_latency_seconds"
+        lines.append(f"# HELP {metric} Model call latency including pacing and retries")
+        lines.append(f"# TYPE {metric} histogram")
+        for key, agg in items:
+            labels = _labels(key)
+            for bound, count in zip(LATENCY_BUCKETS, agg.buckets):
+                lines.append(f'{metric}_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'{metric}_bucket{{{labels},le="+Inf"}} {agg.calls}')
+            lines.append(f"{metric}_sum{{{labels}}} {agg.latency_sum:.6f}")
+            lines.append(f"{metric}_count{{{labels}}} {agg.calls}")
+
+        return "\n".join(lines) + "\n"
+
+    def export(self, path: str):
+        """Format picked from the extension: .prom / .txt, .json or .csv."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        ext = os.path.splitext(path)[1].lower()
+
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            if ext == ".json":
+                f.write(self.to_json())
+            elif ext == ".csv":
+                self.to_csv(f)
+            else:
+                f.write(self.to_prometheus())
+
+    def format_summary(self) -> str:
+        rows = self.summary_rows()
+        if not rows:
+            return "No model calls recorded"
+
+        header = (
+            f"{'kind':<10}{'model':<16}{'action/judge':<16}{'dataset':<12}"
+            f"{'calls':>7}{'cached':>8}{'retries':>8}{'prompt':>10}{'compl.':>9}"
+            f"{'avg s':>8}{'cost $':>9}"
+        )
+        lines = [header, "-" * len(header)]
+        total_cost = 0.0
+
+        for row in rows:
+            cost = row["cost_usd"]
+            total_cost += cost or 0
+            lines.append(
+                f"{row['kind']:<10}{row['model'][:15]:<16}"
+                f"{(row['judge'] or row['action'] or '-')[:15]:<16}{(row['dataset'] or '-')[:11]:<12}"
+                f"{row['calls']:>7}{row['cached']:>8}{row['retries']:>8}"
+                f"{row['prompt_tokens']:>10}{row['completion_tokens']:>9}"
+                f"{row['avg_latency_s']:>8.2f}{'-' if cost is None else f'{cost:.4f}':>9}"
+            )
+
+        totals = (
+            sum(r["calls"] for r in rows),
+            sum(r["prompt_tokens"] for r in rows),
+            sum(r["completion_tokens"] for r in rows),
+        )
+        lines.append("-" * len(header))
+        lines.append(
+            f"Total: {totals[0]} calls, {totals[1]} prompt + {totals[2]} completion tokens"
+            + (f", ~${total_cost:.4f}" if MODEL_PRICES else "")
+        )
+        return "\n".join(lines)
+
+
+def astuple_row(rec: CallRecord) -> list:
+    return [getattr(rec, field.name) for field in fields(CallRecord)]
+
+
+def _labels(key: tuple) -> str:
+    def escape(value: str) -> str:
+        return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    return ",".join(f'{name}="{escape(value)}"' for name, value in zip(LABELS, key))
+
+
+# Process-wide recorder used by the generators and judges
+usage = UsageRecorder()
+
+
+@contextlib.contextmanager
+def track_call(kind: str, model: str, **tags):
+    """
+    Records one model call on the shared recorder and as an
+    "llm.request" tracing span. The body sets call["response"] (or
+    call["cached"] = True); pass `call` as the limiter's `info` so
+    retries and queueing time are counted. Exceptions are recorded as
+    failed calls and re-raised.
+    """
+    call = {"response": None, "cached": False, "retries": 0, "queued_s": 0.0}
+    started = time.perf_counter()
+
+    with span("llm.request", kind=kind, model=model, **tags) as sp:
+        try:
+            yield call
+        except Exception:
+            usage.record(kind, model, started, retries=call["retries"], ok=False, **tags)
+            sp.set_attributes(retries=call["retries"])
+            raise
+
+        rec = usage.record(
+            kind, model, started, call["response"],
+            retries=call["retries"], cached=call["cached"], **tags,
+        )
+        sp.set_attributes(
+            cache_hit=call["cached"],
+            retries=call["retries"],
+            queued_ms=round(call["queued_s"] * 1000, 1),
+            prompt_tokens=rec.prompt_tokens,
+            completion_tokens=rec.completion_tokens,
+        )